@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Measure what lazy goal-state saves on hooks that never use the units.
+
+A stub goal-state tool is put on PATH. Each simulated hook builds the
+MongoBuilder as MongoDbCharm does, once resolving goal-state eagerly (the
+previous behaviour) and once lazily; update-status never builds the URI,
+config-changed builds it once.
+
+    python3 benchmarks/goal_state_bench.py --hooks 100 --units 50
+"""
+import argparse
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+
+sys.path.append('src')
+from builders import MongoBuilder
+from wrapper import FrameworkWrapper
+
+CONFIG = {
+    'enable-sidecar': True,
+    'service-name': 'mongodb-k8s-endpoints',
+    'advertised-port': 27017,
+    'replica-set': 'rs0',
+}
+
+
+class UriFormatter:
+    """MongoDbInterfaceDataFormatter's signature, without importing ops."""
+
+    def format(self, mongo_uri, standard_uri=None, client_options=None):
+        return mongo_uri
+
+
+def make_goal_state_tool(workdir, units):
+    data = os.path.join(workdir, 'goal-state.json')
+    with open(data, 'w') as data_file:
+        json.dump({
+            'units': {
+                'mongodb-k8s/{}'.format(i): {'status': 'active'}
+                for i in range(units)
+            },
+            'relations': {},
+        }, data_file)
+    tool = os.path.join(workdir, 'goal-state')
+    with open(tool, 'w') as tool_file:
+        tool_file.write('#!/bin/sh\ncat {}\n'.format(data))
+    os.chmod(tool, os.stat(tool).st_mode | stat.S_IEXEC)
+
+
+def hook(lazy, uses_units):
+    wrapper = FrameworkWrapper(None, None)
+    units = (lambda: wrapper.goal_state_units) if lazy \
+        else wrapper.goal_state_units
+    builder = MongoBuilder('mongodb-k8s', CONFIG, {}, units)
+    if uses_units:
+        builder.build_relation_data(UriFormatter())
+
+
+def run(hooks, lazy, uses_units):
+    started = time.perf_counter()
+    for _ in range(hooks):
+        hook(lazy, uses_units)
+    return (time.perf_counter() - started) * 1000 / hooks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hooks', type=int, default=100)
+    parser.add_argument('--units', type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['PATH'] = workdir + os.pathsep + os.environ['PATH']
+    try:
+        make_goal_state_tool(workdir, args.units)
+        results = {
+            name: {
+                'eager_ms_per_hook': run(args.hooks, False, uses_units),
+                'lazy_ms_per_hook': run(args.hooks, True, uses_units),
+            }
+            for name, uses_units in (('update-status', False),
+                                     ('config-changed', True))
+        }
+    finally:
+        shutil.rmtree(workdir)
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
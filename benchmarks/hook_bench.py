@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""Measure the end-to-end latency of MongoDbCharm hooks.
+
+Each hook runs as Juju would run it: a fresh process started from a
+symlink in the charm's hooks/ or actions/ directory, with stub hook tools
+(goal-state, config-get, pod-spec-set, status-set, ...) on PATH. The
+Kubernetes API is a local HTTPS stand-in for kubernetes.default.svc
+serving synthetic PodLists and PersistentVolumeClaimLists of the given
+size.
+
+    python3 benchmarks/hook_bench.py --runs 20 --units 50 \\
+        --output hook-bench.json
+
+The JSON report has, per hook, the p50/p99 wall time, the Kubernetes API
+calls and bytes read and the hook tool calls per run, and the peak RSS.
+It records the commit it was taken at, so reports of two commits can be
+compared key by key.
+"""
+import argparse
+import http.server
+import json
+import math
+import os
+import shutil
+import socketserver
+import ssl
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import yaml
+
+REPO = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(REPO, 'src'))
+import k8s
+from k8s_api_bench import make_certificate
+
+APP = 'mongodb-k8s'
+UNIT = APP + '/0'
+MODEL = 'bench'
+CLIENT = 'client/0'
+
+# (name, directory, extra environment) in the order they are driven
+HOOKS = [
+    ('start', 'hooks', {}),
+    ('config-changed', 'hooks', {}),
+    ('update-status', 'hooks', {}),
+    ('mongo-relation-joined', 'hooks', {
+        'JUJU_RELATION': 'mongo',
+        'JUJU_RELATION_ID': 'mongo:1',
+        'JUJU_REMOTE_UNIT': CLIENT,
+        'JUJU_REMOTE_APP': CLIENT.split('/')[0],
+    }),
+    ('remove-pvc', 'actions', {
+        'JUJU_ACTION_NAME': 'remove-pvc',
+        'JUJU_ACTION_UUID': '1',
+    }),
+]
+
+# Hook tools: shell snippets run after the call is counted
+TOOLS = {
+    'config-get': 'cat "$HOOK_BENCH_FIXTURES/config.json"',
+    'goal-state': 'cat "$HOOK_BENCH_FIXTURES/goal-state.json"',
+    'resource-get': 'echo "$HOOK_BENCH_FIXTURES/$1.yaml"',
+    'is-leader': 'echo true',
+    'leader-get': 'echo "{}"',
+    'action-get': 'echo "{}"',
+    'relation-ids': 'case "$1" in\n'
+                    '  mongo) echo \'["mongo:1"]\' ;;\n'
+                    '  replicas) echo \'["replicas:0"]\' ;;\n'
+                    '  *) echo "[]" ;;\n'
+                    'esac',
+    'relation-list': 'case "$*" in\n'
+                     '  *--app*) echo \'"{app}"\' ;;\n'
+                     '  *" 1 "*|*mongo:1*) echo \'["{unit}"]\' ;;\n'
+                     '  *) echo "[]" ;;\n'
+                     'esac'.format(app=CLIENT.split('/')[0], unit=CLIENT),
+    'relation-get': 'echo "{}"',
+    'status-get': 'echo \'{"status": "unknown", "message": "", '
+                  '"status-data": {}}\'',
+    'network-get': 'echo "{}"',
+    'status-set': ':',
+    'pod-spec-set': ':',
+    'relation-set': ':',
+    'leader-set': ':',
+    'action-set': ':',
+    'action-log': ':',
+    'action-fail': ':',
+    'application-version-set': ':',
+    'juju-log': 'echo "$*" >> "$HOOK_BENCH_JUJU_LOG"',
+}
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """Namespaced pod and PVC reads and deletes of the core v1 API."""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _reply(self, obj):
+        body = json.dumps(obj).encode('UTF-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.record(len(body))
+
+    def _route(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        # /api/v1/namespaces/<namespace>/<resource>[/<name>]
+        parts = url.path.strip('/').split('/')
+        return parts[4], (parts[5] if len(parts) > 5 else None), query
+
+    def do_GET(self):
+        resource, name, query = self._route()
+        items = self.server.objects.get(resource, [])
+        if name is not None:
+            obj = next((i for i in items if i['metadata']['name'] == name),
+                       None)
+            if obj is None:
+                self._reply({'kind': 'Status', 'status': 'Failure',
+                             'reason': 'NotFound', 'code': 404})
+            elif 'PartialObjectMetadata' in self.headers.get('Accept', ''):
+                self._reply({'kind': 'PartialObjectMetadata',
+                             'metadata': obj['metadata']})
+            else:
+                self._reply(obj)
+            return
+        selector = query.get('fieldSelector', '')
+        if selector.startswith('metadata.name='):
+            selected = selector.split('=', 1)[1]
+            items = [i for i in items if i['metadata']['name'] == selected]
+        start = int(query.get('continue') or 0)
+        end = start + int(query.get('limit') or len(items) or 1)
+        metadata = {'resourceVersion': '1'}
+        if end < len(items):
+            metadata['continue'] = str(end)
+        self._reply({'kind': self.server.kinds[resource],
+                     'metadata': metadata, 'items': items[start:end]})
+
+    def do_DELETE(self):
+        # Objects are kept so that every run sees the same lists
+        self._reply({'kind': 'Status', 'status': 'Success'})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    kinds = {
+        'pods': 'PodList',
+        'persistentvolumeclaims': 'PersistentVolumeClaimList',
+    }
+
+    def __init__(self, address, context, objects):
+        super().__init__(address, StandInHandler)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+        self.objects = objects
+        self._lock = threading.Lock()
+        self.reset()
+
+    def record(self, size):
+        with self._lock:
+            self.calls += 1
+            self.bytes_read += size
+
+    def reset(self):
+        self.calls = 0
+        self.bytes_read = 0
+
+
+def make_objects(units, pvcs):
+    """Pods of units replicas and pvcs claims, the first units bound."""
+    def claim(i):
+        return 'database-{}-{}'.format(APP, i)
+
+    pods = [{
+        'metadata': {
+            'name': '{}-{}'.format(APP, i),
+            'resourceVersion': str(1000 + i),
+            'labels': {'juju-app': APP},
+            'annotations': {'juju.io/unit': '{}/{}'.format(APP, i)},
+        },
+        'spec': {
+            'containers': [{
+                'name': APP,
+                'image': 'mongo:latest',
+                'args': ['mongod', '--bind_ip', '0.0.0.0',
+                         '--replSet', 'rs0'],
+                'ports': [{'containerPort': 27017, 'protocol': 'TCP'}],
+            }],
+            'volumes': [{'name': 'database',
+                         'persistentVolumeClaim': {'claimName': claim(i)}}],
+        },
+        'status': {
+            'phase': 'Running',
+            'podIP': '10.1.{}.{}'.format(i // 250, i % 250 + 1),
+            'conditions': [{'type': 'Ready', 'status': 'True'},
+                           {'type': 'ContainersReady', 'status': 'True'}],
+        },
+    } for i in range(units)]
+    claims = [{
+        'metadata': {
+            'name': claim(i),
+            'resourceVersion': str(5000 + i),
+            'labels': {'juju-app': APP},
+        },
+        'spec': {'accessModes': ['ReadWriteOnce'],
+                 'resources': {'requests': {'storage': '1Gi'}}},
+        'status': {'phase': 'Bound'},
+    } for i in range(pvcs)]
+    return {'pods': pods, 'persistentvolumeclaims': claims}
+
+
+def make_tools(directory):
+    for name, script in TOOLS.items():
+        path = os.path.join(directory, name)
+        with open(path, 'w') as tool:
+            tool.write('#!/bin/sh\necho {} >> "$HOOK_BENCH_TOOL_LOG"\n{}\n'
+                       .format(name, script))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+
+def make_fixtures(directory, units):
+    with open(os.path.join(REPO, 'config.yaml')) as config_file:
+        options = yaml.safe_load(config_file)['options']
+    config = {key: option['default'] for key, option in options.items()
+              if 'default' in option}
+    with open(os.path.join(directory, 'config.json'), 'w') as config_file:
+        json.dump(config, config_file)
+    with open(os.path.join(directory, 'goal-state.json'), 'w') as goal_state:
+        json.dump({
+            'units': {'{}/{}'.format(APP, i): {'status': 'active'}
+                      for i in range(units)},
+            'relations': {},
+        }, goal_state)
+    for resource in ('mongodb-image', 'mongodb-sidecar-image'):
+        with open(os.path.join(directory, resource + '.yaml'), 'w') as image:
+            yaml.safe_dump({'registrypath': 'registry/' + resource,
+                            'username': 'bench', 'password': 'bench'}, image)
+
+
+def make_charm_dir(directory):
+    """A charm directory running this script for every benchmarked hook."""
+    for name in ('metadata.yaml', 'config.yaml', 'actions.yaml', 'lib'):
+        os.symlink(os.path.join(REPO, name), os.path.join(directory, name))
+    for name, kind, _ in HOOKS:
+        os.makedirs(os.path.join(directory, kind), exist_ok=True)
+        os.symlink(os.path.realpath(__file__),
+                   os.path.join(directory, kind, name))
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def run_hook(charm_dir, name, kind, env, server):
+    """Run one hook and return what it cost."""
+    server.reset()
+    open(env['HOOK_BENCH_TOOL_LOG'], 'w').close()
+    started = time.perf_counter()
+    with open(env['HOOK_BENCH_JUJU_LOG'], 'w') as log:
+        process = subprocess.Popen([os.path.join(charm_dir, kind, name)],
+                                   cwd=charm_dir, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        # Unlike Popen.wait, wait4 reports the resource usage of the hook
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = status
+    elapsed = time.perf_counter() - started
+    if status:
+        with open(env['HOOK_BENCH_JUJU_LOG']) as log:
+            raise RuntimeError('{} failed:\n{}'.format(name, log.read()))
+    with open(env['HOOK_BENCH_TOOL_LOG']) as log:
+        tool_calls = sum(1 for _ in log)
+    return {
+        'ms': elapsed * 1000,
+        'api_calls': server.calls,
+        'api_bytes_read': server.bytes_read,
+        'tool_calls': tool_calls,
+        # Kilobytes on Linux
+        'peak_rss_kb': usage.ru_maxrss,
+    }
+
+
+def summarize(samples):
+    times = [sample['ms'] for sample in samples]
+    return {
+        'runs': len(samples),
+        'p50_ms': round(percentile(times, 50), 2),
+        'p99_ms': round(percentile(times, 99), 2),
+        'mean_ms': round(sum(times) / len(times), 2),
+        'api_calls': max(sample['api_calls'] for sample in samples),
+        'api_bytes_read': max(sample['api_bytes_read']
+                              for sample in samples),
+        'tool_calls': max(sample['tool_calls'] for sample in samples),
+        'peak_rss_kb': max(sample['peak_rss_kb'] for sample in samples),
+    }
+
+
+def commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=REPO,
+            stderr=subprocess.DEVNULL).decode('UTF-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def hook_main():
+    """Entry point of a benchmarked hook process."""
+    host, token_path, ca_path = os.environ['HOOK_BENCH_API'].split(',')
+
+    class StandInApi(k8s.K8sApi):
+
+        def __init__(self):
+            super().__init__(host, token_path, ca_path)
+
+    k8s.K8sApi = StandInApi
+    # Not runpy, which would replace the hook path in sys.argv[0]
+    path = os.path.join(REPO, 'src', 'charm.py')
+    with open(path) as charm:
+        code = compile(charm.read(), path, 'exec')
+    exec(code, {'__name__': '__main__', '__file__': path})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--units', type=int, default=50,
+                        help='pods, and goal-state units, of the application')
+    parser.add_argument('--pvcs', type=int,
+                        help='PVCs of the application, by default --units')
+    parser.add_argument('--cold', action='store_true',
+                        help='drop the Kubernetes object cache before '
+                             'every hook')
+    parser.add_argument('--output', help='write the report to this file')
+    args = parser.parse_args()
+    pvcs = args.units if args.pvcs is None else args.pvcs
+
+    workdir = tempfile.mkdtemp()
+    try:
+        cert, key = make_certificate(workdir)
+        token = os.path.join(workdir, 'token')
+        with open(token, 'w') as token_file:
+            token_file.write('bench-token')
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server = StandInServer(('127.0.0.1', 0), context,
+                               make_objects(args.units, pvcs))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        charm_dir = os.path.join(workdir, 'charm')
+        tools = os.path.join(workdir, 'tools')
+        fixtures = os.path.join(workdir, 'fixtures')
+        for directory in (charm_dir, tools, fixtures):
+            os.mkdir(directory)
+        make_charm_dir(charm_dir)
+        make_tools(tools)
+        make_fixtures(fixtures, args.units)
+        base_env = dict(
+            os.environ,
+            PATH=tools + os.pathsep + os.environ['PATH'],
+            JUJU_CHARM_DIR=charm_dir,
+            JUJU_UNIT_NAME=UNIT,
+            JUJU_MODEL_NAME=MODEL,
+            JUJU_VERSION='2.7.6',
+            HOOK_BENCH_FIXTURES=fixtures,
+            HOOK_BENCH_TOOL_LOG=os.path.join(workdir, 'tools.log'),
+            HOOK_BENCH_JUJU_LOG=os.path.join(workdir, 'juju.log'),
+            HOOK_BENCH_API='127.0.0.1:{},{},{}'.format(
+                server.server_address[1], token, cert),
+        )
+
+        samples = {name: [] for name, _, _ in HOOKS}
+        for _ in range(args.runs):
+            for name, kind, env in HOOKS:
+                if args.cold:
+                    try:
+                        os.remove(os.path.join(charm_dir, '.k8s-cache.json'))
+                    except FileNotFoundError:
+                        pass
+                samples[name].append(run_hook(
+                    charm_dir, name, kind, dict(base_env, **env), server))
+        server.shutdown()
+    finally:
+        shutil.rmtree(workdir)
+
+    report = {
+        'commit': commit(),
+        'python': sys.version.split()[0],
+        'units': args.units,
+        'pvcs': pvcs,
+        'cold': args.cold,
+        'hooks': {name: summarize(hook_samples)
+                  for name, hook_samples in samples.items()},
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    if 'HOOK_BENCH_API' in os.environ:
+        hook_main()
+    else:
+        main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Report what importing the charm costs at hook start.
+
+Every run is a fresh interpreter started with -X importtime. ops is
+imported first, so the figures are the charm's own on top of the
+framework; the ops entry reports the framework alone. The subsystems the
+charm imports only when a delegator needs them are reported separately.
+
+    python3 benchmarks/import_bench.py --runs 10 --output imports.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+PREAMBLE = 'import sys; sys.path[:0] = ["src"]; sys.path.append("lib"); '
+FRAMEWORK = 'import ops.charm, ops.framework, ops.main; '
+
+# name: (statement, modules it imports at the top level)
+ENTRIES = {
+    'ops': (PREAMBLE + 'import ops.charm, ops.framework, ops.main',
+            ['ops.charm', 'ops.framework', 'ops.main']),
+    'charm': (PREAMBLE + FRAMEWORK + 'import charm', ['charm']),
+    # Imported by the hooks reading the pod or PVCs
+    'k8s': (PREAMBLE + FRAMEWORK + 'import charm, k8s', ['k8s']),
+    # Imported by the backup and restore actions
+    'backup-restore': (PREAMBLE + FRAMEWORK + 'import charm, backup, restore',
+                       ['backup', 'restore']),
+}
+
+
+def parse(stderr):
+    """(self us, cumulative us, depth, module) of every imported module."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        imports.append((int(own), int(cumulative), depth, name.strip()))
+    return imports
+
+
+def run(statement, modules):
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=REPO, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL,
+        check=True).stderr.decode('UTF-8')
+    imports = parse(stderr)
+    total = sum(cumulative for _, cumulative, depth, name in imports
+                if depth == 0 and name in modules)
+    # Everything imported on behalf of the entry's modules
+    pulled = []
+    for index, (_, _, depth, name) in enumerate(imports):
+        if depth == 0 and name in modules:
+            start = index
+            while start > 0 and imports[start - 1][2] > 0:
+                start -= 1
+            pulled += imports[start:index + 1]
+    return total, {name: own for own, _, _, name in pulled}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10,
+                        help='modules listed by their own import time')
+    parser.add_argument('--output', help='write the report to this file')
+    args = parser.parse_args()
+
+    entries = {}
+    for name, (statement, modules) in ENTRIES.items():
+        totals, own = [], {}
+        for _ in range(args.runs):
+            total, run_own = run(statement, modules)
+            totals.append(total)
+            for module, us in run_own.items():
+                own.setdefault(module, []).append(us)
+        median_own = {module: statistics.median(us)
+                      for module, us in own.items()}
+        entries[name] = {
+            'median_ms': round(statistics.median(totals) / 1000, 2),
+            'min_ms': round(min(totals) / 1000, 2),
+            'modules': sorted(median_own),
+            'slowest_ms': {
+                module: round(us / 1000, 2) for module, us in sorted(
+                    median_own.items(), key=lambda item: -item[1])[:args.top]
+            },
+        }
+
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=REPO,
+            stderr=subprocess.DEVNULL).decode('UTF-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    report = {
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'entries': entries,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
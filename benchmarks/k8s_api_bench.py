@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Compare per-request and keep-alive K8sApi sessions.
+
+Runs a local TLS stand-in for kubernetes.default.svc and issues the same
+sequence of requests a remove-pvc hook makes, once with a fresh session per
+request (the previous behaviour) and once with the shared session. The
+sessions are closed between simulated hooks, as Juju runs every hook in a
+new process.
+
+    python3 benchmarks/k8s_api_bench.py --hooks 50
+"""
+import argparse
+import http.server
+import json
+import os
+import shutil
+import socketserver
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append('src')
+from k8s import K8sApi
+
+HOOK_REQUESTS = [
+    ('GET', '/api/v1/namespaces/bench/pods?labelSelector=juju-app=bench'),
+    ('GET', '/api/v1/namespaces/bench/persistentvolumeclaims?'
+            'labelSelector=juju-app=bench'),
+    ('DELETE', '/api/v1/namespaces/bench/persistentvolumeclaims/bench-0'),
+]
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    body = json.dumps({'kind': 'Status', 'items': []}).encode('UTF-8')
+
+    def _reply(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    do_GET = _reply
+    do_DELETE = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, context):
+        super().__init__(address, StandInHandler)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+        self.handshakes = 0
+
+    def get_request(self):
+        request = super().get_request()
+        self.handshakes += 1
+        return request
+
+
+def make_certificate(workdir):
+    cert = os.path.join(workdir, 'ca.crt')
+    key = os.path.join(workdir, 'server.key')
+    subprocess.check_call(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+         '-keyout', key, '-out', cert, '-days', '1',
+         '-subj', '/CN=localhost'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return cert, key
+
+
+def run(server, api_args, hooks, keep_alive):
+    K8sApi.close_all()
+    server.handshakes = 0
+    started = time.perf_counter()
+    for _ in range(hooks):
+        # Every hook is a new process, so no session outlives one
+        K8sApi.close_all()
+        for method, path in HOOK_REQUESTS:
+            if not keep_alive:
+                K8sApi.close_all()
+            K8sApi(**api_args).request(method, path)
+    elapsed = time.perf_counter() - started
+    K8sApi.close_all()
+    return {
+        'handshakes_per_hook': server.handshakes / hooks,
+        'ms_per_hook': elapsed * 1000 / hooks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hooks', type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        cert, key = make_certificate(workdir)
+        token = os.path.join(workdir, 'token')
+        with open(token, 'w') as token_file:
+            token_file.write('bench-token')
+
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server = StandInServer(('127.0.0.1', 0), context)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        api_args = {
+            'host': '127.0.0.1:{}'.format(server.server_address[1]),
+            'token_path': token,
+            'ca_path': cert,
+        }
+        results = {
+            'per-request': run(server, api_args, args.hooks, False),
+            'keep-alive': run(server, api_args, args.hooks, True),
+        }
+        server.shutdown()
+    finally:
+        shutil.rmtree(workdir)
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
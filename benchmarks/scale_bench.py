@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Check that the per-hook work grows linearly with units and relations.
+
+Runs MongoBuilder and the mongo relation handling of MongoDbServer and
+RelationObserver against simulated goal-states of 3 to 1000 units and 1
+to 500 mongo relations, and fits the growth exponent of every operation
+on a log-log scale: 1 is linear, 2 quadratic.
+
+    python3 benchmarks/scale_bench.py --check --max-exponent 1.3
+
+With --check, the exit status is 1 when an operation grows faster than
+--max-exponent, so the simulation can gate a change.
+"""
+import argparse
+import json
+import math
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.append('lib')
+sys.path.append('src')
+from builders import MongoBuilder
+from mongodb_interface_provides import MongoDbServer
+from observers import RelationObserver
+
+UNITS = [3, 10, 30, 100, 300, 1000]
+RELATIONS = [1, 5, 20, 50, 200, 500]
+# Units of every simulated client application
+CLIENT_UNITS = 3
+
+CONFIG = {
+    'enable-sidecar': False,
+    'manage-replica-set': True,
+    'service-name': 'mongodb-k8s-endpoints',
+    'advertised-port': 27017,
+    'replica-set': 'rs0',
+    'namespace': 'mongodb',
+    'cluster-domain': 'cluster.local',
+    'client-compressors': 'zstd,snappy',
+}
+LOCAL_UNIT = 'mongodb-k8s/0'
+
+
+class SimulatedServer:
+    """MongoDbServer outside of the operator framework.
+
+    The methods under test are MongoDbServer's own; only the state, the
+    model and the new_client event are stood in for.
+    """
+
+    relation_name = 'mongo'
+    _relations = MongoDbServer._relations
+    on_joined = MongoDbServer.on_joined
+    on_departed = MongoDbServer.on_departed
+    clients = MongoDbServer.clients
+
+    def __init__(self, relations):
+        self.model = SimpleNamespace(unit=LOCAL_UNIT,
+                                     relations={'mongo': relations})
+        self.state = SimpleNamespace(apps=[])
+        self.emitted = []
+        self.on = SimpleNamespace(
+            new_client=SimpleNamespace(emit=self.emitted.append))
+
+
+class SimulatedFramework:
+    """The FrameworkWrapper calls of RelationObserver, on plain dicts."""
+
+    def __init__(self):
+        self.config = CONFIG
+        self.relation_data_sets = 0
+
+    def relation_data_get(self, relation):
+        return relation.data[LOCAL_UNIT]
+
+    def relation_data_set(self, relation, data):
+        self.relation_data_sets += 1
+        relation.data[LOCAL_UNIT].update(data)
+
+
+def make_units(count):
+    return {'mongodb-k8s/{}'.format(i): {'status': 'active'}
+            for i in range(count)}
+
+
+def make_relations(count):
+    relations = []
+    for i in range(count):
+        app = 'client-{}'.format(i)
+        units = ['{}/{}'.format(app, j) for j in range(CLIENT_UNITS)]
+        data = {unit: {} for unit in units}
+        data[LOCAL_UNIT] = {}
+        relations.append(SimpleNamespace(name='mongo', id=i,
+                                         app=SimpleNamespace(name=app),
+                                         units=units, data=data))
+    return relations
+
+
+def make_builder(units):
+    return MongoBuilder('mongodb-k8s', CONFIG, {}, units)
+
+
+def build_uri(units):
+    make_builder(units).__make_mongodb_uri__()
+
+
+def build_replica_set_config(units):
+    make_builder(units).build_replica_set_config()
+
+
+def list_clients(relations):
+    SimulatedServer(relations).clients()
+
+
+def join(relations):
+    """The joins of a new client's units once every other client is known.
+
+    Each join is a hook of its own, which loads the known applications
+    from the stored state.
+    """
+    server = SimulatedServer(relations)
+    server.state.apps = [relation.app.name for relation in relations[:-1]]
+    new = relations[-1]
+    for unit in new.units:
+        server.on_joined(SimpleNamespace(relation=new, app=new.app,
+                                         unit=unit))
+    assert len(server.emitted) == 1
+
+
+def publish_all(relations):
+    """A config-changed publishing the URI to every client."""
+    for relation in relations:
+        relation.data[LOCAL_UNIT].clear()
+    framework = SimulatedFramework()
+    RelationObserver(framework, {}, None, make_builder(make_units(3)),
+                     SimulatedServer(relations)).handle(SimpleNamespace())
+    assert framework.relation_data_sets == len(relations)
+
+
+def publish_new_clients(relations):
+    """The new_client hooks of a burst of joining clients."""
+    for relation in relations:
+        relation.data[LOCAL_UNIT].clear()
+    framework = SimulatedFramework()
+    server = SimulatedServer(relations)
+    builder = make_builder(make_units(3))
+    for relation in relations:
+        RelationObserver(framework, {}, None, builder, server).handle(
+            SimpleNamespace(relation=relation))
+    assert framework.relation_data_sets == len(relations)
+
+
+OPERATIONS = [
+    ('build-uri', 'units', UNITS, make_units, build_uri),
+    ('build-replica-set-config', 'units', UNITS, make_units,
+     build_replica_set_config),
+    ('clients', 'relations', RELATIONS, make_relations, list_clients),
+    ('join', 'relations', RELATIONS, make_relations, join),
+    ('publish-all', 'relations', RELATIONS, make_relations, publish_all),
+    ('publish-new-clients', 'relations', RELATIONS, make_relations,
+     publish_new_clients),
+]
+
+
+def measure(operation, argument, budget):
+    """Best seconds per call, repeating for about budget seconds."""
+    best = None
+    deadline = time.perf_counter() + budget
+    while best is None or time.perf_counter() < deadline:
+        started = time.perf_counter()
+        operation(argument)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def growth_exponent(sizes, seconds):
+    """Least-squares slope of log(seconds) over log(size)."""
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(second, 1e-9)) for second in seconds]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / \
+        sum((x - mean_x) ** 2 for x in xs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget', type=float, default=0.2,
+                        help='seconds spent measuring each size')
+    parser.add_argument('--check', action='store_true')
+    parser.add_argument('--max-exponent', type=float, default=1.3)
+    args = parser.parse_args()
+
+    results = {}
+    for name, axis, sizes, make, operation in OPERATIONS:
+        seconds = [measure(operation, make(size), args.budget)
+                   for size in sizes]
+        results[name] = {
+            axis: sizes,
+            'ms': [round(second * 1000, 4) for second in seconds],
+            'growth_exponent': round(growth_exponent(sizes, seconds), 2),
+        }
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+    too_slow = [name for name, result in results.items()
+                if result['growth_exponent'] > args.max_exponent]
+    if args.check and too_slow:
+        print('Superlinear: {}'.format(', '.join(too_slow)),
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
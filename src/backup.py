@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+import concurrent.futures
+import datetime
+import gzip
+import hashlib
+import hmac
+import http.client
+import json
+import logging
+import os
+import time
+import urllib.parse
+from xml.etree import ElementTree
+
+from wire import Int64, MongoConnection, decode_document
+
+logger = logging.getLogger()
+
+SYSTEM_DATABASES = ('admin', 'config', 'local')
+COMPRESSION_SUFFIXES = {'gzip': '.gz'}
+S3_PART_SIZE = 8 * 1024 ** 2
+SECONDARY_PREFERRED = {'mode': 'secondaryPreferred'}
+EMPTY_SHA256 = hashlib.sha256(b'').hexdigest()
+
+
+def backup_name(now=None):
+    now = now or datetime.datetime.utcnow()
+    return now.strftime('mongodb-%Y%m%dT%H%M%SZ')
+
+
+def compression_of(key):
+    """Compression of a backup object, from its suffix."""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if key.endswith(suffix):
+            return compression
+    raise ValueError('Unknown compression of {}'.format(key))
+
+
+def decompress(compression, fileobj):
+    """Readable stream decompressing from fileobj."""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    raise ValueError('Unknown compression: {}'.format(compression))
+
+
+def compress(compression, fileobj):
+    """Writable stream compressing into fileobj, which it leaves open."""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=6)
+    raise ValueError('Unknown compression: {}'.format(compression))
+
+
+def canonical_query(query):
+    return '&'.join('{}={}'.format(urllib.parse.quote(name, safe='-_.~'),
+                                   urllib.parse.quote(value, safe='-_.~'))
+                    for name, value in sorted(query.items()))
+
+
+def sign_v4(method, host, path, query, headers, payload_hash, access_key,
+            secret_key, region, amz_date):
+    """AWS Signature Version 4 Authorization header of an S3 request.
+
+    headers must hold every header to sign except host, x-amz-date and
+    x-amz-content-sha256, which are signed from the arguments.
+    """
+    headers = {name.lower(): str(value).strip()
+               for name, value in headers.items()}
+    headers.update({'host': host, 'x-amz-date': amz_date,
+                    'x-amz-content-sha256': payload_hash})
+    signed_headers = ';'.join(sorted(headers))
+    canonical_request = '\n'.join([
+        method,
+        urllib.parse.quote(path, safe='/-_.~'),
+        canonical_query(query),
+        ''.join('{}:{}\n'.format(name, headers[name])
+                for name in sorted(headers)),
+        signed_headers,
+        payload_hash,
+    ])
+    scope = '{}/{}/s3/aws4_request'.format(amz_date[:8], region)
+    string_to_sign = '\n'.join([
+        'AWS4-HMAC-SHA256',
+        amz_date,
+        scope,
+        hashlib.sha256(canonical_request.encode('UTF-8')).hexdigest(),
+    ])
+    key = ('AWS4' + secret_key).encode('UTF-8')
+    for part in (amz_date[:8], region, 's3', 'aws4_request'):
+        key = hmac.new(key, part.encode('UTF-8'), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode('UTF-8'),
+                         hashlib.sha256).hexdigest()
+    return 'AWS4-HMAC-SHA256 Credential={}/{}, SignedHeaders={}, ' \
+           'Signature={}'.format(access_key, scope, signed_headers,
+                                 signature)
+
+
+class S3Error(OSError):
+    pass
+
+
+class DirectoryTarget:
+    """Backup objects as files below a directory, e.g. a mounted PVC."""
+
+    def __init__(self, path):
+        self._path = path
+
+    def location(self, key=''):
+        return os.path.join(self._path, key)
+
+    def open(self, key):
+        path = self.location(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return open(path, 'wb')
+
+    def read(self, key):
+        return open(self.location(key), 'rb')
+
+    def list(self, prefix):
+        """Keys of the files below prefix, relative to the directory."""
+        keys = []
+        for root, _, files in os.walk(self.location(prefix)):
+            keys += [os.path.relpath(os.path.join(root, name), self._path)
+                     for name in files]
+        return sorted(keys)
+
+
+class S3Target:
+    """Backup objects in an S3-compatible bucket, addressed path-style."""
+
+    def __init__(self, url, endpoint, access_key, secret_key,
+                 region='us-east-1', part_size=S3_PART_SIZE, timeout=60):
+        parsed = urllib.parse.urlparse(url)
+        self._bucket = parsed.netloc
+        self._prefix = parsed.path.strip('/')
+        endpoint = urllib.parse.urlparse(endpoint)
+        self._secure = endpoint.scheme == 'https'
+        self._host = endpoint.netloc
+        self._access_key = access_key
+        self._secret_key = secret_key
+        self._region = region or 'us-east-1'
+        self.part_size = part_size
+        self._timeout = timeout
+
+    def location(self, key=''):
+        return 's3://{}/{}'.format(self._bucket,
+                                   '/'.join(filter(None, [self._prefix,
+                                                          key])))
+
+    def connect(self):
+        if self._secure:
+            return http.client.HTTPSConnection(self._host,
+                                               timeout=self._timeout)
+        return http.client.HTTPConnection(self._host, timeout=self._timeout)
+
+    def _key(self, key):
+        return '/'.join(filter(None, [self._prefix, key]))
+
+    def request(self, connection, method, key, query=None, body=b'',
+                stream=False):
+        """Signed request on an object, returning (headers, body).
+
+        With stream, the body is the unread response. A key of None
+        addresses the bucket itself.
+        """
+        query = query or {}
+        path = '/{}/{}'.format(self._bucket,
+                               '' if key is None else self._key(key))
+        payload_hash = hashlib.sha256(body).hexdigest() if body \
+            else EMPTY_SHA256
+        amz_date = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+        headers = {
+            'Authorization': sign_v4(method, self._host, path, query, {},
+                                     payload_hash, self._access_key,
+                                     self._secret_key, self._region,
+                                     amz_date),
+            'x-amz-date': amz_date,
+            'x-amz-content-sha256': payload_hash,
+            'Content-Length': str(len(body)),
+        }
+        url = urllib.parse.quote(path, safe='/-_.~')
+        if query:
+            url += '?' + canonical_query(query)
+        connection.request(method, url, body=body, headers=headers)
+        response = connection.getresponse()
+        if stream and response.status < 300:
+            return response.headers, response
+        data = response.read()
+        if response.status >= 300:
+            raise S3Error('{} {} failed with {}: {}'.format(
+                method, path, response.status, data[:200]))
+        return response.headers, data
+
+    def open(self, key):
+        return S3Upload(self, key)
+
+    def read(self, key):
+        """Object body as a stream, read as it is consumed."""
+        _, response = self.request(self.connect(), 'GET', key, stream=True)
+        return response
+
+    def list(self, prefix):
+        """Keys of the objects below prefix, relative to the target."""
+        connection = self.connect()
+        keys = []
+        query = {'list-type': '2', 'prefix': self._key(prefix)}
+        try:
+            while True:
+                _, body = self.request(connection, 'GET', None, query)
+                root = ElementTree.fromstring(body)
+                token = None
+                for element in root.iter():
+                    tag = element.tag.rsplit('}', 1)[-1]
+                    if tag == 'Key':
+                        keys.append(element.text[len(self._key('')):]
+                                    .lstrip('/'))
+                    elif tag == 'NextContinuationToken':
+                        token = element.text
+                if not token:
+                    return sorted(keys)
+                query['continuation-token'] = token
+        finally:
+            connection.close()
+
+
+class S3Upload:
+    """Writable object uploaded in parts of part_size bytes.
+
+    Objects smaller than one part are sent with a single PUT, larger
+    ones as a multipart upload, so at most one part is held in memory.
+    """
+
+    def __init__(self, target, key):
+        self._target = target
+        self._key = key
+        self._connection = target.connect()
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self._target.part_size:
+            part = bytes(self._buffer[:self._target.part_size])
+            del self._buffer[:self._target.part_size]
+            self._upload_part(part)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _upload_part(self, part):
+        if self._upload_id is None:
+            _, body = self._target.request(self._connection, 'POST',
+                                           self._key, {'uploads': ''})
+            self._upload_id = next(
+                element.text for element in ElementTree.fromstring(body).iter()
+                if element.tag.endswith('UploadId'))
+        headers, _ = self._target.request(
+            self._connection, 'PUT', self._key,
+            {'partNumber': str(len(self._parts) + 1),
+             'uploadId': self._upload_id},
+            part)
+        self._parts.append(headers['ETag'])
+
+    def close(self):
+        try:
+            if self._upload_id is None:
+                self._target.request(self._connection, 'PUT', self._key,
+                                     body=bytes(self._buffer))
+                return
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+            parts = ''.join(
+                '<Part><PartNumber>{}</PartNumber><ETag>{}</ETag></Part>'
+                .format(number, etag)
+                for number, etag in enumerate(self._parts, 1))
+            self._target.request(
+                self._connection, 'POST', self._key,
+                {'uploadId': self._upload_id},
+                '<CompleteMultipartUpload>{}</CompleteMultipartUpload>'
+                .format(parts).encode('UTF-8'))
+        finally:
+            self._buffer = bytearray()
+            self._connection.close()
+
+    def abort(self):
+        try:
+            if self._upload_id is not None:
+                self._target.request(self._connection, 'DELETE', self._key,
+                                     {'uploadId': self._upload_id})
+        except OSError as e:
+            logger.warning('Could not abort upload of {}: {}'
+                           .format(self._key, e))
+        finally:
+            self._connection.close()
+
+
+def make_target(location, config):
+    """Backup target for an s3:// URL or a directory path."""
+    if location.startswith('s3://'):
+        if not config.get('backup-s3-endpoint'):
+            raise ValueError('s3 targets need backup-s3-endpoint')
+        return S3Target(location,
+                        config['backup-s3-endpoint'],
+                        config.get('backup-s3-access-key', ''),
+                        config.get('backup-s3-secret-key', ''),
+                        config.get('backup-s3-region'))
+    if location.startswith('file://'):
+        location = location[len('file://'):]
+    return DirectoryTarget(location)
+
+
+class _CountingWriter:
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.count = 0
+
+    def write(self, data):
+        self.count += len(data)
+        return self._fileobj.write(data)
+
+    def flush(self):
+        self._fileobj.flush()
+
+
+class Backup:
+    """Parallel dump of every user collection, read from a secondary.
+
+    Each collection is streamed batch by batch through the compressor
+    into its own target object, laid out as mongodump --gzip does:
+    <name>/<db>/<collection>.bson<suffix> and .metadata.json<suffix>.
+    """
+
+    def __init__(self, seeds, target, compression='gzip', parallelism=4,
+                 batch_size=1000, timeout=30):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError('Unknown compression: {}'.format(compression))
+        self._seeds = list(seeds)
+        self._target = target
+        self._compression = compression
+        self._parallelism = max(int(parallelism), 1)
+        self._batch_size = batch_size
+        self._timeout = timeout
+
+    def _connect(self, host):
+        address, port = host.rsplit(':', 1)
+        return MongoConnection(address, int(port), self._timeout)
+
+    def _source(self):
+        """A secondary to read from, or the primary when there is none."""
+        primary = None
+        for seed in self._seeds:
+            try:
+                with self._connect(seed) as connection:
+                    reply = connection.command({'isMaster': 1})
+            except OSError as e:
+                logger.debug('Seed {} unreachable: {}'.format(seed, e))
+                continue
+            if reply.get('secondary') and not reply.get('hidden'):
+                return seed
+            if reply.get('ismaster') and primary is None:
+                primary = seed
+        if primary is None:
+            raise ConnectionError('No member to back up from')
+        return primary
+
+    def _cursor(self, connection, command, db, collection=None):
+        """Encoded documents of a cursor, one batch at a time."""
+        command = dict(command, **{'$readPreference': SECONDARY_PREFERRED})
+        cursor = connection.command(command, db,
+                                    ('firstBatch', 'nextBatch'))['cursor']
+        batch = cursor['firstBatch']
+        while True:
+            yield batch
+            if not cursor['id']:
+                return
+            cursor = connection.command(
+                {'getMore': Int64(cursor['id']),
+                 'collection': collection or cursor['ns'].split('.', 1)[1],
+                 'batchSize': self._batch_size,
+                 '$readPreference': SECONDARY_PREFERRED},
+                db, ('firstBatch', 'nextBatch'))['cursor']
+            batch = cursor['nextBatch']
+
+    def _collections(self, connection):
+        databases = connection.command(
+            {'listDatabases': 1, 'nameOnly': True,
+             '$readPreference': SECONDARY_PREFERRED})['databases']
+        collections = []
+        for database in databases:
+            if database['name'] in SYSTEM_DATABASES:
+                continue
+            for batch in self._cursor(connection,
+                                      {'listCollections': 1,
+                                       'filter': {'type': 'collection'}},
+                                      database['name']):
+                for info in map(decode_document, batch):
+                    if not info['name'].startswith('system.'):
+                        collections.append((database['name'], info['name'],
+                                            info.get('options', {})))
+        return collections
+
+    def _write(self, key, chunks):
+        """Compress chunks into the object at key, returning its size."""
+        with self._target.open(key) as raw:
+            counter = _CountingWriter(raw)
+            with compress(self._compression, counter) as out:
+                for chunk in chunks:
+                    out.write(chunk)
+        return counter.count
+
+    def _dump(self, source, name, db, collection, options):
+        suffix = COMPRESSION_SUFFIXES[self._compression]
+        stats = {'documents': 0, 'bytes': 0}
+
+        def documents(connection):
+            for batch in self._cursor(connection,
+                                      {'find': collection,
+                                       'batchSize': self._batch_size},
+                                      db, collection):
+                stats['documents'] += len(batch)
+                data = b''.join(batch)
+                stats['bytes'] += len(data)
+                yield data
+
+        with self._connect(source) as connection:
+            indexes = [index for batch in self._cursor(
+                connection, {'listIndexes': collection}, db, collection)
+                for index in map(decode_document, batch)]
+            metadata = json.dumps({'options': options, 'indexes': indexes},
+                                  default=str).encode('UTF-8')
+            base = '{}/{}/{}'.format(name, db, collection)
+            compressed = self._write(base + '.metadata.json' + suffix,
+                                     [metadata])
+            compressed += self._write(base + '.bson' + suffix,
+                                      documents(connection))
+        stats['compressed-bytes'] = compressed
+        return stats
+
+    def run(self, name=None, progress=None):
+        """Dump every collection and return the action results.
+
+        progress, when given, is called with a message as each
+        collection completes.
+        """
+        name = name or backup_name()
+        started = time.monotonic()
+        source = self._source()
+        with self._connect(source) as connection:
+            collections = self._collections(connection)
+        totals = {'documents': 0, 'bytes': 0, 'compressed-bytes': 0}
+        with concurrent.futures.ThreadPoolExecutor(
+                self._parallelism) as executor:
+            futures = {
+                executor.submit(self._dump, source, name, *collection):
+                '{}.{}'.format(*collection)
+                for collection in collections
+            }
+            for done, future in enumerate(
+                    concurrent.futures.as_completed(futures), 1):
+                stats = future.result()
+                for key in totals:
+                    totals[key] += stats[key]
+                if progress:
+                    progress('{} ({}/{}): {} documents'.format(
+                        futures[future], done, len(futures),
+                        stats['documents']))
+        seconds = max(time.monotonic() - started, 1e-6)
+        return {
+            'name': name,
+            'location': self._target.location(name),
+            'source': source,
+            'compression': self._compression,
+            'collections': len(collections),
+            'documents': totals['documents'],
+            'bytes': totals['bytes'],
+            'compressed-bytes': totals['compressed-bytes'],
+            'seconds': round(seconds, 3),
+            'throughput-mb-s': round(totals['bytes'] / seconds / 10 ** 6, 3),
+        }
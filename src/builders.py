@@ -1,4 +1,63 @@
 #!/usr/bin/env python3
+import logging
+import re
+
+import wire
+
+logger = logging.getLogger()
+
+# Hex dumps of BSON elements in mongod replies
+PING_OK = '016f6b00000000000000f03f'  # ok: 1.0
+IS_PRIMARY = '0869736d61737465720001'  # ismaster: true
+IS_SECONDARY = '087365636f6e646172790001'  # secondary: true
+
+MAX_VOTING_MEMBERS = 7
+
+CLUSTER_ROLES = ('replicaset', 'configsvr', 'shardsvr', 'mongos')
+
+# Client defaults published on the mongo relation, as
+# (config option, URI option, relation field)
+CLIENT_OPTIONS = (
+    ('client-max-pool-size', 'maxPoolSize', 'max_pool_size'),
+    ('client-min-pool-size', 'minPoolSize', 'min_pool_size'),
+    ('client-max-idle-time-ms', 'maxIdleTimeMS', 'max_idle_time_ms'),
+    ('client-compressors', 'compressors', 'compressors'),
+    ('client-read-preference', 'readPreference', 'read_preference'),
+    ('client-write-concern', 'w', 'write_concern'),
+    ('client-retry-writes', 'retryWrites', 'retry_writes'),
+)
+
+# Read preference tag set of the members serving analytics clients
+ANALYTICS_TAGS = 'nodeType:ANALYTICS'
+ROLE_OPTIONS = (
+    ('analytics-tags', 'readPreferenceTags', 'read_preference_tags'),
+)
+CLIENT_ROLES = ('oltp', 'analytics', 'read-only')
+
+MEMORY_UNITS = {
+    '': 1,
+    'k': 10 ** 3, 'M': 10 ** 6, 'G': 10 ** 9, 'T': 10 ** 12,
+    'Ki': 2 ** 10, 'Mi': 2 ** 20, 'Gi': 2 ** 30, 'Ti': 2 ** 40,
+}
+
+
+def parse_memory(quantity):
+    """Bytes in a Kubernetes memory quantity such as 512Mi or 2G."""
+    match = re.fullmatch(r'\s*([0-9.]+)\s*(Ki|Mi|Gi|Ti|k|M|G|T)?\s*',
+                         str(quantity))
+    if not match:
+        raise ValueError('Invalid memory quantity: {}'.format(quantity))
+    return float(match.group(1)) * MEMORY_UNITS[match.group(2) or '']
+
+
+def wiredtiger_cache_size_gb(memory_limit):
+    """WiredTiger cache size mongod would pick on a host of this size.
+
+    mongod uses the larger of 50% of (RAM - 1 GB) and 256 MB, but reads
+    RAM from the node rather than from the container limit.
+    """
+    memory_gb = parse_memory(memory_limit) / 2 ** 30
+    return round(max(0.25, 0.5 * (memory_gb - 1)), 2)
 
 
 class MongoBuilder:
@@ -8,69 +67,412 @@ class MongoBuilder:
         self._config = config
         self._images = images
         self._units = units
+        self._mongodb_uri = {}
+
+    @property
+    def units(self):
+        """Goal-state units, resolved on first use when given a callable."""
+        if callable(self._units):
+            self._units = self._units()
+        return self._units
 
     def build_spec(self):
+        """Pod spec for the configured cluster role.
+
+        Raises ValueError when the cluster options are inconsistent.
+        """
+        if self.cluster_role not in CLUSTER_ROLES:
+            raise ValueError('Unknown cluster-role: {}'.format(
+                self.cluster_role))
+        if self.cluster_role == 'mongos' and \
+                not self._config.get('config-server'):
+            raise ValueError('cluster-role mongos requires config-server')
+        if self.cluster_role in ('configsvr', 'shardsvr') and \
+                not self._config.get('manage-replica-set'):
+            # mongod runs neither role standalone
+            raise ValueError('cluster-role {} requires manage-replica-set'
+                             .format(self.cluster_role))
         return self.__make_pod_spec__(self._config['enable-sidecar'])
 
-    def build_relation_data(self, formatter):
-        return formatter.format(self.__make_mongodb_uri__())
-
-    def __make_mongodb_uri__(self):
-        mongo_uri = "mongodb://"
-        for i, unit in enumerate(self._units):
-            pod_base_name = unit.split('/')[0]
-            service_name = self._config['service-name']
-            pod_name = "{}-{}".format(pod_base_name, i)
-            if i:
-                mongo_uri += ","
-            mongo_uri += "{}.{}:{}".format(pod_name, service_name,
-                                           self._config['advertised-port'])
-        if self._config['enable-sidecar']:
-            mongo_uri += "/?replicaSet={}".format(self._config['replica-set'])
-        return mongo_uri
+    @property
+    def cluster_role(self):
+        return self._config.get('cluster-role') or 'replicaset'
+
+    @property
+    def replica_set_enabled(self):
+        if self.cluster_role == 'mongos':
+            return False
+        return bool(self._config['enable-sidecar']
+                    or self._config.get('manage-replica-set'))
+
+    @property
+    def member_hosts(self):
+        """host:port of every goal-state unit's pod, in ordinal order."""
+        service_name = self._config['service-name']
+        port = self._config['advertised-port']
+        return [
+            "{}-{}.{}:{}".format(unit.split('/')[0], i, service_name, port)
+            for i, unit in enumerate(self.units)
+        ]
+
+    @property
+    def analytics_tags(self):
+        """Analytics tag set as a dict, from 'key:value,...'."""
+        tags = self._config.get('analytics-tags', ANALYTICS_TAGS)
+        return dict(tag.split(':', 1) for tag in tags.split(',') if tag)
+
+    @property
+    def analytics_hidden(self):
+        """Whether analytics members are hidden; delayed ones must be."""
+        return bool(self._config.get('analytics-hidden')
+                    or self._config.get('analytics-delay-seconds', 0))
+
+    @property
+    def analytics_readable(self):
+        """Whether drivers can select members by the analytics tags.
+
+        Only the replica sets this charm manages are tagged, and at least
+        one member stays electable, untagged. Hidden members are
+        invisible to drivers and reached only by a direct connection.
+        """
+        if not self._config.get('manage-replica-set') or \
+                self.cluster_role == 'mongos' or not self.analytics_tags or \
+                self.analytics_hidden:
+            return False
+        return min(self._config.get('analytics-members', 0),
+                   len(self.units) - 1) > 0
+
+    def build_replica_set_config(self):
+        """Desired replica set members, without the config version.
+
+        The analytics-members highest ordinals are priority 0, non-voting
+        members tagged with analytics-tags, optionally hidden and delayed.
+        At least one member stays electable. A replica set allows at most
+        seven voting members, so the seven lowest ordinals vote and the
+        others are non-voting with priority 0. The result depends only on
+        the goal-state units, so every scale event is applied in one pass,
+        one reconfig per voting member added or removed.
+        """
+        hosts = self.member_hosts
+        electable = max(len(hosts) - self._config.get('analytics-members', 0),
+                        1)
+        hidden = self.analytics_hidden
+        delay = self._config.get('analytics-delay-seconds', 0)
+        members = []
+        for i, host in enumerate(hosts):
+            voting = i < min(electable, MAX_VOTING_MEMBERS)
+            member = {
+                'host': host,
+                'priority': 1 if voting else 0,
+                'votes': 1 if voting else 0,
+                'hidden': False,
+                'tags': {},
+            }
+            if i >= electable:
+                member['hidden'] = hidden
+                member['tags'] = self.analytics_tags
+                if delay:
+                    member['secondaryDelaySecs'] = delay
+            members.append(member)
+        config = {
+            '_id': self._config['replica-set'],
+            'members': members,
+        }
+        if self.cluster_role == 'configsvr':
+            config['configsvr'] = True
+        return config
+
+    def build_relation_data(self, formatter, role=None):
+        """Relation data of a client, tuned to the role it requested."""
+        role = self.__make_client_role__(role)
+        if role == 'analytics' and self.analytics_hidden and \
+                self._config.get('analytics-members', 0):
+            logger.warning('Analytics members are hidden from drivers, '
+                           'analytics clients read from any secondary')
+        if role not in self._mongodb_uri:
+            if self._config.get('connection-uri-format') == 'srv':
+                self._mongodb_uri[role] = (
+                    self.__make_mongodb_srv_uri__(role),
+                    self.__make_mongodb_service_uri__(role))
+            else:
+                self._mongodb_uri[role] = (self.__make_mongodb_uri__(role),)
+        # Every field is published, unset ones as '' which Juju removes,
+        # so that an option reset to its default does not linger.
+        client_options = {field: '' for _, _, field
+                          in CLIENT_OPTIONS + ROLE_OPTIONS}
+        client_options.update((field, value) for _, field, value
+                              in self.__make_client_options__(role))
+        return formatter.format(*self._mongodb_uri[role],
+                                client_options=client_options)
+
+    def __make_client_role__(self, role):
+        if role and role not in CLIENT_ROLES:
+            logger.warning('Unknown client role {}, using oltp'.format(role))
+            return 'oltp'
+        return role or 'oltp'
+
+    def __make_client_options__(self, role='oltp'):
+        """(URI option, relation field, value) of every client option set.
+
+        An empty string or 0 leaves the option to the driver default.
+        Read-only clients prefer secondaries. Analytics clients read only
+        from the members tagged with analytics-tags; without such members,
+        a tag set would fail every read, so they prefer secondaries too.
+        """
+        values = {key: self._config.get(key) for key, _, _ in CLIENT_OPTIONS}
+        if role == 'read-only' or \
+                role == 'analytics' and not self.analytics_readable:
+            values['client-read-preference'] = 'secondaryPreferred'
+        elif role == 'analytics':
+            values['client-read-preference'] = 'secondary'
+            values['analytics-tags'] = self._config.get(
+                'analytics-tags', ANALYTICS_TAGS)
+        options = []
+        for key, uri_option, field in CLIENT_OPTIONS + ROLE_OPTIONS:
+            value = values.get(key)
+            if value not in (None, '', 0):
+                options.append((uri_option, field, str(value)))
+        return options
+
+    def __make_uri_options__(self, options=None, role='oltp'):
+        options = list(options or [])
+        if self.replica_set_enabled:
+            options.insert(0, "replicaSet={}".format(
+                self._config['replica-set']))
+        options += ["{}={}".format(uri_option, value) for uri_option, _, value
+                    in self.__make_client_options__(role)]
+        if not options:
+            return ""
+        return "/?" + "&".join(options)
+
+    def __make_service_fqdn__(self):
+        return "{}.{}.svc.{}".format(self._config['service-name'],
+                                     self._config['namespace'],
+                                     self._config['cluster-domain'])
+
+    def __make_mongodb_uri__(self, role='oltp'):
+        return "mongodb://" + ",".join(self.member_hosts) + \
+            self.__make_uri_options__(role=role)
+
+    def __make_mongodb_srv_uri__(self, role='oltp'):
+        """Seed list resolved from the SRV records of the headless service.
+
+        The URI does not change when units are added or removed. SRV
+        connection strings default to TLS, which the pods do not serve.
+        """
+        return "mongodb+srv://{}{}".format(
+            self.__make_service_fqdn__(),
+            self.__make_uri_options__(["tls=false"], role))
+
+    def __make_mongodb_service_uri__(self, role='oltp'):
+        """Standard-format fallback seeded from the headless service name."""
+        return "mongodb://{}:{}{}".format(
+            self.__make_service_fqdn__(),
+            self._config['advertised-port'],
+            self.__make_uri_options__(role=role))
+
+    def __make_port_spec__(self):
+        port = {
+            'containerPort': self._config['advertised-port'],
+            'protocol': 'TCP',
+        }
+        if self._config.get('connection-uri-format') == 'srv':
+            # SRV records of the headless service are published per
+            # named port, as _mongodb._tcp.<service>.
+            port['name'] = 'mongodb'
+        return port
+
+    def __make_mongos_command__(self):
+        return [
+            'mongos',
+            '--bind_ip',
+            '0.0.0.0',
+            '--port',
+            str(self._config['advertised-port']),
+            '--configdb',
+            self._config['config-server'],
+        ]
+
+    def __make_mongod_command__(self):
+        if self.cluster_role == 'mongos':
+            return self.__make_mongos_command__()
+        command = [
+            'mongod',
+            '--bind_ip',
+            '0.0.0.0',
+        ]
+        if self.cluster_role in ('configsvr', 'shardsvr'):
+            # Both roles move the default port away from 27017.
+            command += ['--' + self.cluster_role,
+                        '--port', str(self._config['advertised-port'])]
+        if self._config.get('manage-replica-set'):
+            command += ['--replSet', self._config['replica-set']]
+        cache_size_gb = self._config.get('wiredtiger-cache-size-gb')
+        if not cache_size_gb and self._config.get('memory-limit'):
+            cache_size_gb = wiredtiger_cache_size_gb(
+                self._config['memory-limit'])
+        if cache_size_gb:
+            command += ['--wiredTigerCacheSizeGB', str(cache_size_gb)]
+        if self._config.get('journal-compressor'):
+            command += ['--wiredTigerJournalCompressor',
+                        self._config['journal-compressor']]
+        if self._config.get('block-compressor'):
+            command += ['--wiredTigerCollectionBlockCompressor',
+                        self._config['block-compressor']]
+        return command
+
+    def __make_wire_check__(self, command, pattern):
+        """Shell check of a mongod reply without the mongo shell.
+
+        bash sends the command as an OP_MSG through /dev/tcp and matches
+        the hex dump of the reply against pattern, so a probe costs a few
+        small processes instead of a JavaScript shell.
+        """
+        message = ''.join('\\x{:02x}'.format(byte)
+                          for byte in wire.op_msg(command))
+        return "exec 3<>/dev/tcp/127.0.0.1/{port}" \
+               " && printf '{message}' >&3" \
+               " && len=$(head -c 4 <&3 | od -An -tu4 | tr -d ' \\n')" \
+               " && [ -n \"$len\" ]" \
+               " && head -c $((len - 4)) <&3 | od -An -tx1 | tr -d ' \\n'" \
+               " | grep -qE '{pattern}'".format(
+                   port=self._config['advertised-port'],
+                   message=message,
+                   pattern=pattern)
+
+    def __make_lag_check__(self, max_lag):
+        """Shell check that this member is at most max_lag seconds behind.
+
+        Hidden and analytics-tagged members serve no OLTP reads and may
+        be delayed on purpose, so they pass regardless of lag. Needs
+        optimes from replSetGetStatus, so it runs the mongo shell.
+        """
+        analytics = " && ".join(
+            "h.tags['{}'] == '{}'".format(key, value)
+            for key, value in sorted(self.analytics_tags.items())) or 'false'
+        script = "var h = db.isMaster();" \
+                 " if (h.hidden || (h.tags && {})) quit(0);" \
+                 " var s = rs.status();" \
+                 " var me = s.members.filter(" \
+                 "function (m) {{ return m.self; }})[0];" \
+                 " var p = s.members.filter(" \
+                 "function (m) {{ return m.state == 1; }})[0];" \
+                 " quit(me.state == 1 || (p && p.optimeDate - me.optimeDate" \
+                 " <= {} * 1000) ? 0 : 1);".format(analytics, max_lag)
+        return 'mongo --quiet --port {} --eval "{}"'.format(
+            self._config['advertised-port'], script)
+
+    def __make_probe_timings__(self, probe, **defaults):
+        """Probe timings from the <probe>-probe-* options.
+
+        A value of 0 leaves the field to the Kubernetes default.
+        """
+        timings = {}
+        for field, option in (('initialDelaySeconds', 'initial-delay'),
+                              ('periodSeconds', 'period'),
+                              ('timeoutSeconds', 'timeout'),
+                              ('failureThreshold', 'failure-threshold')):
+            value = self._config.get('{}-probe-{}'.format(probe, option),
+                                     defaults.get(option.replace('-', '_')))
+            if value:
+                timings[field] = value
+        return timings
+
+    def __make_liveness_probe__(self):
+        if self._config.get('liveness-probe-mode') == 'ping':
+            command = [
+                '/bin/bash',
+                '-c',
+                self.__make_wire_check__({'ping': 1, '$db': 'admin'},
+                                         PING_OK),
+            ]
+        else:
+            command = [
+                '/bin/sh',
+                '-c',
+                'mongo --port ' +
+                str(self._config['advertised-port']) +
+                ' --eval "rs.status()" | grep -vq "REMOVED"',
+            ]
+        probe = {
+            'exec': {
+                'command': command},
+        }
+        probe.update(self.__make_probe_timings__(
+            'liveness', initial_delay=45, timeout=5))
+        return probe
+
+    def __make_readiness_probe__(self):
+        """Ready only as PRIMARY or SECONDARY, optionally with bounded lag."""
+        check = self.__make_wire_check__(
+            {'isMaster': 1, '$db': 'admin'},
+            '{}|{}'.format(IS_PRIMARY, IS_SECONDARY))
+        max_lag = self._config.get('readiness-max-lag-seconds')
+        if max_lag and self.cluster_role != 'mongos':
+            check += ' && ' + self.__make_lag_check__(max_lag)
+        probe = {
+            'exec': {
+                'command': ['/bin/bash', '-c', check]},
+        }
+        probe.update(self.__make_probe_timings__(
+            'readiness', initial_delay=10, period=5, timeout=5))
+        return probe
+
+    def __make_startup_probe__(self):
+        """Hold off the other probes until mongod answers a ping.
+
+        The failure threshold times the period bounds how long startup,
+        including WiredTiger recovery of a large data set, may take. A
+        failure threshold of 0 disables the probe.
+        """
+        timings = self.__make_probe_timings__(
+            'startup', period=10, timeout=5, failure_threshold=360)
+        if 'failureThreshold' not in timings:
+            return None
+        probe = {
+            'exec': {
+                'command': [
+                    '/bin/bash',
+                    '-c',
+                    self.__make_wire_check__({'ping': 1, '$db': 'admin'},
+                                             PING_OK),
+                ]},
+        }
+        probe.update(timings)
+        return probe
+
+    def __make_resources_spec__(self):
+        resources = {}
+        for kind in ('requests', 'limits'):
+            for resource in ('cpu', 'memory'):
+                value = self._config.get('{}-{}'.format(resource, kind[:-1]))
+                if value:
+                    resources.setdefault(kind, {})[resource] = value
+        return resources
 
     def __make_container_spec__(self):
-        return {
+        spec = {
             'name': self._app_name,
             'imageDetails': {
                 'imagePath': self._images['mongodb-image'].image_path,
                 'username': self._images['mongodb-image'].username,
                 'password': self._images['mongodb-image'].password,
             },
-            'command': [
-                'mongod',
-                '--bind_ip',
-                '0.0.0.0',
-            ],
-            'ports': [{
-                'containerPort':
-                    self._config['advertised-port'],
-                    'protocol': 'TCP',
-            }],
+            'command': self.__make_mongod_command__(),
+            'ports': [self.__make_port_spec__()],
             'config': {
                 'ALLOW_ANONYMOUS_LOGIN': 'yes'
             },
-            'readinessProbe': {
-                'tcpSocket': {
-                    'port': self._config['advertised-port'],
-                },
-                'timeoutSeconds': 5,
-                'periodSeconds': 5,
-                'initialDelaySeconds': 10,
-            },
-            'livenessProbe': {
-                'exec': {
-                    'command': [
-                        '/bin/sh',
-                        '-c',
-                        'mongo --port ' +
-                        str(self._config['advertised-port']) +
-                        ' --eval "rs.status()" | grep -vq "REMOVED"',
-                    ]},
-                'initialDelaySeconds': 45,
-                'timeoutSeconds': 5,
-            }
+            'readinessProbe': self.__make_readiness_probe__(),
+            'livenessProbe': self.__make_liveness_probe__(),
         }
+        startup_probe = self.__make_startup_probe__()
+        if startup_probe:
+            spec['startupProbe'] = startup_probe
+        resources = self.__make_resources_spec__()
+        if resources:
+            spec['resources'] = resources
+        return spec
 
     def __make_sidecar_spec__(self):
         pod_labels = "juju-app={}".format(self._config['advertised-hostname'])
@@ -9,12 +9,16 @@ from ops.main import main
 
 from resources import OCIImageResource
 from wrapper import FrameworkWrapper
-from k8s import K8sPod, K8sPvc
 from observers import (
+    BackupObserver,
     ConfigChangeObserver,
+    PvcCleanupObserver,
     RemovalObserver,
+    RestoreObserver,
     StatusObserver,
     RelationObserver,
+    ReplicaSetObserver,
+    ShardingObserver,
 )
 from mongodb_interface_provides import MongoDbServer
 from builders import MongoBuilder, K8sBuilder
@@ -28,39 +32,107 @@ class MongoDbCharm(CharmBase):
 
     def __init__(self, *args):
         super().__init__(*args)
+        self._state.set_default(spec_hash=None, spec_set_skipped=0,
+                                image_cache={}, desired_hash=None,
+                                generation=0, reconciled_generation=None,
+                                reconcile_skipped=0)
         self._framework_wrapper = FrameworkWrapper(self.framework, self._state)
-        self._resources = {
-            'mongodb-image': OCIImageResource('mongodb-image')
-        }
-
-        self._mongo_builder = MongoBuilder(
-            self._framework_wrapper.app_name,
-            self._framework_wrapper.config,
-            self._resources,
-            self._framework_wrapper.goal_state_units
-        )
-
-        if self._framework_wrapper.config['enable-sidecar']:
-            self._resources['mongodb-sidecar-image'] = OCIImageResource(
-                'mongodb-sidecar-image')
-
-        self._pod = K8sPod(self._framework_wrapper.app_name)
-        self._pvc = K8sPvc(self._framework_wrapper.app_name)
+        # Built by the first delegator needing them, see _subsystem
+        self._subsystems = {}
         self._mongodb = MongoDbServer(self, "mongo")
 
-        self._k8s_builder = K8sBuilder(self._pvc)
-
         delegators = [
             (self.on.start, self.on_config_changed_delegator),
             (self.on.upgrade_charm, self.on_config_changed_delegator),
             (self.on.config_changed, self.on_config_changed_delegator),
+            (self.on.leader_elected, self.on_config_changed_delegator),
             (self.on.update_status, self.on_update_status_delegator),
             (self._mongodb.on.new_client, self.on_new_client_delegator),
+            # Clients may request a role after joining
+            (self.on.mongo_relation_changed, self.on_new_client_delegator),
+            (self.on.config_changed, self.on_membership_changed_delegator),
+            (self.on.upgrade_charm, self.on_membership_changed_delegator),
+            (self.on.replicas_relation_joined,
+             self.on_membership_changed_delegator),
+            (self.on.replicas_relation_departed,
+             self.on_membership_changed_delegator),
+            (self.on.leader_elected, self.on_replica_set_delegator),
+            (self.on.config_changed, self.on_replica_set_delegator),
+            (self.on.replicas_relation_joined, self.on_replica_set_delegator),
+            (self.on.replicas_relation_departed,
+             self.on_replica_set_delegator),
+            (self.on.leader_elected, self.on_sharding_delegator),
+            (self.on.config_changed, self.on_sharding_delegator),
+            (self.on.replicas_relation_joined, self.on_sharding_delegator),
             (self.on.remove_pvc_action, self.on_remove_pvc_action_delegator),
+            (self.on.cleanup_pvcs_action,
+             self.on_cleanup_pvcs_action_delegator),
+            (self.on.backup_action, self.on_backup_action_delegator),
+            (self.on.restore_action, self.on_restore_action_delegator),
         ]
         for delegator in delegators:
             self.framework.observe(delegator[0], delegator[1])
 
+    def _subsystem(self, name, build):
+        """The named subsystem, built on first use within a hook.
+
+        Most hooks need only a few of them, so none is imported or built
+        before a delegator asks for it. Delegators of observers that never
+        look at the pod pass None for it, sparing the Kubernetes client.
+        """
+        if name not in self._subsystems:
+            self._subsystems[name] = build()
+        return self._subsystems[name]
+
+    @property
+    def _resources(self):
+        def build():
+            resources = {
+                'mongodb-image': OCIImageResource('mongodb-image')
+            }
+            if self._framework_wrapper.config['enable-sidecar']:
+                resources['mongodb-sidecar-image'] = OCIImageResource(
+                    'mongodb-sidecar-image')
+            return resources
+        return self._subsystem('resources', build)
+
+    @property
+    def _mongo_builder(self):
+        return self._subsystem('mongo_builder', lambda: MongoBuilder(
+            self._framework_wrapper.app_name,
+            self._framework_wrapper.config,
+            self._resources,
+            lambda: self._framework_wrapper.goal_state_units
+        ))
+
+    @property
+    def _snapshot(self):
+        def build():
+            # The Kubernetes client pulls in ssl and http.client
+            from k8s import K8sCache, K8sSnapshot
+            return K8sSnapshot(
+                self._framework_wrapper.app_name,
+                K8sCache(self.framework.charm_dir / '.k8s-cache.json'))
+        return self._subsystem('snapshot', build)
+
+    @property
+    def _pod(self):
+        def build():
+            from k8s import K8sPod
+            return K8sPod(self._framework_wrapper.app_name, self._snapshot)
+        return self._subsystem('pod', build)
+
+    @property
+    def _pvc(self):
+        def build():
+            from k8s import K8sPvc
+            return K8sPvc(self._framework_wrapper.app_name, self._snapshot)
+        return self._subsystem('pvc', build)
+
+    @property
+    def _k8s_builder(self):
+        return self._subsystem('k8s_builder', lambda: K8sBuilder(self._pvc))
+
     def on_config_changed_delegator(self, event):
         logger.info('on_config_changed_delegator({})'.format(event))
         return ConfigChangeObserver(
@@ -78,12 +150,63 @@ class MongoDbCharm(CharmBase):
             self._pvc,
             self._k8s_builder).handle(event)
 
+    def on_cleanup_pvcs_action_delegator(self, event):
+        logger.info('on_cleanup_pvcs_action_delegator({})'.format(event))
+        return PvcCleanupObserver(
+            self._framework_wrapper,
+            self._resources,
+            self._pod,
+            self._pvc,
+            self._mongo_builder).handle(event)
+
+    def on_backup_action_delegator(self, event):
+        logger.info('on_backup_action_delegator({})'.format(event))
+        return BackupObserver(
+            self._framework_wrapper,
+            self._resources,
+            None,
+            self._mongo_builder).handle(event)
+
+    def on_restore_action_delegator(self, event):
+        logger.info('on_restore_action_delegator({})'.format(event))
+        return RestoreObserver(
+            self._framework_wrapper,
+            self._resources,
+            None,
+            self._mongo_builder).handle(event)
+
     def on_new_client_delegator(self, event):
         logger.info('on_relation_changed_delegator({})'.format(event))
         return RelationObserver(
             self._framework_wrapper,
             self._resources,
-            self._pod,
+            None,
+            self._mongo_builder,
+            self._mongodb).handle(event)
+
+    def on_membership_changed_delegator(self, event):
+        logger.info('on_membership_changed_delegator({})'.format(event))
+        return RelationObserver(
+            self._framework_wrapper,
+            self._resources,
+            None,
+            self._mongo_builder,
+            self._mongodb).handle(event)
+
+    def on_replica_set_delegator(self, event):
+        logger.info('on_replica_set_delegator({})'.format(event))
+        return ReplicaSetObserver(
+            self._framework_wrapper,
+            self._resources,
+            None,
+            self._mongo_builder).handle(event)
+
+    def on_sharding_delegator(self, event):
+        logger.info('on_sharding_delegator({})'.format(event))
+        return ShardingObserver(
+            self._framework_wrapper,
+            self._resources,
+            None,
             self._mongo_builder).handle(event)
 
     def on_update_status_delegator(self, event):
@@ -1,64 +1,398 @@
 #!/usr/bin/env python3
+import concurrent.futures
 import json
 import http.client
 import os
 import ssl
+import threading
+import time
+import urllib.parse
+
+
+SERVICE_ACCOUNT_TOKEN = '/var/run/secrets/kubernetes.io/serviceaccount/token'
+SERVICE_ACCOUNT_CA = '/var/run/secrets/kubernetes.io/serviceaccount/ca.crt'
+API_SERVER = 'kubernetes.default.svc'
+LIST_PAGE_SIZE = 100
+CACHE_TTL = 900
+PARTIAL_METADATA = 'application/json;as=PartialObjectMetadata;' \
+                   'g=meta.k8s.io;v=v1,application/json'
+
+
+class K8sSession:
+    """Keep-alive HTTPS connection to the API server.
+
+    The token and CA are read once and reloaded only when the underlying
+    files change. A connection dropped by the server is reopened and the
+    request retried once.
+    """
+
+    RETRIABLE_ERRORS = (
+        http.client.RemoteDisconnected,
+        http.client.CannotSendRequest,
+        http.client.ResponseNotReady,
+        ConnectionResetError,
+        BrokenPipeError,
+    )
+
+    def __init__(self, host, token_path, ca_path):
+        self._host = host
+        self._token_path = token_path
+        self._ca_path = ca_path
+        self._token = None
+        self._ssl_context = None
+        self._signature = None
+        self._conn = None
+        self.connections = 0
+
+    def _file_signature(self):
+        signature = []
+        for path in (self._token_path, self._ca_path):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _load_credentials(self):
+        signature = self._file_signature()
+        if self._token is not None and signature is not None \
+                and signature == self._signature:
+            return
+
+        with open(self._token_path) as token_file:
+            self._token = token_file.read()
+
+        self._ssl_context = ssl.SSLContext()
+        self._ssl_context.load_verify_locations(self._ca_path)
+        self._signature = signature
+        self.close()
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = http.client.HTTPSConnection(self._host,
+                                                     context=self._ssl_context)
+            self.connections += 1
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def request(self, method, path, headers=None):
+        self._load_credentials()
+        headers = dict(headers or {})
+        headers['Authorization'] = f'Bearer {self._token}'
+
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method=method, url=path, headers=headers)
+                return conn.getresponse().read()
+            except self.RETRIABLE_ERRORS:
+                self.close()
+                if attempt:
+                    raise
 
 
 class K8sApi:
+    """Kubernetes API client sharing one session per process and thread.
 
-    def get(self, path):
-        return self.request('GET', path)
+    A keep-alive connection carries one request at a time, so threads
+    issuing requests concurrently each get their own session.
+    """
 
-    def delete(self, path):
-        return self.request('DELETE', path)
+    _sessions = {}
 
-    def request(self, method, path):
-        with open("/var/run/secrets/kubernetes.io/serviceaccount/token") \
-                as token_file:
-            kube_token = token_file.read()
+    def __init__(self, host=API_SERVER, token_path=SERVICE_ACCOUNT_TOKEN,
+                 ca_path=SERVICE_ACCOUNT_CA):
+        key = (host, token_path, ca_path, threading.get_ident())
+        if key not in self._sessions:
+            self._sessions[key] = K8sSession(host, token_path, ca_path)
+        self._session = self._sessions[key]
 
-        ssl_context = ssl.SSLContext()
-        ssl_context.load_verify_locations(
-            '/var/run/secrets/kubernetes.io/serviceaccount/ca.crt')
+    @classmethod
+    def close_all(cls):
+        for session in cls._sessions.values():
+            session.close()
+        cls._sessions.clear()
 
-        headers = {
-            'Authorization': f'Bearer {kube_token}'
-        }
+    @classmethod
+    def close_threads(cls, idents):
+        """Close and forget the sessions of the given, finished threads."""
+        for key in [key for key in cls._sessions if key[3] in idents]:
+            cls._sessions.pop(key).close()
 
-        conn = http.client.HTTPSConnection('kubernetes.default.svc',
-                                           context=ssl_context)
-        conn.request(method=method, url=path, headers=headers)
+    @property
+    def session(self):
+        return self._session
 
-        return json.loads(conn.getresponse().read())
+    def get(self, path, headers=None):
+        return self.request('GET', path, headers)
 
+    def delete(self, path):
+        return self.request('DELETE', path)
 
-class K8sPod:
+    def list(self, path, kind=None, limit=LIST_PAGE_SIZE):
+        """Yield the items of a list, fetching one page at a time.
+
+        Pages are requested with limit/continue, so only one page is held
+        in memory and a caller that stops iterating early never fetches
+        the remaining pages. Iteration ends on a response of another kind.
+        """
+        separator = '&' if '?' in path else '?'
+        token = None
+        while True:
+            page_path = f'{path}{separator}limit={limit}'
+            if token:
+                page_path += '&continue={}'.format(
+                    urllib.parse.quote(token, safe=''))
+            response = self.get(page_path)
+            if kind and response.get('kind', '') != kind:
+                return
+            yield from response.get('items') or []
+            token = response.get('metadata', {}).get('continue')
+            if not token:
+                return
+
+    def request(self, method, path, headers=None):
+        return json.loads(self._session.request(method, path, headers))
+
+
+class K8sListing:
+    """Items of a paged list, fetched on demand and kept for replay."""
+
+    def __init__(self, items):
+        self._pending = items
+        self._items = []
+
+    def __iter__(self):
+        index = 0
+        while True:
+            if index < len(self._items):
+                yield self._items[index]
+                index += 1
+                continue
+            if self._pending is None:
+                return
+            item = next(self._pending, None)
+            if item is None:
+                self._pending = None
+                return
+            self._items.append(item)
+
+
+class K8sCache:
+    """On-disk cache of pod and PVC objects kept between hooks.
+
+    Entries older than the TTL are dropped. Whoever reads an entry is
+    expected to confirm its resourceVersion with the API server first.
+    """
+
+    def __init__(self, path, ttl=CACHE_TTL):
+        self._path = str(path)
+        self._ttl = ttl
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self._path) as cache_file:
+                    self._entries = json.load(cache_file)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w') as cache_file:
+            json.dump(self._entries, cache_file)
+        os.replace(tmp_path, self._path)
+
+    def get(self, resource, name):
+        entry = self._load().get(resource, {}).get(name)
+        if entry is None or time.time() - entry['stored'] > self._ttl:
+            return None
+        return entry['object']
+
+    def put(self, resource, name, obj):
+        entries = self._load().setdefault(resource, {})
+        if obj is None:
+            if entries.pop(name, None) is None:
+                return
+        else:
+            entries[name] = {'stored': time.time(), 'object': obj}
+        self._save()
+
+    def invalidate(self):
+        self._entries = {}
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
+
+
+class K8sSnapshot:
+    """Per-hook view of the application's pods and PVCs.
 
-    def __init__(self, app_name):
+    Every resource kind is listed at most once and the result is shared by
+    all readers holding the same snapshot. A single unit's pod is looked up
+    by name, so the response does not grow with the number of replicas.
+    With a cache, objects looked up by name are served from it as long as
+    a metadata-only request shows an unchanged resourceVersion.
+    """
+
+    def __init__(self, app_name, cache=None):
         self._app_name = app_name
-        self._status = None
+        self._cache = cache
+        self._lists = {}
+        self._unit_pods = {}
 
-    def fetch(self):
+    def _path(self, resource, field_selector=None):
         namespace = os.environ["JUJU_MODEL_NAME"]
 
-        path = f'/api/v1/namespaces/{namespace}/pods?' \
+        path = f'/api/v1/namespaces/{namespace}/{resource}?' \
                f'labelSelector=juju-app={self._app_name}'
+        if field_selector:
+            path += f'&fieldSelector={field_selector}'
+        return path
 
+    def _get(self, resource, kind, field_selector=None):
         api_server = K8sApi()
-        response = api_server.get(path)
-
-        if response.get('kind', '') == 'PodList' and response['items']:
-            unit = os.environ['JUJU_UNIT_NAME']
-            status = next(
-                (i for i in response['items']
-                 if i['metadata']['annotations'].get('juju.io/unit') == unit),
-                None
-            )
-        else:
-            status = None
+        response = api_server.get(self._path(resource, field_selector))
+
+        if response.get('kind', '') == kind and response['items']:
+            return response['items']
+        return []
+
+    def _cached(self, resource, name, fetch):
+        if self._cache is not None:
+            cached = self._cache.get(resource, name)
+            if cached is not None:
+                namespace = os.environ["JUJU_MODEL_NAME"]
+                api_server = K8sApi()
+                metadata = api_server.get(
+                    f'/api/v1/namespaces/{namespace}/{resource}/{name}',
+                    headers={'Accept': PARTIAL_METADATA}
+                ).get('metadata', {})
+                version = metadata.get('resourceVersion')
+                if version and \
+                        version == cached['metadata'].get('resourceVersion'):
+                    return cached
+
+        obj = fetch()
+        if self._cache is not None:
+            self._cache.put(resource, name, obj)
+        return obj
+
+    def _list(self, resource, kind):
+        if resource not in self._lists:
+            api_server = K8sApi()
+            self._lists[resource] = K8sListing(
+                api_server.list(self._path(resource), kind))
+        return self._lists[resource]
 
-        self._status = status
+    @staticmethod
+    def _is_unit_pod(pod, unit):
+        return pod['metadata']['annotations'].get('juju.io/unit') == unit
+
+    @property
+    def pods(self):
+        return self._list('pods', 'PodList')
+
+    @property
+    def pvcs(self):
+        return self._list('persistentvolumeclaims',
+                          'PersistentVolumeClaimList')
+
+    def unit_pod(self, unit):
+        """Pod of the given unit.
+
+        Juju names the pods of a stateful application after its units, so
+        the pod is first requested by name. The application's pod list is
+        scanned only when it is already loaded or the name does not match.
+        """
+        if unit not in self._unit_pods:
+            pod = None
+            if 'pods' not in self._lists:
+                pod_name = unit.replace('/', '-')
+                pod = self._cached('pods', pod_name, lambda: next(
+                    (i for i in self._get('pods', 'PodList',
+                                          f'metadata.name={pod_name}')
+                     if self._is_unit_pod(i, unit)),
+                    None
+                ))
+            if pod is None:
+                pod = next(
+                    (i for i in self.pods if self._is_unit_pod(i, unit)),
+                    None
+                )
+            self._unit_pods[unit] = pod
+        return self._unit_pods[unit]
+
+    def pvc(self, name):
+        return self._cached('persistentvolumeclaims', name, lambda: next(
+            (i for i in self.pvcs if i['metadata']['name'] == name),
+            None
+        ))
+
+    @staticmethod
+    def _ordinal(name):
+        try:
+            return int(name.rsplit('-', 1)[1])
+        except (IndexError, ValueError):
+            return None
+
+    def orphaned_pvcs(self, unit_count):
+        """PVCs no pod of the application claims and no unit will reuse.
+
+        A PVC qualifies when no pod mounts it and either its ordinal is
+        past the application's unit_count or it has lost its volume. The
+        PVCs and pods are each listed once.
+        """
+        claimed = {
+            volume['persistentVolumeClaim']['claimName']
+            for pod in self.pods
+            for volume in pod['spec'].get('volumes', [])
+            if 'persistentVolumeClaim' in volume
+        }
+        orphaned = []
+        for pvc in self.pvcs:
+            name = pvc['metadata']['name']
+            if name in claimed:
+                continue
+            ordinal = self._ordinal(name)
+            if (ordinal is not None and ordinal >= unit_count) or \
+                    pvc.get('status', {}).get('phase') == 'Lost':
+                orphaned.append(pvc)
+        return orphaned
+
+    def invalidate(self):
+        """Drop everything read so far, including the on-disk cache.
+
+        Called after every write the charm makes to the cluster.
+        """
+        self._lists.clear()
+        self._unit_pods.clear()
+        if self._cache is not None:
+            self._cache.invalidate()
+
+
+class K8sPod:
+
+    def __init__(self, app_name, snapshot=None):
+        self._app_name = app_name
+        self._snapshot = snapshot or K8sSnapshot(app_name)
+        self._status = None
+
+    def fetch(self):
+        unit = os.environ['JUJU_UNIT_NAME']
+        self._status = self._snapshot.unit_pod(unit)
+
+    def invalidate(self):
+        self._status = None
+        self._snapshot.invalidate()
 
     def map_unit_to_pvc(self):
         if self.is_running:
@@ -91,32 +425,14 @@ class K8sPod:
 
 class K8sPvc:
 
-    def __init__(self, app_name):
+    def __init__(self, app_name, snapshot=None):
         self._app_name = app_name
+        self._snapshot = snapshot or K8sSnapshot(app_name)
         self._status = None
 
     def fetch(self):
-        namespace = os.environ["JUJU_MODEL_NAME"]
-
-        pods = K8sPod(self._app_name)
-
-        path = f'/api/v1/namespaces/{namespace}/persistentvolumeclaims?' \
-               f'labelSelector=juju-app={self._app_name}'
-
-        api_server = K8sApi()
-        response = api_server.get(path)
-
-        if response.get('kind', '') == 'PersistentVolumeClaimList' \
-                and response['items']:
-            status = next(
-                (i for i in response['items']
-                 if i['metadata']['name'] == pods.map_unit_to_pvc()),
-                None
-            )
-        else:
-            status = None
-
-        self._status = status
+        pvc_name = K8sPod(self._app_name, self._snapshot).map_unit_to_pvc()
+        self._status = self._snapshot.pvc(pvc_name) if pvc_name else None
 
     def delete(self):
         namespace = os.environ["JUJU_MODEL_NAME"]
@@ -128,6 +444,48 @@ class K8sPvc:
 
             api_server = K8sApi()
             api_server.delete(path)
+            self._snapshot.invalidate()
+            self._status = None
+
+    def delete_orphaned(self, unit_count, parallelism=8, dry_run=False):
+        """Delete every orphaned PVC of the application.
+
+        Deletes run concurrently on at most parallelism connections.
+        Returns the names of the deleted PVCs and a dict mapping the
+        names that could not be deleted to the reason. With dry_run,
+        nothing is deleted and every orphaned PVC is reported.
+        """
+        names = [pvc['metadata']['name']
+                 for pvc in self._snapshot.orphaned_pvcs(unit_count)]
+        if dry_run or not names:
+            return names, {}
+        namespace = os.environ["JUJU_MODEL_NAME"]
+
+        workers = set()
+
+        def delete(name):
+            workers.add(threading.get_ident())
+            try:
+                return K8sApi().delete(f'/api/v1/namespaces/{namespace}/'
+                                       f'persistentvolumeclaims/{name}')
+            except (OSError, ValueError, http.client.HTTPException) as e:
+                return {'kind': 'Status', 'status': 'Failure',
+                        'message': str(e) or type(e).__name__}
+
+        deleted, failed = [], {}
+        with concurrent.futures.ThreadPoolExecutor(parallelism) as executor:
+            responses = list(executor.map(delete, names))
+        # The worker threads are gone, so are the uses of their sessions
+        K8sApi.close_threads(workers)
+        for name, response in zip(names, responses):
+            if response.get('kind') == 'Status' and \
+                    response.get('status') == 'Failure' and \
+                    response.get('reason') != 'NotFound':
+                failed[name] = response.get('message', 'failed')
+            else:
+                deleted.append(name)
+        self._snapshot.invalidate()
+        return deleted, failed
 
     @property
     def is_running(self):
@@ -39,19 +39,30 @@ class MongoDbServer(Object):
         return self.model.relations[self.relation_name]
 
     def on_joined(self, event):
-        if event.app not in self.state.apps:
+        # Every unit of a client joins, a client is new only once
+        if event.app.name not in self.state.apps:
             self.state.apps.append(event.app.name)
             self.on.new_client.emit(MongoDbInterfaceClient(event.relation,
                                                            self.model.unit))
 
     def on_departed(self, event):
-        self.state.apps = [app.name for app in self._relations]
-
-    def clients(self):
+        self.state.apps = [relation.app.name for relation in self._relations
+                           if relation.app is not None]
+
+    def clients(self, relation=None):
+        """Clients of every relation, or only of relation when it is one.
+
+        Publishing for an event of one client relation then costs the
+        same however many other clients are related.
+        """
+        if relation is not None and relation.name == self.relation_name:
+            relations = [relation]
+        else:
+            relations = self._relations
         return [
             MongoDbInterfaceClient(
                 relation,
-                self.model.unit) for relation in self._relations]
+                self.model.unit) for relation in relations]
 
 
 class MongoDbInterfaceClient:
@@ -60,6 +71,10 @@ class MongoDbInterfaceClient:
         self._relation = relation
         self._local_unit = local_unit
 
+    @property
+    def relation(self):
+        return self._relation
+
     @property
     def name(self):
         return self._relation.name
@@ -68,6 +83,19 @@ class MongoDbInterfaceClient:
     def id(self):
         return self._relation.id
 
+    @property
+    def role(self):
+        """Role requested by the client units, or None for the default.
+
+        Clients set 'role' in their unit data to oltp, analytics or
+        read-only.
+        """
+        for unit in self._relation.units:
+            role = self._relation.data[unit].get('role')
+            if role:
+                return role
+        return None
+
     @property
     def formatter(self):
         return MongoDbInterfaceDataFormatter()
@@ -75,5 +103,9 @@ class MongoDbInterfaceClient:
 
 class MongoDbInterfaceDataFormatter:
 
-    def format(self, mongo_uri):
-        return {'connection_string': mongo_uri}
+    def format(self, mongo_uri, standard_uri=None, client_options=None):
+        # '' removes the field of a previous srv URI
+        data = {'connection_string': mongo_uri,
+                'standard_connection_string': standard_uri or ''}
+        data.update(client_options or {})
+        return data
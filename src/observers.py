@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 
 from abc import abstractmethod
+import hashlib
+import json
 import sys
 sys.path.append('lib')
+from ops.charm import LeaderElectedEvent, UpgradeCharmEvent
 from ops.model import (
     ActiveStatus,
     BlockedStatus,
@@ -11,6 +14,10 @@ from ops.model import (
 )
 import logging
 
+# backup, restore, replica_set and sharding are imported by the observers
+# using them, so that other hooks do not pay for their imports.
+from wire import MongoCommandError
+
 logger = logging.getLogger()
 
 
@@ -28,33 +35,102 @@ class BaseObserver:
 
 
 class ConfigChangeObserver(BaseObserver):
+    """Reconciles the pod with the configuration.
+
+    start, upgrade-charm and config-changed arrive in bursts, so the
+    desired configuration gets a generation number: a hook whose
+    generation was already reconciled does nothing. upgrade-charm always
+    starts a new generation, as the new charm or resources may change the
+    spec, and so does leader-elected: the hash of the last spec set is
+    unit-local, and other leaders may have set theirs in the meantime.
+    """
+
+    @staticmethod
+    def spec_hash(spec):
+        """Stable digest of a pod spec, independent of key order."""
+        return hashlib.sha256(
+            json.dumps(spec, sort_keys=True).encode('UTF-8')).hexdigest()
+
+    @staticmethod
+    def desired_hash(config, is_leader):
+        """Digest of the inputs the pod configuration is derived from."""
+        return hashlib.sha256(json.dumps(
+            {'config': dict(config), 'leader': is_leader},
+            sort_keys=True, default=str).encode('UTF-8')).hexdigest()
 
     def handle(self, event):
+        state = self._framework.state
+        is_leader = self._framework.unit_is_leader
+        desired_hash = self.desired_hash(self._framework.config, is_leader)
+        if isinstance(event, LeaderElectedEvent):
+            state.spec_hash = None
+        if desired_hash != state.desired_hash or \
+                isinstance(event, (UpgradeCharmEvent, LeaderElectedEvent)):
+            state.desired_hash = desired_hash
+            state.generation += 1
+        elif state.reconciled_generation == state.generation:
+            state.reconcile_skipped += 1
+            logger.debug('Generation {} already reconciled, skipped {} times'
+                         .format(state.generation, state.reconcile_skipped))
+            return
+
+        # Plain copies: stored state only takes simple types, not the
+        # StoredDict and StoredList wrappers it hands out.
+        image_cache = {
+            name: {'signature': list(entry['signature']),
+                   'hash': entry['hash'],
+                   'image': dict(entry['image'])}
+            for name, entry in (state.image_cache or {}).items()
+        }
         for resource in self._resources.keys():
-            if not self._resources[resource].fetch(self._framework.resources):
+            if not self._resources[resource].fetch(self._framework.resources,
+                                                   image_cache):
                 self._framework.unit_status_set(
                     BlockedStatus('Missing or invalid image resource: {}'
                                   .format(resource)))
                 logger.info('Missing or invalid image resource: {}'
                             .format(resource))
                 return
+        if image_cache != state.image_cache:
+            state.image_cache = image_cache
 
-        if not self._framework.unit_is_leader:
+        if not is_leader:
             self._framework.unit_status_set(
                 WaitingStatus('Waiting for leader'))
             logger.info('Delegating pod configuration to the leader')
+            # The leader's spec replaces any this unit set
+            state.spec_hash = None
+            state.reconciled_generation = state.generation
             return
 
-        spec = self._builder.build_spec()
-        self._framework.unit_status_set(
-            MaintenanceStatus('Configuring container'))
-        self._framework.pod_spec_set(spec)
+        try:
+            spec = self._builder.build_spec()
+        except ValueError as e:
+            self._framework.unit_status_set(BlockedStatus(str(e)))
+            logger.info('Invalid configuration: {}'.format(e))
+            return
+        spec_hash = self.spec_hash(spec)
+        if state.spec_hash == spec_hash:
+            state.spec_set_skipped += 1
+            logger.debug('Pod spec unchanged, pod_spec_set skipped {} times'
+                         .format(state.spec_set_skipped))
+        else:
+            self._framework.unit_status_set(
+                MaintenanceStatus('Configuring container'))
+            self._framework.pod_spec_set(spec)
+            state.spec_hash = spec_hash
+            self._pod.invalidate()
         if self._pod.is_ready:
             self._framework.unit_status_set(ActiveStatus('ready'))
             logger.info('Pod is ready')
+            state.reconciled_generation = state.generation
             return
+        # Checked again when the deferred event is re-emitted by the next
+        # hook, rather than waiting here for the pod.
         self._framework.unit_status_set(MaintenanceStatus('Pod is not ready'))
-        logger.info('Pod is not ready')
+        logger.info('Pod is not ready, deferring generation {}'
+                    .format(state.generation))
+        event.defer()
 
 
 class RemovalObserver(BaseObserver):
@@ -70,12 +146,136 @@ class RemovalObserver(BaseObserver):
         logger.info('Pvc cleaned up')
 
 
+class PvcCleanupObserver(BaseObserver):
+
+    def __init__(self, framework, resources, pod, pvc, builder):
+        super().__init__(framework, resources, pod, builder)
+        self._pvc = pvc
+
+    def handle(self, event):
+        # Loaded with the Kubernetes client anyway
+        from http.client import HTTPException
+        params = event.params
+        dry_run = params.get('dry-run', False)
+        try:
+            deleted, failed = self._pvc.delete_orphaned(
+                len(self._builder.units), params.get('parallelism', 8),
+                dry_run)
+        except (OSError, ValueError, HTTPException) as e:
+            logger.error('PVC cleanup failed: {}'.format(e))
+            event.fail('PVC cleanup failed: {}'.format(e))
+            return
+        for name, reason in failed.items():
+            logger.warning('Could not delete {}: {}'.format(name, reason))
+        logger.info('{} {} orphaned pvcs'.format(
+            'Found' if dry_run else 'Deleted', len(deleted)))
+        event.set_results({
+            'dry-run': dry_run,
+            'count': len(deleted),
+            'deleted': ','.join(deleted),
+            'failed': ','.join(sorted(failed)),
+        })
+
+
 class RelationObserver(BaseObserver):
 
+    def __init__(self, framework, resources, pod, builder, server):
+        super().__init__(framework, resources, pod, builder)
+        self._server = server
+
     def handle(self, event):
-        data = self._builder.build_relation_data(event.client.formatter)
-        logger.info('Serve {} with {}'.format(event.client, data))
-        self._framework.relation_data_set(event.relation, data)
+        # Events of a client relation only concern that client
+        clients = self._server.clients(getattr(event, 'relation', None))
+        for client in clients:
+            data = self._builder.build_relation_data(client.formatter,
+                                                     client.role)
+            current = self._framework.relation_data_get(client.relation)
+            # Juju drops the fields set to ''
+            if all(current.get(key, '') == value
+                   for key, value in data.items()):
+                logger.debug('{} is up to date'.format(client.name))
+                continue
+            logger.info('Serve {} with {}'.format(client.name, data))
+            self._framework.relation_data_set(client.relation, data)
+
+
+class ReplicaSetObserver(BaseObserver):
+
+    def handle(self, event):
+        config = self._framework.config
+        if not config.get('manage-replica-set') or \
+                config.get('cluster-role') == 'mongos':
+            return
+        if not self._framework.unit_is_leader:
+            logger.debug('Delegating replica set management to the leader')
+            return
+        from replica_set import ReplicaSet
+        replica_set = ReplicaSet(self._builder.member_hosts)
+        try:
+            replica_set.apply(self._builder.build_replica_set_config())
+        except (OSError, MongoCommandError) as e:
+            logger.info('Replica set not configured yet: {}'.format(e))
+            event.defer()
+
+
+class ShardingObserver(BaseObserver):
+
+    def handle(self, event):
+        config = self._framework.config
+        if config.get('cluster-role') != 'mongos' or \
+                not config.get('shards'):
+            return
+        if not self._framework.unit_is_leader:
+            logger.debug('Delegating shard registration to the leader')
+            return
+        from sharding import Router, parse_shards
+        try:
+            Router(self._builder.member_hosts).add_shards(
+                parse_shards(config['shards']))
+        except (OSError, MongoCommandError) as e:
+            logger.info('Shards not registered yet: {}'.format(e))
+            event.defer()
+
+
+class BackupObserver(BaseObserver):
+
+    def handle(self, event):
+        from backup import Backup, make_target
+        params = event.params
+        try:
+            backup = Backup(self._builder.member_hosts,
+                            make_target(params['target'],
+                                        self._framework.config),
+                            params.get('compression', 'gzip'),
+                            params.get('parallelism', 4))
+            results = backup.run(params.get('name'), event.log)
+        except (OSError, MongoCommandError, ValueError) as e:
+            logger.error('Backup failed: {}'.format(e))
+            event.fail('Backup failed: {}'.format(e))
+            return
+        logger.info('Backup {} completed'.format(results['name']))
+        event.set_results(results)
+
+
+class RestoreObserver(BaseObserver):
+
+    def handle(self, event):
+        from backup import make_target
+        from restore import Restore
+        params = event.params
+        try:
+            restore = Restore(self._builder.member_hosts,
+                              make_target(params['source'],
+                                          self._framework.config),
+                              params.get('workers', 4),
+                              drop=params.get('drop', False))
+            results = restore.run(params['name'], event.log)
+        except (OSError, MongoCommandError, ValueError) as e:
+            logger.error('Restore failed: {}'.format(e))
+            event.fail('Restore failed: {}'.format(e))
+            return
+        logger.info('Restore of {} completed'.format(results['name']))
+        event.set_results(results)
 
 
 class StatusObserver(BaseObserver):
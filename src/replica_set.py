@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+import logging
+
+from wire import MongoCommandError, MongoConnection
+
+logger = logging.getLogger()
+
+NOT_YET_INITIALIZED = 94
+
+# Member fields reset to their default when the desired config omits them
+MEMBER_FIELD_DEFAULTS = {'secondaryDelaySecs': 0, 'slaveDelay': 0}
+# MongoDB 5.0 renamed slaveDelay to secondaryDelaySecs, rejecting the old
+# name; older servers know only slaveDelay.
+SECONDARY_DELAY_WIRE_VERSION = 13
+
+
+class ReplicaSet:
+    """Replica set membership driven over the wire protocol.
+
+    seeds are the member host:port addresses in ordinal order; ordinal 0
+    is the member the set is initiated on.
+    """
+
+    def __init__(self, seeds, timeout=10):
+        self._seeds = list(seeds)
+        self._timeout = timeout
+        self._max_wire_version = 0
+
+    def _connect(self, host):
+        address, port = host.rsplit(':', 1)
+        return MongoConnection(address, int(port), self._timeout)
+
+    def _find_primary(self):
+        """Address of the primary, or None when no seed reports one."""
+        for seed in self._seeds:
+            try:
+                with self._connect(seed) as connection:
+                    reply = connection.command({'isMaster': 1})
+            except OSError as e:
+                logger.debug('Seed {} unreachable: {}'.format(seed, e))
+                continue
+            self._max_wire_version = reply.get('maxWireVersion', 0)
+            if reply.get('ismaster'):
+                return seed
+            if reply.get('primary'):
+                return reply['primary']
+        return None
+
+    @staticmethod
+    def delay_field(max_wire_version):
+        """Name of the member replication delay field on a server."""
+        if max_wire_version >= SECONDARY_DELAY_WIRE_VERSION:
+            return 'secondaryDelaySecs'
+        return 'slaveDelay'
+
+    @staticmethod
+    def with_delay_field(desired, field):
+        """desired with the replication delay of members named field."""
+        members = []
+        for member in desired['members']:
+            member = dict(member)
+            for name in MEMBER_FIELD_DEFAULTS:
+                if name in member and name != field:
+                    member[field] = member.pop(name)
+            members.append(member)
+        return dict(desired, members=members)
+
+    @staticmethod
+    def merge(current, desired):
+        """Config reaching the desired members from the current config.
+
+        Members keep their _id, new hosts get unused ones, and the version
+        is bumped. Returns None when nothing differs.
+        """
+        existing = {member['host']: member for member in current['members']}
+        next_id = max([m['_id'] for m in current['members']] + [-1]) + 1
+        members = []
+        for wanted in desired['members']:
+            member = dict(existing.get(wanted['host'], {}))
+            for field, default in MEMBER_FIELD_DEFAULTS.items():
+                if field in member:
+                    member[field] = default
+            if '_id' not in member:
+                member['_id'] = next_id
+                next_id += 1
+            member.update(wanted)
+            members.append(member)
+        if members == current['members']:
+            return None
+        config = dict(current)
+        config['members'] = members
+        config['version'] = current['version'] + 1
+        return config
+
+    @staticmethod
+    def voting_steps(current, config):
+        """Configs reaching config from current, one vote change each.
+
+        MongoDB 4.4 rejects a reconfig adding, removing or changing the
+        votes of more than one voting member. The first step makes every
+        other change, with new members at votes and priority 0, the
+        members whose votes change as they were and the voting members to
+        remove still in place; each following step then promotes, demotes
+        or removes a single member.
+        """
+        existing = {member['host']: member for member in current['members']}
+        wanted = {member['host']: member for member in config['members']}
+        changed = [member['host'] for member in config['members']
+                   if member.get('votes', 1) !=
+                   existing.get(member['host'], {}).get('votes', 0)]
+        removed = [member for member in current['members']
+                   if member['host'] not in wanted and
+                   member.get('votes', 1)]
+        if len(changed) + len(removed) <= 1:
+            return [config]
+
+        members = []
+        for member in config['members']:
+            if member['host'] in changed:
+                # Hidden and delayed members must have priority 0, so
+                # those change in the member's own step too
+                before = existing.get(member['host'],
+                                      {'votes': 0, 'priority': 0})
+                member = dict(member, votes=before.get('votes', 1),
+                              priority=before.get('priority', 1),
+                              hidden=before.get('hidden', False))
+                for field, default in MEMBER_FIELD_DEFAULTS.items():
+                    if field in member or field in before:
+                        member[field] = before.get(field, default)
+            members.append(member)
+        members += removed
+        steps = []
+        if members != current['members']:
+            steps.append(dict(config, members=members))
+        for host in changed + [member['host'] for member in removed]:
+            members = [wanted[member['host']]
+                       if member['host'] == host else member
+                       for member in members if member['host'] != host or
+                       member['host'] in wanted]
+            steps.append(dict(config, members=members))
+        for i, step in enumerate(steps):
+            step['version'] = current['version'] + 1 + i
+        return steps
+
+    def apply(self, desired):
+        """Initiate the set or reconfigure it to the desired members.
+
+        The replication delay of desired members may be given as
+        secondaryDelaySecs or slaveDelay; it is sent under the name the
+        server knows.
+
+        Returns the command that was run, or None when the set already
+        matches. Raises OSError or MongoCommandError when mongod is not
+        reachable or rejects the change; the caller retries later.
+        """
+        primary = self._find_primary()
+        desired = self.with_delay_field(
+            desired, self.delay_field(self._max_wire_version))
+        if primary is None:
+            with self._connect(self._seeds[0]) as connection:
+                try:
+                    connection.command({'replSetGetConfig': 1})
+                except MongoCommandError as e:
+                    if e.code != NOT_YET_INITIALIZED:
+                        raise
+                    config = dict(desired, version=1)
+                    config['members'] = [
+                        dict(member, _id=i)
+                        for i, member in enumerate(desired['members'])]
+                    connection.command({'replSetInitiate': config})
+                    logger.info('Initiated replica set {}'
+                                .format(desired['_id']))
+                    return 'replSetInitiate'
+            raise ConnectionError('Replica set has no primary')
+
+        with self._connect(primary) as connection:
+            current = connection.command({'replSetGetConfig': 1})['config']
+            config = self.merge(current, desired)
+            if config is None:
+                logger.debug('Replica set members unchanged')
+                return None
+            for step in self.voting_steps(current, config):
+                connection.command({'replSetReconfig': step})
+                logger.info('Reconfigured replica set {} to version {}'
+                            .format(step['_id'], step['version']))
+            return 'replSetReconfig'
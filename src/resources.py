@@ -1,30 +1,66 @@
 # Adapted from: https://github.com/johnsca/resource-oci-image/tree/e58342913
+import hashlib
+
 import yaml
 from ops.framework import Object
 from ops.model import BlockedStatus, ModelError
 
+try:
+    # libyaml parser, when PyYAML was built with it
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 
 class OCIImageResource(Object):
     def __init__(self, resource_name):
         self.resource_name = resource_name
 
-    def fetch(self, resources_adapter):
+    def fetch(self, resources_adapter, cache=None):
+        """Load the image details of the attached resource.
+
+        cache, a dict kept between hooks, maps resource names to the
+        parsed details and the path, size, mtime and SHA-256 of the file
+        they came from. The file is not read again while its path, size
+        and mtime are unchanged, nor parsed again while its hash is.
+        """
         path = resources_adapter.fetch(self.resource_name)
         if not path.exists():
             raise MissingResourceError(self.resource_name)
 
+        entry = None
+        if cache is not None:
+            stat = path.stat()
+            signature = [str(path), stat.st_size, stat.st_mtime_ns]
+            entry = cache.get(self.resource_name)
+            if entry and list(entry['signature']) == signature:
+                self.resource_dict = dict(entry['image'])
+                return True
+
         resource_yaml = path.read_text()
 
         if not resource_yaml:
             raise MissingResourceError(self.resource_name)
 
-        try:
-            resource_dict = yaml.safe_load(resource_yaml)
-        except yaml.YAMLError as e:
-            raise InvalidResourceError(self.resource_name) from e
+        digest = hashlib.sha256(resource_yaml.encode('UTF-8')).hexdigest()
+        if entry and entry['hash'] == digest:
+            resource_dict = dict(entry['image'])
         else:
-            self.resource_dict = resource_dict
-            return True
+            try:
+                resource_dict = yaml.load(resource_yaml, Loader=SafeLoader)
+            except yaml.YAMLError as e:
+                raise InvalidResourceError(self.resource_name) from e
+            if not isinstance(resource_dict, dict):
+                raise InvalidResourceError(self.resource_name)
+        self.resource_dict = resource_dict
+        if cache is not None:
+            cache[self.resource_name] = {
+                'signature': signature,
+                'hash': digest,
+                'image': {key: resource_dict.get(key) for key in
+                          ('registrypath', 'username', 'password')},
+            }
+        return True
 
     @property
     def image_path(self):
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+import concurrent.futures
+import json
+import logging
+import struct
+import threading
+import time
+
+from backup import COMPRESSION_SUFFIXES, compression_of, decompress
+from wire import MongoCommandError, MongoConnection, RawDocument
+
+logger = logging.getLogger()
+
+# Stay well below the 48MB message limit of a single insert
+MAX_BATCH_BYTES = 8 * 1024 ** 2
+# Index fields describing the index rather than how to build it
+INDEX_DESCRIPTION_FIELDS = ('v', 'ns')
+
+
+def read_documents(stream):
+    """Encoded documents of a .bson stream, read one at a time."""
+    while True:
+        header = stream.read(4)
+        if not header:
+            return
+        if len(header) < 4:
+            raise ValueError('Truncated BSON document')
+        length = struct.unpack('<i', header)[0]
+        if length < 5:
+            raise ValueError('Invalid BSON document length {}'.format(length))
+        body = stream.read(length - 4)
+        if len(body) < length - 4:
+            raise ValueError('Truncated BSON document')
+        yield RawDocument(header + body)
+
+
+class Restore:
+    """Parallel load of a backup into the primary or a mongos router.
+
+    Batches of every collection go to a pool of insertion workers, with
+    a bounded number in flight. Secondary indexes are built only after
+    all documents are loaded, one createIndexes per collection, in
+    parallel.
+    """
+
+    def __init__(self, seeds, target, workers=4, batch_size=1000,
+                 drop=False, timeout=60):
+        self._seeds = list(seeds)
+        self._target = target
+        self._workers = max(int(workers), 1)
+        self._batch_size = batch_size
+        self._drop = drop
+        self._timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _connect(self, host):
+        address, port = host.rsplit(':', 1)
+        return MongoConnection(address, int(port), self._timeout)
+
+    def _destination(self):
+        """The member accepting writes."""
+        for seed in self._seeds:
+            try:
+                with self._connect(seed) as connection:
+                    reply = connection.command({'isMaster': 1})
+            except OSError as e:
+                logger.debug('Seed {} unreachable: {}'.format(seed, e))
+                continue
+            if reply.get('ismaster'):
+                return seed
+            if reply.get('primary'):
+                return reply['primary']
+        raise ConnectionError('No primary to restore to')
+
+    def _connection(self, destination):
+        """Connection of the calling worker thread."""
+        if getattr(self._local, 'connection', None) is None:
+            self._local.connection = self._connect(destination)
+            with self._lock:
+                self._connections.append(self._local.connection)
+        return self._local.connection
+
+    def _collections(self, name):
+        """(db, collection, data key, metadata key) of every dump."""
+        collections = []
+        keys = set(self._target.list(name))
+        for key in sorted(keys):
+            for suffix in COMPRESSION_SUFFIXES.values():
+                if not key.endswith('.bson' + suffix):
+                    continue
+                db, collection = key[len(name) + 1:-len('.bson' + suffix)] \
+                    .split('/', 1)
+                metadata = key[:-len('.bson' + suffix)] + \
+                    '.metadata.json' + suffix
+                collections.append((db, collection, key,
+                                    metadata if metadata in keys else None))
+        return collections
+
+    def _metadata(self, key):
+        if key is None:
+            return {'options': {}, 'indexes': []}
+        with self._target.read(key) as raw:
+            with decompress(compression_of(key), raw) as stream:
+                return json.loads(stream.read().decode('UTF-8'))
+
+    def _prepare(self, connection, db, collection, options):
+        if self._drop:
+            try:
+                connection.command({'drop': collection}, db)
+            except MongoCommandError as e:
+                if e.code != 26:  # NamespaceNotFound
+                    raise
+        if options:
+            try:
+                connection.command(dict({'create': collection}, **options),
+                                   db)
+            except MongoCommandError as e:
+                if e.code != 48:  # NamespaceExists
+                    raise
+
+    def _insert(self, destination, db, collection, batch):
+        reply = self._connection(destination).command(
+            {'insert': collection, 'documents': batch, 'ordered': False}, db)
+        errors = reply.get('writeErrors', [])
+        for error in errors[:1]:
+            logger.warning('{}.{}: {}'.format(db, collection,
+                                              error.get('errmsg')))
+        return reply.get('n', 0), len(errors)
+
+    def _batches(self, stream):
+        batch, size = [], 0
+        for document in read_documents(stream):
+            batch.append(document)
+            size += len(document)
+            if len(batch) >= self._batch_size or size >= MAX_BATCH_BYTES:
+                yield batch
+                batch, size = [], 0
+        if batch:
+            yield batch
+
+    def _build_indexes(self, destination, db, collection, indexes):
+        specs = [{field: value for field, value in index.items()
+                  if field not in INDEX_DESCRIPTION_FIELDS}
+                 for index in indexes if index.get('name') != '_id_']
+        if not specs:
+            return 0
+        self._connection(destination).command(
+            {'createIndexes': collection, 'indexes': specs}, db)
+        return len(specs)
+
+    def run(self, name, progress=None):
+        """Restore the backup called name and return the action results.
+
+        progress, when given, is called with a message as each
+        collection is loaded and once the indexes are built.
+        """
+        started = time.monotonic()
+        destination = self._destination()
+        collections = self._collections(name)
+        if not collections:
+            raise ValueError('No backup found at {}'.format(
+                self._target.location(name)))
+        self._connections = []
+        totals = {'documents': 0, 'write-errors': 0}
+        indexes = []
+        in_flight = threading.BoundedSemaphore(self._workers * 2)
+
+        def insert(db, collection, batch):
+            try:
+                return self._insert(destination, db, collection, batch)
+            finally:
+                in_flight.release()
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(
+                    self._workers) as executor:
+                with self._connect(destination) as connection:
+                    for db, collection, key, metadata_key in collections:
+                        metadata = self._metadata(metadata_key)
+                        self._prepare(connection, db, collection,
+                                      metadata.get('options'))
+                        indexes.append((db, collection,
+                                        metadata.get('indexes', [])))
+                        futures = []
+                        with self._target.read(key) as raw:
+                            with decompress(compression_of(key),
+                                            raw) as stream:
+                                for batch in self._batches(stream):
+                                    in_flight.acquire()
+                                    futures.append(executor.submit(
+                                        insert, db, collection, batch))
+                        for future in futures:
+                            inserted, errors = future.result()
+                            totals['documents'] += inserted
+                            totals['write-errors'] += errors
+                        if progress:
+                            progress('{}.{}: loaded'.format(db, collection))
+                loaded = time.monotonic()
+                built = sum(executor.map(
+                    lambda index: self._build_indexes(destination, *index),
+                    indexes))
+                if progress:
+                    progress('{} indexes built'.format(built))
+        finally:
+            for connection in self._connections:
+                connection.close()
+        seconds = max(time.monotonic() - started, 1e-6)
+        load_seconds = max(loaded - started, 1e-6)
+        return {
+            'name': name,
+            'destination': destination,
+            'collections': len(collections),
+            'documents': totals['documents'],
+            'write-errors': totals['write-errors'],
+            'indexes': built,
+            'seconds': round(seconds, 3),
+            'load-seconds': round(load_seconds, 3),
+            'documents-per-second': round(
+                totals['documents'] / load_seconds, 1),
+        }
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+import logging
+
+from wire import MongoConnection
+
+logger = logging.getLogger()
+
+
+def parse_shards(value):
+    """Shard connection strings from a comma or whitespace separated list.
+
+    Each shard is <replica-set>/<host:port>[,<host:port>...]; hosts after
+    the first belong to the shard before them.
+    """
+    shards = []
+    for item in value.replace(',', ' ').split():
+        if '/' in item or not shards:
+            shards.append(item)
+        else:
+            shards[-1] += ',' + item
+    return shards
+
+
+class Router:
+    """Shard registration through a mongos router."""
+
+    def __init__(self, seeds, timeout=10):
+        self._seeds = list(seeds)
+        self._timeout = timeout
+
+    def _connect(self):
+        error = None
+        for seed in self._seeds:
+            address, port = seed.rsplit(':', 1)
+            connection = MongoConnection(address, int(port), self._timeout)
+            try:
+                connection.command({'ping': 1})
+                return connection
+            except OSError as e:
+                connection.close()
+                error = e
+        raise error or ConnectionError('No mongos router to connect to')
+
+    def add_shards(self, shards):
+        """Add the shards the cluster does not know yet.
+
+        Shards are matched on their replica set name. Returns the names
+        of the added shards.
+        """
+        with self._connect() as connection:
+            known = {shard['_id'] for shard in
+                     connection.command({'listShards': 1})['shards']}
+            added = []
+            for shard in shards:
+                name = shard.split('/', 1)[0]
+                if name in known:
+                    continue
+                connection.command({'addShard': shard, 'name': name})
+                logger.info('Added shard {}'.format(shard))
+                added.append(name)
+            return added
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+from collections import namedtuple
+import datetime
+import socket
+import struct
+
+OP_MSG = 2013
+
+ObjectId = namedtuple('ObjectId', 'binary')
+Timestamp = namedtuple('Timestamp', 'time inc')
+Binary = namedtuple('Binary', 'subtype data')
+# Element of a type without a Python counterpart, kept as its raw bytes
+Raw = namedtuple('Raw', 'type data')
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+FIXED_SIZE_TYPES = {0x13: 16, 0x7f: 0, 0xff: 0}
+
+
+class Int64(int):
+    """Integer always encoded as a 64-bit BSON int, e.g. a cursor id."""
+
+
+class RawDocument(bytes):
+    """Document that is already BSON encoded, embedded as is."""
+
+
+class MongoCommandError(Exception):
+
+    def __init__(self, reply):
+        super().__init__(reply.get('errmsg', 'command failed'))
+        self.code = reply.get('code')
+        self.reply = reply
+
+
+def encode_element(name, value):
+    key = name.encode('UTF-8') + b'\x00'
+    if isinstance(value, bool):
+        return b'\x08' + key + (b'\x01' if value else b'\x00')
+    if isinstance(value, Int64):
+        return b'\x12' + key + struct.pack('<q', value)
+    if isinstance(value, int):
+        if -2 ** 31 <= value < 2 ** 31:
+            return b'\x10' + key + struct.pack('<i', value)
+        return b'\x12' + key + struct.pack('<q', value)
+    if isinstance(value, float):
+        return b'\x01' + key + struct.pack('<d', value)
+    if isinstance(value, str):
+        data = value.encode('UTF-8') + b'\x00'
+        return b'\x02' + key + struct.pack('<i', len(data)) + data
+    if isinstance(value, dict):
+        return b'\x03' + key + encode_document(value)
+    if isinstance(value, RawDocument):
+        return b'\x03' + key + value
+    if isinstance(value, ObjectId):
+        return b'\x07' + key + value.binary
+    if isinstance(value, Timestamp):
+        return b'\x11' + key + struct.pack('<II', value.inc, value.time)
+    if isinstance(value, Binary):
+        return b'\x05' + key + struct.pack('<iB', len(value.data),
+                                           value.subtype) + value.data
+    if isinstance(value, Raw):
+        return bytes([value.type]) + key + value.data
+    if isinstance(value, datetime.datetime):
+        millis = (value - EPOCH) // datetime.timedelta(milliseconds=1)
+        return b'\x09' + key + struct.pack('<q', millis)
+    if isinstance(value, (list, tuple)):
+        return b'\x04' + key + encode_document(
+            {str(i): item for i, item in enumerate(value)})
+    if value is None:
+        return b'\x0a' + key
+    raise TypeError('Cannot encode {!r} as BSON'.format(value))
+
+
+def encode_document(document):
+    """BSON encoding of a document of plain Python values."""
+    elements = b''.join(encode_element(name, value)
+                        for name, value in document.items())
+    return struct.pack('<i', len(elements) + 5) + elements + b'\x00'
+
+
+def _read_cstring(data, offset):
+    end = data.index(b'\x00', offset)
+    return data[offset:end].decode('UTF-8'), end + 1
+
+
+def _raw_array(data):
+    """Undecoded BSON of every document in an encoded array."""
+    documents = []
+    offset = 4
+    while data[offset] != 0:
+        offset = data.index(b'\x00', offset + 1) + 1
+        length = struct.unpack_from('<i', data, offset)[0]
+        documents.append(bytes(data[offset:offset + length]))
+        offset += length
+    return documents
+
+
+def decode_element(data, offset, raw_arrays=()):
+    """Decode the element at offset, returning (name, value, next offset).
+
+    Arrays of documents named in raw_arrays are returned as a list of
+    their encoded documents, which can be stored without re-encoding.
+    """
+    element_type = data[offset]
+    name, offset = _read_cstring(data, offset + 1)
+    if element_type == 0x01:
+        return name, struct.unpack_from('<d', data, offset)[0], offset + 8
+    if element_type in (0x02, 0x0d, 0x0e):
+        length = struct.unpack_from('<i', data, offset)[0]
+        value = data[offset + 4:offset + 3 + length].decode('UTF-8')
+        return name, value, offset + 4 + length
+    if element_type in (0x03, 0x04):
+        length = struct.unpack_from('<i', data, offset)[0]
+        if element_type == 0x04 and name in raw_arrays:
+            return name, _raw_array(data[offset:offset + length]), \
+                offset + length
+        value = decode_document(data[offset:offset + length], raw_arrays)
+        if element_type == 0x04:
+            value = list(value.values())
+        return name, value, offset + length
+    if element_type == 0x05:
+        length, subtype = struct.unpack_from('<iB', data, offset)
+        value = Binary(subtype, bytes(data[offset + 5:offset + 5 + length]))
+        return name, value, offset + 5 + length
+    if element_type == 0x07:
+        return name, ObjectId(bytes(data[offset:offset + 12])), offset + 12
+    if element_type == 0x08:
+        return name, data[offset] == 1, offset + 1
+    if element_type == 0x09:
+        millis = struct.unpack_from('<q', data, offset)[0]
+        value = EPOCH + datetime.timedelta(milliseconds=millis)
+        return name, value, offset + 8
+    if element_type == 0x0a:
+        return name, None, offset
+    if element_type == 0x0b:
+        pattern_end = data.index(b'\x00', offset)
+        end = data.index(b'\x00', pattern_end + 1) + 1
+        return name, Raw(element_type, bytes(data[offset:end])), end
+    if element_type == 0x10:
+        return name, struct.unpack_from('<i', data, offset)[0], offset + 4
+    if element_type == 0x11:
+        inc, time = struct.unpack_from('<II', data, offset)
+        return name, Timestamp(time, inc), offset + 8
+    if element_type == 0x12:
+        value = Int64(struct.unpack_from('<q', data, offset)[0])
+        return name, value, offset + 8
+    if element_type in FIXED_SIZE_TYPES:
+        end = offset + FIXED_SIZE_TYPES[element_type]
+        return name, Raw(element_type, bytes(data[offset:end])), end
+    raise ValueError('Unsupported BSON type 0x{:02x}'.format(element_type))
+
+
+def decode_document(data, raw_arrays=()):
+    """Decode a BSON document into a dict."""
+    length = struct.unpack_from('<i', data, 0)[0]
+    document = {}
+    offset = 4
+    while offset < length - 1:
+        name, value, offset = decode_element(data, offset, raw_arrays)
+        document[name] = value
+    return document
+
+
+def op_msg(command, request_id=1):
+    """OP_MSG message carrying a single command document."""
+    payload = struct.pack('<I', 0) + b'\x00' + encode_document(command)
+    return struct.pack('<iiii', 16 + len(payload), request_id, 0,
+                       OP_MSG) + payload
+
+
+def read_message(sock):
+    """Read one wire protocol message, returning (header, body)."""
+    header = _recv_exactly(sock, 16)
+    length = struct.unpack_from('<i', header)[0]
+    return struct.unpack('<iiii', header), _recv_exactly(sock, length - 16)
+
+
+def op_msg_document(body, raw_arrays=()):
+    """Body document of an OP_MSG payload."""
+    if body[4] != 0:
+        raise ValueError('Unexpected OP_MSG section kind {}'.format(body[4]))
+    return decode_document(body[5:], raw_arrays)
+
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('Connection closed by mongod')
+        data += chunk
+    return bytes(data)
+
+
+class MongoConnection:
+    """Minimal synchronous client running commands over OP_MSG."""
+
+    def __init__(self, host, port, timeout=10):
+        self._address = (host, port)
+        self._timeout = timeout
+        self._sock = None
+        self._request_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def command(self, command, db='admin', raw_arrays=()):
+        """Run a command and return its reply.
+
+        Arrays named in raw_arrays, such as a cursor's firstBatch, hold
+        the encoded documents. Raises MongoCommandError when the reply
+        is not ok.
+        """
+        if self._sock is None:
+            self._sock = socket.create_connection(self._address,
+                                                  self._timeout)
+        self._request_id += 1
+        message = dict(command)
+        message['$db'] = db
+        self._sock.sendall(op_msg(message, self._request_id))
+        (_, _, _, opcode), body = read_message(self._sock)
+        if opcode != OP_MSG:
+            raise ValueError('Unexpected reply opcode {}'.format(opcode))
+        reply = op_msg_document(body, raw_arrays)
+        if not reply.get('ok'):
+            raise MongoCommandError(reply)
+        return reply
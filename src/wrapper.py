@@ -11,6 +11,7 @@ class FrameworkWrapper:
     def __init__(self, framework, state):
         self._framework = framework
         self._state = state
+        self._goal_state = None
 
     @property
     def config(self):
@@ -40,12 +41,25 @@ class FrameworkWrapper:
         logger.info('unit_status_set {}'.format(str(state)))
         self._framework.model.unit.status = state
 
+    def relation_data_get(self, relation):
+        return relation.data[self._framework.model.unit]
+
     def relation_data_set(self, relation, data):
+        """Set the unit's fields of relation, removing those set to ''.
+
+        ops raises KeyError for a '' value of a field the relation does
+        not hold, so those are skipped.
+        """
         logger.info('relation_data_set {}'.format(str(data)))
-        relation.data[self._framework.model.unit].update(data)
+        content = relation.data[self._framework.model.unit]
+        for key, value in data.items():
+            if value != '' or key in content:
+                content[key] = value
 
     @property
     def goal_state_units(self):
-        cmd = ['goal-state', '--format=json']
-        goal_state = json.loads(subprocess.check_output(cmd).decode('UTF-8'))
-        return goal_state['units']
+        if self._goal_state is None:
+            cmd = ['goal-state', '--format=json']
+            self._goal_state = json.loads(
+                subprocess.check_output(cmd).decode('UTF-8'))
+        return self._goal_state['units']
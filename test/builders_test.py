@@ -1,3 +1,6 @@
+import os
+import struct
+import subprocess
 import sys
 import unittest
 from unittest.mock import (
@@ -8,7 +11,13 @@ sys.path.append('lib')
 sys.path.append('src')
 
 from uuid import uuid4
-from builders import MongoBuilder
+import wire
+from fake_mongod import FakeMongod, serve
+from builders import (
+    MongoBuilder,
+    parse_memory,
+    wiredtiger_cache_size_gb,
+)
 
 
 class MongoBuilderTest(unittest.TestCase):
@@ -21,6 +30,17 @@ class MongoBuilderTest(unittest.TestCase):
         mock_image_resource_obj.password = f'{uuid4()}'
         return mock_image_resource_obj
 
+    def assert_default_probes(self, readiness_probe, startup_probe):
+        assert readiness_probe['exec']['command'][:2] == ['/bin/bash', '-c']
+        assert 'mongo ' not in readiness_probe['exec']['command'][2]
+        assert readiness_probe['timeoutSeconds'] == 5
+        assert readiness_probe['periodSeconds'] == 5
+        assert readiness_probe['initialDelaySeconds'] == 10
+        assert startup_probe['exec']['command'][:2] == ['/bin/bash', '-c']
+        assert startup_probe['timeoutSeconds'] == 5
+        assert startup_probe['periodSeconds'] == 10
+        assert startup_probe['failureThreshold'] == 360
+
     @patch('charm.OCIImageResource', autospec=True, spec_set=True)
     def test_spec(self, mock_image_resource_clazz):
         # Setup
@@ -48,7 +68,10 @@ class MongoBuilderTest(unittest.TestCase):
             goal_state_units
         )
         spec = builder.build_spec()
+        readiness_probe = spec['containers'][0].pop('readinessProbe')
+        startup_probe = spec['containers'][0].pop('startupProbe')
         # Verify
+        self.assert_default_probes(readiness_probe, startup_probe)
         assert spec == {'containers': [
             {
                 'name': app_name,
@@ -70,14 +93,6 @@ class MongoBuilderTest(unittest.TestCase):
                 'config': {
                     'ALLOW_ANONYMOUS_LOGIN': 'yes'
                 },
-                'readinessProbe': {
-                    'tcpSocket': {
-                        'port': config['advertised-port'],
-                    },
-                    'timeoutSeconds': 5,
-                    'periodSeconds': 5,
-                    'initialDelaySeconds': 10,
-                },
                 'livenessProbe': {
                     'exec': {
                         'command': [
@@ -123,7 +138,10 @@ class MongoBuilderTest(unittest.TestCase):
             goal_state_units
         )
         spec = builder.build_spec()
+        readiness_probe = spec['containers'][0].pop('readinessProbe')
+        startup_probe = spec['containers'][0].pop('startupProbe')
         # Verify
+        self.assert_default_probes(readiness_probe, startup_probe)
         assert spec == {'containers': [
             {
                 'name': app_name,
@@ -145,14 +163,6 @@ class MongoBuilderTest(unittest.TestCase):
                 'config': {
                     'ALLOW_ANONYMOUS_LOGIN': 'yes'
                 },
-                'readinessProbe': {
-                    'tcpSocket': {
-                        'port': config['advertised-port'],
-                    },
-                    'timeoutSeconds': 5,
-                    'periodSeconds': 5,
-                    'initialDelaySeconds': 10,
-                },
                 'livenessProbe': {
                     'exec': {
                         'command': [
@@ -204,7 +214,7 @@ class MongoBuilderTest(unittest.TestCase):
         images = {}
         mock_formatter = MagicMock()
         mock_formatter.format = MagicMock(
-            side_effect=(lambda x: {'connection_string': x}))
+            side_effect=(lambda x, client_options: {'connection_string': x}))
         # Exercise
         builder = MongoBuilder(
             app_name,
@@ -219,3 +229,523 @@ class MongoBuilderTest(unittest.TestCase):
                         'mongodb-k8s-1.service-name:1234,'
                         'mongodb-k8s-2.service-name:1234'
                         '/?replicaSet=replica-set'}
+
+    def test_units_resolved_lazily(self):
+        # Setup
+        config = {
+            'enable-sidecar': False,
+            'service-name': 'service-name',
+            'advertised-port': 1234,
+        }
+        goal_state_units = MagicMock(return_value={'mongodb-k8s/0': {}})
+        # Exercise
+        builder = MongoBuilder('app-name', config, {}, goal_state_units)
+        calls_before_use = goal_state_units.call_count
+        builder.build_relation_data(MagicMock())
+        builder.build_relation_data(MagicMock())
+        # Verify
+        assert calls_before_use == 0
+        assert goal_state_units.call_count == 1
+
+    def test_relation_data_srv(self):
+        app_name = 'app-name'
+        config = {
+            'enable-sidecar': True,
+            'service-name': 'service-name',
+            'advertised-port': 1234,
+            'replica-set': 'replica-set',
+            'advertised-hostname': 'advertised-hostname',
+            'namespace': 'namespace',
+            'cluster-domain': 'cluster-domain',
+            'connection-uri-format': 'srv',
+        }
+        units = ['mongodb-k8s/0', 'mongodb-k8s/1']
+        mock_formatter = MagicMock()
+        mock_formatter.format = MagicMock(
+            side_effect=(lambda x, y, client_options: {
+                'connection_string': x,
+                'standard_connection_string': y}))
+        # Exercise
+        builder = MongoBuilder(app_name, config, {}, units)
+        data = builder.build_relation_data(mock_formatter)
+        scaled = MongoBuilder(app_name, config, {}, units + [
+            'mongodb-k8s/2']).build_relation_data(mock_formatter)
+        # Verify
+        assert data == {
+            'connection_string': 'mongodb+srv://'
+            'service-name.namespace.svc.cluster-domain'
+            '/?replicaSet=replica-set&tls=false',
+            'standard_connection_string': 'mongodb://'
+            'service-name.namespace.svc.cluster-domain:1234'
+            '/?replicaSet=replica-set',
+        }
+        assert scaled == data
+
+    def test_relation_data_client_options(self):
+        config = {
+            'enable-sidecar': True,
+            'service-name': 'service-name',
+            'advertised-port': 1234,
+            'replica-set': 'rs0',
+            'client-max-pool-size': 50,
+            'client-min-pool-size': 0,
+            'client-max-idle-time-ms': 60000,
+            'client-compressors': 'zstd,snappy',
+            'client-read-preference': 'secondaryPreferred',
+            'client-write-concern': 'majority',
+            'client-retry-writes': 'true',
+        }
+        mock_formatter = MagicMock()
+        mock_formatter.format = MagicMock(
+            side_effect=(lambda x, client_options: dict(
+                client_options, connection_string=x)))
+        # Exercise
+        data = MongoBuilder('app-name', config, {}, ['app-name/0']) \
+            .build_relation_data(mock_formatter)
+        # Verify
+        assert data == {
+            'connection_string': 'mongodb://app-name-0.service-name:1234'
+            '/?replicaSet=rs0&maxPoolSize=50&maxIdleTimeMS=60000'
+            '&compressors=zstd,snappy&readPreference=secondaryPreferred'
+            '&w=majority&retryWrites=true',
+            'max_pool_size': '50',
+            'max_idle_time_ms': '60000',
+            'compressors': 'zstd,snappy',
+            'read_preference': 'secondaryPreferred',
+            'write_concern': 'majority',
+            'retry_writes': 'true',
+            # Unset, so removed from a previous publication
+            'min_pool_size': '',
+            'read_preference_tags': '',
+        }
+
+    def test_relation_data_client_roles(self):
+        config = {
+            'enable-sidecar': True,
+            'service-name': 'svc',
+            'advertised-port': 1234,
+            'replica-set': 'rs0',
+            'client-read-preference': 'primaryPreferred',
+        }
+        mock_formatter = MagicMock()
+        mock_formatter.format = MagicMock(
+            side_effect=(lambda x, client_options: dict(
+                client_options, connection_string=x)))
+        builder = MongoBuilder('app', config, {}, ['app/0'])
+        unset = {'max_pool_size': '', 'min_pool_size': '',
+                 'max_idle_time_ms': '', 'compressors': '',
+                 'write_concern': '', 'retry_writes': '',
+                 'read_preference_tags': ''}
+        # Exercise
+        oltp = builder.build_relation_data(mock_formatter)
+        read_only = builder.build_relation_data(mock_formatter, 'read-only')
+        analytics = builder.build_relation_data(mock_formatter, 'analytics')
+        unknown = builder.build_relation_data(mock_formatter, 'unknown')
+        # Verify
+        assert oltp == dict(unset, **{
+            'connection_string': 'mongodb://app-0.svc:1234'
+            '/?replicaSet=rs0&readPreference=primaryPreferred',
+            'read_preference': 'primaryPreferred',
+        })
+        assert read_only == dict(unset, **{
+            'connection_string': 'mongodb://app-0.svc:1234'
+            '/?replicaSet=rs0&readPreference=secondaryPreferred',
+            'read_preference': 'secondaryPreferred',
+        })
+        # No member is tagged
+        assert analytics == read_only
+        assert unknown == oltp
+
+    def test_relation_data_analytics_members(self):
+        config = {
+            'enable-sidecar': False,
+            'manage-replica-set': True,
+            'service-name': 'svc',
+            'advertised-port': 1234,
+            'replica-set': 'rs0',
+            'analytics-members': 1,
+            'analytics-tags': 'nodeType:ANALYTICS',
+        }
+        mock_formatter = MagicMock()
+        mock_formatter.format = MagicMock(
+            side_effect=(lambda x, client_options: x))
+        # Exercise
+        analytics = MongoBuilder(
+            'app', config, {}, ['app/0', 'app/1']).build_relation_data(
+                mock_formatter, 'analytics')
+        single = MongoBuilder('app', config, {}, ['app/0']) \
+            .build_relation_data(mock_formatter, 'analytics')
+        # Verify
+        assert analytics == 'mongodb://app-0.svc:1234,app-1.svc:1234' \
+            '/?replicaSet=rs0&readPreference=secondary' \
+            '&readPreferenceTags=nodeType:ANALYTICS'
+        assert single == 'mongodb://app-0.svc:1234' \
+            '/?replicaSet=rs0&readPreference=secondaryPreferred'
+
+    def test_relation_data_analytics_hidden(self):
+        config = {
+            'enable-sidecar': False,
+            'manage-replica-set': True,
+            'service-name': 'svc',
+            'advertised-port': 1234,
+            'replica-set': 'rs0',
+            'analytics-members': 1,
+            'analytics-tags': 'nodeType:ANALYTICS',
+        }
+        mock_formatter = MagicMock()
+        mock_formatter.format = MagicMock(
+            side_effect=(lambda x, client_options: x))
+        units = ['app/0', 'app/1']
+        # Exercise
+        hidden = MongoBuilder(
+            'app', dict(config, **{'analytics-hidden': True}), {}, units
+        ).build_relation_data(mock_formatter, 'analytics')
+        delayed = MongoBuilder(
+            'app', dict(config, **{'analytics-delay-seconds': 60}), {}, units
+        ).build_relation_data(mock_formatter, 'analytics')
+        # Verify
+        assert hidden == 'mongodb://app-0.svc:1234,app-1.svc:1234' \
+            '/?replicaSet=rs0&readPreference=secondaryPreferred'
+        assert delayed == hidden
+
+    def test_spec_srv_names_port(self):
+        config = {
+            'enable-sidecar': False,
+            'advertised-port': 1234,
+            'connection-uri-format': 'srv',
+        }
+        images = {'mongodb-image': MagicMock()}
+        # Exercise
+        spec = MongoBuilder('app-name', config, images, None).build_spec()
+        # Verify
+        assert spec['containers'][0]['ports'] == [{
+            'containerPort': 1234,
+            'protocol': 'TCP',
+            'name': 'mongodb',
+        }]
+
+    def test_parse_memory(self):
+        assert parse_memory('512Mi') == 512 * 2 ** 20
+        assert parse_memory('2Gi') == 2 * 2 ** 30
+        assert parse_memory('3G') == 3 * 10 ** 9
+        assert parse_memory('1024') == 1024
+        with self.assertRaises(ValueError):
+            parse_memory('lots')
+
+    def test_wiredtiger_cache_size(self):
+        assert wiredtiger_cache_size_gb('4Gi') == 1.5
+        assert wiredtiger_cache_size_gb('2.5Gi') == 0.75
+        assert wiredtiger_cache_size_gb('1Gi') == 0.25
+        assert wiredtiger_cache_size_gb('256Mi') == 0.25
+
+    def test_spec_resources(self):
+        config = {
+            'enable-sidecar': False,
+            'advertised-port': 1234,
+            'cpu-request': '500m',
+            'memory-request': '1Gi',
+            'cpu-limit': '2',
+            'memory-limit': '4Gi',
+            'journal-compressor': 'zstd',
+            'block-compressor': 'snappy',
+        }
+        images = {'mongodb-image': MagicMock()}
+        # Exercise
+        spec = MongoBuilder('app-name', config, images, None).build_spec()
+        # Verify
+        container = spec['containers'][0]
+        assert container['command'] == [
+            'mongod',
+            '--bind_ip',
+            '0.0.0.0',
+            '--wiredTigerCacheSizeGB', '1.5',
+            '--wiredTigerJournalCompressor', 'zstd',
+            '--wiredTigerCollectionBlockCompressor', 'snappy',
+        ]
+        assert container['resources'] == {
+            'requests': {'cpu': '500m', 'memory': '1Gi'},
+            'limits': {'cpu': '2', 'memory': '4Gi'},
+        }
+
+    def test_spec_cache_size_override(self):
+        config = {
+            'enable-sidecar': False,
+            'advertised-port': 1234,
+            'memory-limit': '4Gi',
+            'wiredtiger-cache-size-gb': 2.0,
+        }
+        images = {'mongodb-image': MagicMock()}
+        # Exercise
+        spec = MongoBuilder('app-name', config, images, None).build_spec()
+        # Verify
+        container = spec['containers'][0]
+        assert container['command'][3:] == ['--wiredTigerCacheSizeGB', '2.0']
+        assert container['resources'] == {'limits': {'memory': '4Gi'}}
+
+    def test_spec_liveness_ping(self):
+        config = {
+            'enable-sidecar': False,
+            'advertised-port': 1234,
+            'liveness-probe-mode': 'ping',
+            'liveness-probe-period': 20,
+            'liveness-probe-timeout': 2,
+            'liveness-probe-failure-threshold': 6,
+        }
+        images = {'mongodb-image': MagicMock()}
+        # Exercise
+        spec = MongoBuilder('app-name', config, images, None).build_spec()
+        # Verify
+        probe = spec['containers'][0]['livenessProbe']
+        assert probe['exec']['command'][0] == '/bin/bash'
+        assert 'mongo ' not in probe['exec']['command'][2]
+        assert probe['periodSeconds'] == 20
+        assert probe['timeoutSeconds'] == 2
+        assert probe['failureThreshold'] == 6
+
+    def test_spec_probe_timings(self):
+        config = {
+            'enable-sidecar': False,
+            'advertised-port': 1234,
+            'liveness-probe-initial-delay': 0,
+            'readiness-probe-initial-delay': 30,
+            'readiness-probe-period': 15,
+            'readiness-probe-timeout': 3,
+            'readiness-probe-failure-threshold': 4,
+            'readiness-max-lag-seconds': 10,
+            'startup-probe-period': 30,
+            'startup-probe-failure-threshold': 120,
+        }
+        images = {'mongodb-image': MagicMock()}
+        # Exercise
+        spec = MongoBuilder('app-name', config, images, None).build_spec()
+        # Verify
+        container = spec['containers'][0]
+        assert 'initialDelaySeconds' not in container['livenessProbe']
+        readiness_probe = container['readinessProbe']
+        assert readiness_probe['initialDelaySeconds'] == 30
+        assert readiness_probe['periodSeconds'] == 15
+        assert readiness_probe['timeoutSeconds'] == 3
+        assert readiness_probe['failureThreshold'] == 4
+        assert 'rs.status()' in readiness_probe['exec']['command'][2]
+        assert '<= 10 * 1000' in readiness_probe['exec']['command'][2]
+        assert container['startupProbe']['periodSeconds'] == 30
+        assert container['startupProbe']['failureThreshold'] == 120
+
+    def test_spec_startup_probe_disabled(self):
+        config = {
+            'enable-sidecar': False,
+            'advertised-port': 1234,
+            'startup-probe-failure-threshold': 0,
+        }
+        images = {'mongodb-image': MagicMock()}
+        # Exercise
+        spec = MongoBuilder('app-name', config, images, None).build_spec()
+        # Verify
+        assert 'startupProbe' not in spec['containers'][0]
+
+    def test_spec_manage_replica_set(self):
+        config = {
+            'enable-sidecar': False,
+            'manage-replica-set': True,
+            'advertised-port': 1234,
+            'replica-set': 'rs0',
+        }
+        images = {'mongodb-image': MagicMock()}
+        # Exercise
+        spec = MongoBuilder('app-name', config, images, None).build_spec()
+        # Verify
+        assert spec['containers'][0]['command'][3:] == ['--replSet', 'rs0']
+        assert len(spec['containers']) == 1
+
+    def test_replica_set_config(self):
+        config = {
+            'enable-sidecar': False,
+            'manage-replica-set': True,
+            'service-name': 'svc',
+            'advertised-port': 27017,
+            'replica-set': 'rs0',
+        }
+        units = ['mongodb/{}'.format(i) for i in range(9)]
+        builder = MongoBuilder('mongodb', config, {}, units)
+        # Exercise
+        rs_config = builder.build_replica_set_config()
+        # Verify
+        assert rs_config['_id'] == 'rs0'
+        members = rs_config['members']
+        assert members[0] == {'host': 'mongodb-0.svc:27017',
+                              'priority': 1, 'votes': 1,
+                              'hidden': False, 'tags': {}}
+        assert members[8] == {'host': 'mongodb-8.svc:27017',
+                              'priority': 0, 'votes': 0,
+                              'hidden': False, 'tags': {}}
+        assert sum(member['votes'] for member in members) == 7
+        assert rs_config == builder.build_replica_set_config()
+        mock_formatter = MagicMock()
+        mock_formatter.format = MagicMock(
+            side_effect=(lambda x, client_options: x))
+        assert builder.build_relation_data(mock_formatter).endswith(
+            'mongodb-8.svc:27017/?replicaSet=rs0')
+
+    def test_replica_set_config_analytics(self):
+        config = {
+            'enable-sidecar': False,
+            'manage-replica-set': True,
+            'service-name': 'svc',
+            'advertised-port': 27017,
+            'replica-set': 'rs0',
+            'analytics-members': 2,
+            'analytics-delay-seconds': 3600,
+            'analytics-tags': 'nodeType:ANALYTICS,dc:a',
+        }
+        units = ['mongodb/{}'.format(i) for i in range(4)]
+        builder = MongoBuilder('mongodb', config, {}, units)
+        # Exercise
+        members = builder.build_replica_set_config()['members']
+        single = MongoBuilder('mongodb', config, {}, units[:1]) \
+            .build_replica_set_config()['members']
+        # Verify
+        assert [m['votes'] for m in members] == [1, 1, 0, 0]
+        assert [m['priority'] for m in members] == [1, 1, 0, 0]
+        assert members[3] == {'host': 'mongodb-3.svc:27017',
+                              'priority': 0, 'votes': 0, 'hidden': True,
+                              'tags': {'nodeType': 'ANALYTICS', 'dc': 'a'},
+                              'secondaryDelaySecs': 3600}
+        assert single[0]['priority'] == 1
+        assert not single[0]['hidden']
+
+    def test_spec_readiness_skips_analytics_lag(self):
+        config = {
+            'enable-sidecar': False,
+            'advertised-port': 1234,
+            'readiness-max-lag-seconds': 10,
+        }
+        images = {'mongodb-image': MagicMock()}
+        # Exercise
+        spec = MongoBuilder('app-name', config, images, None).build_spec()
+        # Verify
+        check = spec['containers'][0]['readinessProbe']['exec']['command'][2]
+        assert "if (h.hidden || (h.tags && " \
+            "h.tags['nodeType'] == 'ANALYTICS')) quit(0);" in check
+
+    def test_spec_mongos(self):
+        config = {
+            'enable-sidecar': False,
+            'manage-replica-set': True,
+            'cluster-role': 'mongos',
+            'config-server': 'cfg/cfg-0.cfg-endpoints:27019',
+            'service-name': 'router-endpoints',
+            'advertised-port': 27017,
+            'replica-set': 'rs0',
+            'memory-limit': '4Gi',
+            'readiness-max-lag-seconds': 10,
+        }
+        units = ['router/0', 'router/1']
+        images = {'mongodb-image': MagicMock()}
+        builder = MongoBuilder('router', config, images, units)
+        mock_formatter = MagicMock()
+        mock_formatter.format = MagicMock(
+            side_effect=(lambda x, client_options: x))
+        # Exercise
+        spec = builder.build_spec()
+        relation_data = builder.build_relation_data(mock_formatter)
+        # Verify
+        container = spec['containers'][0]
+        assert container['command'] == [
+            'mongos', '--bind_ip', '0.0.0.0', '--port', '27017',
+            '--configdb', 'cfg/cfg-0.cfg-endpoints:27019',
+        ]
+        assert 'rs.status()' not in \
+            container['readinessProbe']['exec']['command'][2]
+        assert relation_data == ('mongodb://router-0.router-endpoints:27017,'
+                                 'router-1.router-endpoints:27017')
+
+    def test_spec_config_server(self):
+        config = {
+            'enable-sidecar': False,
+            'manage-replica-set': True,
+            'cluster-role': 'configsvr',
+            'service-name': 'cfg-endpoints',
+            'advertised-port': 27019,
+            'replica-set': 'cfg',
+        }
+        images = {'mongodb-image': MagicMock()}
+        builder = MongoBuilder('cfg', config, images, ['cfg/0'])
+        # Exercise
+        spec = builder.build_spec()
+        # Verify
+        assert spec['containers'][0]['command'][3:] == [
+            '--configsvr', '--port', '27019', '--replSet', 'cfg']
+        assert builder.build_replica_set_config()['configsvr'] is True
+
+    def test_spec_invalid_cluster_role(self):
+        images = {'mongodb-image': MagicMock()}
+        for config in ({'cluster-role': 'arbiter'},
+                       {'cluster-role': 'mongos', 'config-server': ''},
+                       {'cluster-role': 'configsvr'},
+                       {'cluster-role': 'shardsvr',
+                        'manage-replica-set': False}):
+            config.update({'enable-sidecar': False, 'advertised-port': 1})
+            with self.assertRaises(ValueError):
+                MongoBuilder('app-name', config, images, None).build_spec()
+
+
+class FakeProbeTarget(FakeMongod):
+    """mongod giving the same reply to every probe, recording requests."""
+
+    def __init__(self, reply):
+        super().__init__()
+        self.reply = reply
+        self.requests = []
+
+    def respond(self, header, body):
+        self.requests.append(struct.pack('<iiii', *header) + body)
+        return self.reply
+
+
+@unittest.skipUnless(os.path.exists('/bin/bash'), 'requires bash')
+class WireProbeTest(unittest.TestCase):
+
+    def run_probe(self, reply, probe='livenessProbe'):
+        server = serve(self, FakeProbeTarget(wire.op_msg(reply)))
+        config = {
+            'enable-sidecar': False,
+            'advertised-port': server.server_address[1],
+            'liveness-probe-mode': 'ping',
+        }
+        images = {'mongodb-image': MagicMock()}
+        spec = MongoBuilder('app-name', config, images, None).build_spec()
+        command = spec['containers'][0][probe]['exec']['command']
+        result = subprocess.run(command, timeout=10)
+        return result.returncode, server.requests
+
+    def test_ping_ok(self):
+        returncode, requests = self.run_probe({'ok': 1.0})
+        assert returncode == 0
+        assert requests == [wire.op_msg({'ping': 1, '$db': 'admin'})]
+
+    def test_ping_failed(self):
+        returncode, _ = self.run_probe({'ok': 0.0, 'errmsg': 'failed'})
+        assert returncode != 0
+
+    def test_readiness_primary(self):
+        returncode, requests = self.run_probe(
+            {'ismaster': True, 'secondary': False, 'ok': 1.0},
+            'readinessProbe')
+        assert returncode == 0
+        assert requests == [wire.op_msg({'isMaster': 1, '$db': 'admin'})]
+
+    def test_readiness_secondary(self):
+        returncode, _ = self.run_probe(
+            {'ismaster': False, 'secondary': True, 'ok': 1.0},
+            'readinessProbe')
+        assert returncode == 0
+
+    def test_readiness_recovering(self):
+        returncode, _ = self.run_probe(
+            {'ismaster': False, 'secondary': False, 'ok': 1.0},
+            'readinessProbe')
+        assert returncode != 0
+
+    def test_startup_ping(self):
+        returncode, _ = self.run_probe({'ok': 1.0}, 'startupProbe')
+        assert returncode == 0
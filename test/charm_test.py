@@ -53,7 +53,8 @@ class CharmTest(unittest.TestCase):
         model.pod = create_autospec(Pod)
         model.config = create_autospec(ConfigData)
         raw_meta = {
-            'provides': {'mongo': {"interface": "mongodb"}}
+            'provides': {'mongo': {"interface": "mongodb"}},
+            'peers': {'replicas': {"interface": "mongodb-replicas"}},
         }
         framework = Framework(self.tmpdir / "framework.data.{}"
                               .format(str(uuid4)),
@@ -0,0 +1,80 @@
+import socketserver
+import sys
+import threading
+sys.path.append('src')
+
+import wire
+
+
+class FakeMongod(socketserver.ThreadingTCPServer):
+    """In-process mongod answering OP_MSG commands.
+
+    Tests subclass it and implement run(command), returning the reply
+    document of every command.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeMongodHandler)
+        self.host = '127.0.0.1:{}'.format(self.server_address[1])
+
+    def respond(self, header, body):
+        """Reply message to the request message (header, body)."""
+        return wire.op_msg(self.run(wire.op_msg_document(body)), header[1])
+
+    def run(self, command):
+        return {'ok': 0.0, 'code': 59, 'errmsg': 'no such command'}
+
+
+class FakeMongodHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        while True:
+            try:
+                header, body = wire.read_message(self.request)
+            except ConnectionError:
+                return
+            self.request.sendall(self.server.respond(header, body))
+
+
+def vote_changes(current, config):
+    """Voting members added, removed or changed, as MongoDB 4.4 counts."""
+    before = {m['host']: m['votes'] for m in current['members']}
+    after = {m['host']: m['votes'] for m in config['members']}
+    return sum(before.get(host, 0) != after.get(host, 0)
+               for host in set(before) | set(after))
+
+
+def replica_set_config_error(config, current=None, max_wire_version=9):
+    """Error reply of mongod rejecting a replica set config, or None.
+
+    The default wire version is MongoDB 4.4's; 13 and later are 5.0+,
+    which renamed slaveDelay to secondaryDelaySecs.
+    """
+    unknown = 'slaveDelay' if max_wire_version >= 13 \
+        else 'secondaryDelaySecs'
+    for member in config['members']:
+        if unknown in member:
+            return {'ok': 0.0, 'code': 93,
+                    'errmsg': 'Unexpected field {} in replica set member '
+                              'configuration'.format(unknown)}
+        if (member.get('hidden') or member.get('slaveDelay') or
+                member.get('secondaryDelaySecs')) and member.get('priority'):
+            return {'ok': 0.0, 'code': 103,
+                    'errmsg': 'priority must be 0 when hidden or delayed'}
+    if current is not None:
+        if config['version'] <= current['version']:
+            return {'ok': 0.0, 'code': 103, 'errmsg': 'stale version'}
+        if vote_changes(current, config) > 1:
+            return {'ok': 0.0, 'code': 103,
+                    'errmsg': 'more than one voter changed'}
+    return None
+
+
+def serve(test_case, server):
+    """Serve in the background until the end of test_case."""
+    test_case.addCleanup(server.server_close)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    test_case.addCleanup(server.shutdown)
+    return server
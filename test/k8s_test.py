@@ -1,8 +1,14 @@
+import http.client
 import io
 import json
+import os
+import shutil
 import sys
+import tempfile
+import threading
 import unittest
 from unittest.mock import (
+    ANY,
     call,
     patch,
 )
@@ -13,12 +19,31 @@ from uuid import (
 sys.path.append('src')
 from k8s import (
     K8sApi,
+    K8sCache,
+    K8sListing,
     K8sPod,
+    K8sPvc,
+    K8sSnapshot,
 )
 
 
 class K8sApiTest(unittest.TestCase):
 
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.addCleanup(K8sApi.close_all)
+        self.token_path = os.path.join(self.tmpdir, 'token')
+        self.ca_path = os.path.join(self.tmpdir, 'ca.crt')
+        for path in (self.token_path, self.ca_path):
+            with open(path, 'w') as f:
+                f.write(str(uuid4()))
+
+    def create_api(self):
+        return K8sApi(host='localhost',
+                      token_path=self.token_path,
+                      ca_path=self.ca_path)
+
     @patch('k8s.open', create=True)
     @patch('k8s.ssl.SSLContext', autospec=True, spec_set=True)
     @patch('k8s.http.client.HTTPSConnection', autospec=True, spec_set=True)
@@ -40,6 +65,203 @@ class K8sApiTest(unittest.TestCase):
         # Assert
         assert response == mock_response_dict
 
+    @patch('k8s.ssl.SSLContext', autospec=True, spec_set=True)
+    @patch('k8s.http.client.HTTPSConnection', autospec=True, spec_set=True)
+    def test_connection_reused(
+            self,
+            mock_https_connection_cls,
+            mock_ssl_context_cls):
+        # Setup
+        mock_conn = mock_https_connection_cls.return_value
+        mock_conn.getresponse.side_effect = \
+            lambda: io.StringIO(json.dumps({}))
+
+        # Exercise
+        self.create_api().get('/some/path')
+        self.create_api().get('/some/path')
+        self.create_api().delete('/some/path')
+
+        # Assert
+        assert mock_https_connection_cls.call_count == 1
+        assert mock_ssl_context_cls.call_count == 1
+        assert mock_conn.request.call_count == 3
+
+    def test_session_per_thread(self):
+        # Setup
+        sessions = []
+        thread = threading.Thread(
+            target=lambda: sessions.append(self.create_api().session))
+
+        # Exercise
+        thread.start()
+        thread.join()
+
+        # Assert
+        assert self.create_api().session is self.create_api().session
+        assert sessions[0] is not self.create_api().session
+
+    def test_close_threads(self):
+        # Setup
+        idents = []
+
+        def use_api():
+            self.create_api()
+            idents.append(threading.get_ident())
+
+        thread = threading.Thread(target=use_api)
+        thread.start()
+        thread.join()
+        session = self.create_api().session
+
+        # Exercise
+        K8sApi.close_threads(idents)
+
+        # Assert
+        assert [key[3] for key in K8sApi._sessions] == [
+            threading.get_ident()]
+        assert self.create_api().session is session
+
+    @patch('k8s.ssl.SSLContext', autospec=True, spec_set=True)
+    @patch('k8s.http.client.HTTPSConnection', autospec=True, spec_set=True)
+    def test_reconnect_on_remote_disconnect(
+            self,
+            mock_https_connection_cls,
+            mock_ssl_context_cls):
+        # Setup
+        mock_response_dict = {str(uuid4()): str(uuid4())}
+        mock_conn = mock_https_connection_cls.return_value
+        mock_conn.getresponse.side_effect = [
+            http.client.RemoteDisconnected(),
+            io.StringIO(json.dumps(mock_response_dict)),
+        ]
+
+        # Exercise
+        response = self.create_api().get('/some/path')
+
+        # Assert
+        assert response == mock_response_dict
+        assert mock_https_connection_cls.call_count == 2
+        assert mock_conn.close.call_count == 1
+
+    @patch('k8s.ssl.SSLContext', autospec=True, spec_set=True)
+    @patch('k8s.http.client.HTTPSConnection', autospec=True, spec_set=True)
+    def test_token_reloaded_on_change(
+            self,
+            mock_https_connection_cls,
+            mock_ssl_context_cls):
+        # Setup
+        new_token = str(uuid4())
+        mock_conn = mock_https_connection_cls.return_value
+        mock_conn.getresponse.side_effect = \
+            lambda: io.StringIO(json.dumps({}))
+
+        # Exercise
+        self.create_api().get('/some/path')
+        with open(self.token_path, 'w') as f:
+            f.write(new_token + new_token)
+        self.create_api().get('/some/path')
+
+        # Assert
+        assert mock_ssl_context_cls.call_count == 2
+        assert mock_conn.request.call_args == call(
+            method='GET', url='/some/path',
+            headers={'Authorization': f'Bearer {new_token}{new_token}'})
+
+    @patch.object(K8sApi, 'get', autospec=True, spec_set=True)
+    def test_list_pages(self, mock_get):
+        # Setup
+        token = f'{uuid4()}/{uuid4()}'
+        mock_get.side_effect = [
+            {'kind': 'PodList', 'items': [1, 2],
+             'metadata': {'continue': token}},
+            {'kind': 'PodList', 'items': [3],
+             'metadata': {}},
+        ]
+
+        # Exercise
+        items = list(self.create_api().list('/pods?labelSelector=a',
+                                            'PodList', limit=2))
+
+        # Assert
+        assert items == [1, 2, 3]
+        assert mock_get.call_args_list == [
+            call(ANY, '/pods?labelSelector=a&limit=2'),
+            call(ANY, '/pods?labelSelector=a&limit=2&continue={}'
+                 .format(token.replace('/', '%2F'))),
+        ]
+
+    @patch.object(K8sApi, 'get', autospec=True, spec_set=True)
+    def test_list_stops_early(self, mock_get):
+        # Setup
+        mock_get.return_value = {
+            'kind': 'PodList', 'items': [1, 2],
+            'metadata': {'continue': f'{uuid4()}'}
+        }
+
+        # Exercise
+        listing = K8sListing(self.create_api().list('/pods', 'PodList'))
+        first = next(i for i in listing if i == 2)
+        replayed = next(i for i in listing if i == 1)
+
+        # Assert
+        assert (first, replayed) == (2, 1)
+        assert mock_get.call_count == 1
+
+    @patch.object(K8sApi, 'get', autospec=True, spec_set=True)
+    def test_list_other_kind(self, mock_get):
+        # Setup
+        mock_get.return_value = {'kind': 'Status', 'items': [1]}
+
+        # Exercise
+        items = list(self.create_api().list('/pods', 'PodList'))
+
+        # Assert
+        assert items == []
+
+
+class K8sCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'cache.json')
+
+    def test_put_get_persisted(self):
+        # Setup
+        obj = {'metadata': {'resourceVersion': f'{uuid4()}'}}
+
+        # Exercise
+        K8sCache(self.path).put('pods', 'pod-0', obj)
+        cached = K8sCache(self.path).get('pods', 'pod-0')
+
+        # Assert
+        assert cached == obj
+
+    @patch('k8s.time.time')
+    def test_entry_expires(self, mock_time):
+        # Setup
+        mock_time.return_value = 1000
+        cache = K8sCache(self.path, ttl=60)
+        cache.put('pods', 'pod-0', {'metadata': {}})
+
+        # Exercise
+        mock_time.return_value = 1061
+
+        # Assert
+        assert cache.get('pods', 'pod-0') is None
+
+    def test_invalidate(self):
+        # Setup
+        cache = K8sCache(self.path)
+        cache.put('pods', 'pod-0', {'metadata': {}})
+
+        # Exercise
+        cache.invalidate()
+
+        # Assert
+        assert not os.path.exists(self.path)
+        assert K8sCache(self.path).get('pods', 'pod-0') is None
+
 
 class K8sPodTest(unittest.TestCase):
 
@@ -52,7 +274,8 @@ class K8sPodTest(unittest.TestCase):
         # Setup
         app_name = f'{uuid4()}'
         mock_model_name = f'{uuid4()}'
-        mock_unit_name = f'{uuid4()}'
+        mock_unit_name = f'{uuid4()}/0'
+        mock_pod_name = mock_unit_name.replace('/', '-')
         mock_os.environ = {
             'JUJU_MODEL_NAME': mock_model_name,
             'JUJU_UNIT_NAME': mock_unit_name,
@@ -84,7 +307,8 @@ class K8sPodTest(unittest.TestCase):
         assert mock_k8s_api.get.call_count == 1
         assert mock_k8s_api.get.call_args == call(
             '/api/v1/namespaces/{}/pods?labelSelector=juju-app={}'
-            .format(mock_model_name, app_name)
+            '&fieldSelector=metadata.name={}'
+            .format(mock_model_name, app_name, mock_pod_name)
         )
         assert pod.is_running
         assert pod.is_ready
@@ -98,7 +322,8 @@ class K8sPodTest(unittest.TestCase):
         # Setup
         app_name = f'{uuid4()}'
         mock_model_name = f'{uuid4()}'
-        mock_unit_name = f'{uuid4()}'
+        mock_unit_name = f'{uuid4()}/0'
+        mock_pod_name = mock_unit_name.replace('/', '-')
         mock_os.environ = {
             'JUJU_MODEL_NAME': mock_model_name,
             'JUJU_UNIT_NAME': mock_unit_name,
@@ -107,6 +332,7 @@ class K8sPodTest(unittest.TestCase):
         mock_k8s_api.get.return_value = {
             'kind': 'Undefined'
         }
+        mock_k8s_api.list.return_value = iter([])
 
         # Exercise
         pod = K8sPod(app_name)
@@ -116,11 +342,59 @@ class K8sPodTest(unittest.TestCase):
         assert mock_k8s_api.get.call_count == 1
         assert mock_k8s_api.get.call_args == call(
             '/api/v1/namespaces/{}/pods?labelSelector=juju-app={}'
-            .format(mock_model_name, app_name)
+            '&fieldSelector=metadata.name={}'
+            .format(mock_model_name, app_name, mock_pod_name)
+        )
+        assert mock_k8s_api.list.call_count == 1
+        assert mock_k8s_api.list.call_args == call(
+            '/api/v1/namespaces/{}/pods?labelSelector=juju-app={}'
+            .format(mock_model_name, app_name),
+            'PodList'
         )
         assert not pod.is_running
         assert not pod.is_ready
 
+    @patch('k8s.os', autospec=True, spec_set=True)
+    @patch('k8s.K8sApi', autospec=True, spec_set=True)
+    def test_pod_name_mismatch_falls_back_to_list(
+            self,
+            mock_k8s_api_cls,
+            mock_os):
+        # Setup
+        app_name = f'{uuid4()}'
+        mock_model_name = f'{uuid4()}'
+        mock_unit_name = f'{uuid4()}/0'
+        mock_os.environ = {
+            'JUJU_MODEL_NAME': mock_model_name,
+            'JUJU_UNIT_NAME': mock_unit_name,
+        }
+        pod = {
+            'metadata': {
+                'annotations': {
+                    'juju.io/unit': mock_unit_name
+                }
+            },
+            'status': {
+                'phase': 'Running',
+                'conditions': [{
+                    'type': 'ContainersReady',
+                    'status': 'True'
+                }]
+            }
+        }
+        mock_k8s_api = mock_k8s_api_cls.return_value
+        mock_k8s_api.get.return_value = {'kind': 'PodList', 'items': []}
+        mock_k8s_api.list.return_value = iter([pod])
+
+        # Exercise
+        k8s_pod = K8sPod(app_name)
+        k8s_pod.fetch()
+
+        # Assert
+        assert mock_k8s_api.get.call_count == 1
+        assert mock_k8s_api.list.call_count == 1
+        assert k8s_pod.is_ready
+
     @patch('k8s.os', autospec=True, spec_set=True)
     @patch('k8s.K8sApi', autospec=True, spec_set=True)
     def test_pod_not_running(
@@ -130,7 +404,8 @@ class K8sPodTest(unittest.TestCase):
         # Setup
         app_name = f'{uuid4()}'
         mock_model_name = f'{uuid4()}'
-        mock_unit_name = f'{uuid4()}'
+        mock_unit_name = f'{uuid4()}/0'
+        mock_pod_name = mock_unit_name.replace('/', '-')
         mock_os.environ = {
             'JUJU_MODEL_NAME': mock_model_name,
             'JUJU_UNIT_NAME': mock_unit_name,
@@ -162,7 +437,355 @@ class K8sPodTest(unittest.TestCase):
         assert mock_k8s_api.get.call_count == 1
         assert mock_k8s_api.get.call_args == call(
             '/api/v1/namespaces/{}/pods?labelSelector=juju-app={}'
-            .format(mock_model_name, app_name)
+            '&fieldSelector=metadata.name={}'
+            .format(mock_model_name, app_name, mock_pod_name)
         )
         assert not pod.is_running
         assert not pod.is_ready
+
+
+class K8sPvcTest(unittest.TestCase):
+
+    def create_lists(self, unit_name, pvc_name):
+        return {
+            'pods': {
+                'kind': 'PodList',
+                'items': [{
+                    'metadata': {
+                        'annotations': {
+                            'juju.io/unit': unit_name
+                        }
+                    },
+                    'spec': {
+                        'volumes': [{
+                            'persistentVolumeClaim': {
+                                'claimName': pvc_name
+                            }
+                        }]
+                    },
+                    'status': {
+                        'phase': 'Running',
+                        'conditions': [{
+                            'type': 'ContainersReady',
+                            'status': 'True'
+                        }]
+                    }
+                }],
+            },
+            'persistentvolumeclaims': {
+                'kind': 'PersistentVolumeClaimList',
+                'items': [{
+                    'metadata': {
+                        'name': f'{uuid4()}'
+                    },
+                    'status': {
+                        'phase': 'Bound'
+                    }
+                }, {
+                    'metadata': {
+                        'name': pvc_name
+                    },
+                    'status': {
+                        'phase': 'Bound'
+                    }
+                }],
+            },
+        }
+
+    @patch('k8s.os', autospec=True, spec_set=True)
+    @patch('k8s.K8sApi', autospec=True, spec_set=True)
+    def test_snapshot_shared(
+            self,
+            mock_k8s_api_cls,
+            mock_os):
+        # Setup
+        app_name = f'{uuid4()}'
+        mock_model_name = f'{uuid4()}'
+        mock_unit_name = f'{uuid4()}/0'
+        mock_pod_name = mock_unit_name.replace('/', '-')
+        pvc_name = f'{uuid4()}'
+        mock_os.environ = {
+            'JUJU_MODEL_NAME': mock_model_name,
+            'JUJU_UNIT_NAME': mock_unit_name,
+        }
+        lists = self.create_lists(mock_unit_name, pvc_name)
+        mock_k8s_api = mock_k8s_api_cls.return_value
+        mock_k8s_api.get.return_value = lists['pods']
+        mock_k8s_api.list.side_effect = \
+            lambda path, kind: iter(lists['persistentvolumeclaims']['items'])
+
+        # Exercise
+        snapshot = K8sSnapshot(app_name)
+        pod = K8sPod(app_name, snapshot)
+        pvc = K8sPvc(app_name, snapshot)
+
+        # Assert
+        assert pod.is_ready
+        assert pvc.is_running
+        assert mock_k8s_api.get.call_count == 1
+        assert mock_k8s_api.get.call_args == call(
+            '/api/v1/namespaces/{}/pods?labelSelector=juju-app={}'
+            '&fieldSelector=metadata.name={}'
+            .format(mock_model_name, app_name, mock_pod_name))
+        assert mock_k8s_api.list.call_count == 1
+        assert mock_k8s_api.list.call_args == call(
+            '/api/v1/namespaces/{}/persistentvolumeclaims?'
+            'labelSelector=juju-app={}'
+            .format(mock_model_name, app_name),
+            'PersistentVolumeClaimList')
+
+    @patch('k8s.os', autospec=True, spec_set=True)
+    @patch('k8s.K8sApi', autospec=True, spec_set=True)
+    def test_delete_invalidates_snapshot(
+            self,
+            mock_k8s_api_cls,
+            mock_os):
+        # Setup
+        app_name = f'{uuid4()}'
+        mock_model_name = f'{uuid4()}'
+        mock_unit_name = f'{uuid4()}/0'
+        pvc_name = f'{uuid4()}'
+        mock_os.environ = {
+            'JUJU_MODEL_NAME': mock_model_name,
+            'JUJU_UNIT_NAME': mock_unit_name,
+        }
+        lists = self.create_lists(mock_unit_name, pvc_name)
+        mock_k8s_api = mock_k8s_api_cls.return_value
+        mock_k8s_api.get.return_value = lists['pods']
+        mock_k8s_api.list.side_effect = \
+            lambda path, kind: iter(lists['persistentvolumeclaims']['items'])
+
+        # Exercise
+        snapshot = K8sSnapshot(app_name)
+        pvc = K8sPvc(app_name, snapshot)
+        pvc.delete()
+        list(snapshot.pvcs)
+
+        # Assert
+        assert mock_k8s_api.delete.call_args == call(
+            '/api/v1/namespaces/{}/persistentvolumeclaims/{}'
+            .format(mock_model_name, pvc_name))
+        assert mock_k8s_api.list.call_count == 2
+
+    def create_scaled_down_lists(self, app_name):
+        def pvc(name, phase='Bound'):
+            return {'metadata': {'name': name}, 'status': {'phase': phase}}
+
+        def pod(claim):
+            return {'spec': {'volumes': [
+                {'name': 'config', 'configMap': {}},
+                {'persistentVolumeClaim': {'claimName': claim}},
+            ]}}
+
+        return {
+            'PodList': [pod(f'database-{app_name}-0'),
+                        pod(f'database-{app_name}-1')],
+            'PersistentVolumeClaimList': [
+                pvc(f'database-{app_name}-0'),
+                pvc(f'database-{app_name}-1'),
+                pvc(f'database-{app_name}-2'),
+                pvc(f'database-{app_name}-3', 'Lost'),
+                pvc(f'database-{app_name}-4', 'Pending'),
+            ],
+        }
+
+    @patch('k8s.os', autospec=True, spec_set=True)
+    @patch('k8s.K8sApi', autospec=True, spec_set=True)
+    def test_delete_orphaned(
+            self,
+            mock_k8s_api_cls,
+            mock_os):
+        # Setup
+        app_name = f'{uuid4()}'
+        mock_model_name = f'{uuid4()}'
+        mock_os.environ = {'JUJU_MODEL_NAME': mock_model_name}
+        lists = self.create_scaled_down_lists(app_name)
+        mock_k8s_api = mock_k8s_api_cls.return_value
+        mock_k8s_api.list.side_effect = lambda path, kind: iter(lists[kind])
+        mock_k8s_api.delete.side_effect = lambda path: {
+            f'database-{app_name}-3': {
+                'kind': 'Status', 'status': 'Failure', 'reason': 'NotFound'},
+            f'database-{app_name}-4': {
+                'kind': 'Status', 'status': 'Failure', 'reason': 'Forbidden',
+                'message': 'forbidden'},
+        }.get(path.rsplit('/', 1)[1], {'kind': 'PersistentVolumeClaim'})
+        snapshot = K8sSnapshot(app_name)
+
+        # Exercise
+        deleted, failed = K8sPvc(app_name, snapshot).delete_orphaned(
+            2, parallelism=2)
+
+        # Assert
+        assert sorted(deleted) == [f'database-{app_name}-2',
+                                   f'database-{app_name}-3']
+        assert failed == {f'database-{app_name}-4': 'forbidden'}
+        assert sorted(c[0][0] for c in mock_k8s_api.delete.call_args_list) \
+            == ['/api/v1/namespaces/{}/persistentvolumeclaims/'
+                'database-{}-{}'.format(mock_model_name, app_name, i)
+                for i in (2, 3, 4)]
+        assert mock_k8s_api.list.call_count == 2
+        list(snapshot.pvcs)
+        assert mock_k8s_api.list.call_count == 3
+
+    @patch('k8s.os', autospec=True, spec_set=True)
+    @patch('k8s.K8sApi', autospec=True, spec_set=True)
+    def test_delete_orphaned_http_error(
+            self,
+            mock_k8s_api_cls,
+            mock_os):
+        # Setup
+        app_name = f'{uuid4()}'
+        mock_os.environ = {'JUJU_MODEL_NAME': f'{uuid4()}'}
+        lists = self.create_scaled_down_lists(app_name)
+        mock_k8s_api = mock_k8s_api_cls.return_value
+        mock_k8s_api.list.side_effect = lambda path, kind: iter(lists[kind])
+        mock_k8s_api.delete.side_effect = http.client.IncompleteRead(b'')
+
+        # Exercise
+        deleted, failed = K8sPvc(app_name, K8sSnapshot(app_name)) \
+            .delete_orphaned(3, parallelism=2)
+
+        # Assert
+        assert deleted == []
+        assert list(failed) == [f'database-{app_name}-{i}' for i in (3, 4)]
+        assert all('IncompleteRead' in reason for reason in failed.values())
+        assert mock_k8s_api_cls.close_threads.call_count == 1
+
+    @patch('k8s.os', autospec=True, spec_set=True)
+    @patch('k8s.K8sApi', autospec=True, spec_set=True)
+    def test_delete_orphaned_dry_run(
+            self,
+            mock_k8s_api_cls,
+            mock_os):
+        # Setup
+        app_name = f'{uuid4()}'
+        mock_os.environ = {'JUJU_MODEL_NAME': f'{uuid4()}'}
+        lists = self.create_scaled_down_lists(app_name)
+        mock_k8s_api = mock_k8s_api_cls.return_value
+        mock_k8s_api.list.side_effect = lambda path, kind: iter(lists[kind])
+
+        # Exercise
+        deleted, failed = K8sPvc(app_name, K8sSnapshot(app_name)) \
+            .delete_orphaned(1, dry_run=True)
+
+        # Assert
+        assert deleted == ['database-{}-{}'.format(app_name, i)
+                           for i in (2, 3, 4)]
+        assert failed == {}
+        assert not mock_k8s_api.delete.called
+
+
+class K8sSnapshotCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'cache.json')
+
+    def create_pod(self, unit_name, version):
+        return {
+            'metadata': {
+                'resourceVersion': version,
+                'annotations': {
+                    'juju.io/unit': unit_name
+                }
+            },
+            'status': {
+                'phase': 'Running',
+                'conditions': [{
+                    'type': 'ContainersReady',
+                    'status': 'True'
+                }]
+            }
+        }
+
+    @patch('k8s.os.environ')
+    @patch('k8s.K8sApi', autospec=True, spec_set=True)
+    def test_unchanged_pod_served_from_cache(
+            self,
+            mock_k8s_api_cls,
+            mock_environ):
+        # Setup
+        app_name = f'{uuid4()}'
+        mock_model_name = f'{uuid4()}'
+        mock_unit_name = f'{uuid4()}/0'
+        mock_pod_name = mock_unit_name.replace('/', '-')
+        environ = {
+            'JUJU_MODEL_NAME': mock_model_name,
+            'JUJU_UNIT_NAME': mock_unit_name,
+        }
+        mock_environ.__getitem__.side_effect = environ.__getitem__
+        pod = self.create_pod(mock_unit_name, '42')
+        K8sCache(self.path).put('pods', mock_pod_name, pod)
+        mock_k8s_api = mock_k8s_api_cls.return_value
+        mock_k8s_api.get.return_value = {
+            'kind': 'PartialObjectMetadata',
+            'metadata': {'resourceVersion': '42'}
+        }
+
+        # Exercise
+        snapshot = K8sSnapshot(app_name, K8sCache(self.path))
+        k8s_pod = K8sPod(app_name, snapshot)
+
+        # Assert
+        assert k8s_pod.is_ready
+        assert mock_k8s_api.get.call_count == 1
+        assert mock_k8s_api.get.call_args == call(
+            '/api/v1/namespaces/{}/pods/{}'
+            .format(mock_model_name, mock_pod_name),
+            headers={'Accept': ANY}
+        )
+
+    @patch('k8s.os.environ')
+    @patch('k8s.K8sApi', autospec=True, spec_set=True)
+    def test_changed_pod_refetched(
+            self,
+            mock_k8s_api_cls,
+            mock_environ):
+        # Setup
+        app_name = f'{uuid4()}'
+        mock_model_name = f'{uuid4()}'
+        mock_unit_name = f'{uuid4()}/0'
+        mock_pod_name = mock_unit_name.replace('/', '-')
+        environ = {
+            'JUJU_MODEL_NAME': mock_model_name,
+            'JUJU_UNIT_NAME': mock_unit_name,
+        }
+        mock_environ.__getitem__.side_effect = environ.__getitem__
+        K8sCache(self.path).put('pods', mock_pod_name,
+                                self.create_pod(mock_unit_name, '42'))
+        pod = self.create_pod(mock_unit_name, '43')
+        mock_k8s_api = mock_k8s_api_cls.return_value
+        mock_k8s_api.get.side_effect = [
+            {'metadata': {'resourceVersion': '43'}},
+            {'kind': 'PodList', 'items': [pod]},
+        ]
+
+        # Exercise
+        snapshot = K8sSnapshot(app_name, K8sCache(self.path))
+        k8s_pod = K8sPod(app_name, snapshot)
+
+        # Assert
+        assert k8s_pod.is_ready
+        assert mock_k8s_api.get.call_count == 2
+        assert K8sCache(self.path).get('pods', mock_pod_name) == pod
+
+    @patch('k8s.os.environ')
+    @patch('k8s.K8sApi', autospec=True, spec_set=True)
+    def test_invalidate_drops_cache(
+            self,
+            mock_k8s_api_cls,
+            mock_environ):
+        # Setup
+        app_name = f'{uuid4()}'
+        mock_unit_name = f'{uuid4()}/0'
+        mock_pod_name = mock_unit_name.replace('/', '-')
+        K8sCache(self.path).put('pods', mock_pod_name,
+                                self.create_pod(mock_unit_name, '42'))
+
+        # Exercise
+        snapshot = K8sSnapshot(app_name, K8sCache(self.path))
+        K8sPod(app_name, snapshot).invalidate()
+
+        # Assert
+        assert K8sCache(self.path).get('pods', mock_pod_name) is None
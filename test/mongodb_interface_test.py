@@ -58,6 +58,70 @@ class MongoDbInterfaceTest(unittest.TestCase):
         # Validate
         assert server.state.apps == []
 
+    @patch('ops.framework.BoundStoredState')
+    def test_mongo_server_on_joined_once_per_app(self, mock_store_class):
+        # Setup
+        mock_store = mock_store_class.return_value
+        mock_store.apps = []
+        mock_charm = MagicMock()
+        server = MongoDbServer(mock_charm, 'mongo')
+        events = []
+        for app in ('a', 'a', 'b', 'a'):
+            mock_event = create_autospec(EventBase)
+            mock_event.relation = MagicMock()
+            mock_event.app = MagicMock()
+            mock_event.app.name = app
+            events.append(mock_event)
+
+        # Exercise
+        with patch.object(server.on, 'new_client') as mock_new_client:
+            for mock_event in events:
+                server.on_joined(mock_event)
+
+        # Validate
+        assert mock_store.apps == ['a', 'b']
+        assert mock_new_client.emit.call_count == 2
+
+    @patch('ops.framework.BoundStoredState')
+    def test_mongo_server_on_departed_keeps_remaining_apps(
+            self, mock_store_class):
+        # Setup
+        mock_store = mock_store_class.return_value
+        mock_store.apps = ['a', 'b']
+        mock_charm = MagicMock()
+        remaining = MagicMock()
+        remaining.app.name = 'b'
+        mock_charm.framework.model.relations = {'mongo': [remaining]}
+        server = MongoDbServer(mock_charm, 'mongo')
+
+        # Exercise
+        server.on_departed(create_autospec(EventBase))
+
+        # Validate
+        assert mock_store.apps == ['b']
+
+    def test_mongo_server_clients_of_relation(self):
+        # Setup
+        mock_charm = MagicMock()
+        relations = [MagicMock(), MagicMock()]
+        for relation in relations:
+            relation.name = 'mongo'
+        peer = MagicMock()
+        peer.name = 'replicas'
+        mock_charm.framework.model.relations = {'mongo': relations}
+        server = MongoDbServer(mock_charm, 'mongo')
+
+        # Exercise
+        clients = server.clients()
+        relation_clients = server.clients(relations[1])
+        peer_clients = server.clients(peer)
+
+        # Validate
+        assert [client.relation for client in clients] == relations
+        assert [client.relation for client in relation_clients] == \
+            [relations[1]]
+        assert [client.relation for client in peer_clients] == relations
+
     def test_mongo_client(self):
         # Setup
         mock_name = uuid4()
@@ -68,10 +132,24 @@ class MongoDbInterfaceTest(unittest.TestCase):
         # Exercise
         client = MongoDbInterfaceClient(mock_relation, None)
         # Validate
+        assert client.relation == mock_relation
         assert client.name == mock_name
         assert client.id == mock_id
         assert isinstance(client.formatter, MongoDbInterfaceDataFormatter)
 
+    def test_mongo_client_role(self):
+        # Setup
+        units = [MagicMock(), MagicMock()]
+        mock_relation = MagicMock()
+        mock_relation.units = units
+        mock_relation.data = {units[0]: {}, units[1]: {'role': 'analytics'}}
+        # Exercise
+        client = MongoDbInterfaceClient(mock_relation, None)
+        # Validate
+        assert client.role == 'analytics'
+        mock_relation.data[units[1]].clear()
+        assert client.role is None
+
     def test_mongo_data_formatter(self):
         # Setup
         mock_data = uuid4()
@@ -79,4 +157,29 @@ class MongoDbInterfaceTest(unittest.TestCase):
         formatter = MongoDbInterfaceDataFormatter()
         config = formatter.format(mock_data)
         # Validate
-        assert config == {'connection_string': mock_data}
+        assert config == {'connection_string': mock_data,
+                          'standard_connection_string': ''}
+
+    def test_mongo_data_formatter_standard_fallback(self):
+        # Setup
+        mock_data = uuid4()
+        mock_fallback = uuid4()
+        # Exercise
+        formatter = MongoDbInterfaceDataFormatter()
+        config = formatter.format(mock_data, mock_fallback)
+        # Validate
+        assert config == {'connection_string': mock_data,
+                          'standard_connection_string': mock_fallback}
+
+    def test_mongo_data_formatter_client_options(self):
+        # Setup
+        mock_data = uuid4()
+        # Exercise
+        formatter = MongoDbInterfaceDataFormatter()
+        config = formatter.format(mock_data, client_options={
+            'max_pool_size': '50', 'compressors': 'zstd,snappy'})
+        # Validate
+        assert config == {'connection_string': mock_data,
+                          'standard_connection_string': '',
+                          'max_pool_size': '50',
+                          'compressors': 'zstd,snappy'}
@@ -1,4 +1,8 @@
+from pathlib import Path
+import http.client
+import shutil
 import sys
+import tempfile
 import unittest
 from uuid import uuid4
 from unittest.mock import (
@@ -9,10 +13,15 @@ from unittest.mock import (
 )
 sys.path.append('lib')
 sys.path.append('src')
+from ops.charm import CharmMeta
 from ops.framework import (
-    EventBase
+    EventBase,
+    Framework,
+    Object,
+    StoredState,
 )
 from ops.model import (
+    Model,
     ActiveStatus,
     BlockedStatus,
     WaitingStatus,
@@ -20,11 +29,20 @@ from ops.model import (
 )
 
 from observers import (
+    PvcCleanupObserver,
     StatusObserver,
     RelationObserver,
+    ReplicaSetObserver,
+    ShardingObserver,
     ConfigChangeObserver
 )
-from ops.charm import RelationJoinedEvent
+from wire import MongoCommandError
+from ops.charm import (
+    ActionEvent,
+    LeaderElectedEvent,
+    RelationJoinedEvent,
+    UpgradeCharmEvent
+)
 
 
 class StatusObserverTest(unittest.TestCase):
@@ -131,7 +149,11 @@ class RelationObserverTest(unittest.TestCase):
         relation = uuid4()
         mock_event.relation = relation
         mock_event.client = Mock()
+        mock_event.client.relation = relation
         mock_event.client.formatter = Mock()
+        mock_server = Mock()
+        mock_server.clients.return_value = [mock_event.client]
+        mock_framework.relation_data_get.return_value = {}
         rel_data = {str(uuid4()): str(uuid4())}
         mock_builder.build_relation_data.return_value = rel_data
 
@@ -146,17 +168,174 @@ class RelationObserverTest(unittest.TestCase):
             mock_framework,
             images,
             mock_pod,
-            mock_builder
+            mock_builder,
+            mock_server
         )
         observer.handle(mock_event)
         # Verify
         assert mock_framework.relation_data_set.call_count == 1
         assert mock_framework.relation_data_set.call_args == call(relation,
                                                                   rel_data)
+        assert mock_builder.build_relation_data.call_args == call(
+            mock_event.client.formatter, mock_event.client.role)
+        mock_server.clients.assert_called_once_with(relation)
+
+    @patch('k8s.K8sPod', autospec=True, spec_set=True)
+    @patch('builders.MongoBuilder', autospec=True, spec_set=True)
+    @patch('wrapper.FrameworkWrapper', autospec=True, spec_set=True)
+    def test_handle_publishes_only_changed(self, mock_framework_clazz,
+                                           mock_builder_clazz,
+                                           mock_pod_clazz):
+        # Setup
+        mock_event = create_autospec(EventBase)
+        mock_framework = mock_framework_clazz.return_value
+        mock_builder = mock_builder_clazz.return_value
+        mock_pod = mock_pod_clazz.return_value
+        rel_data = {'connection_string': str(uuid4()), 'max_pool_size': ''}
+        mock_builder.build_relation_data.return_value = rel_data
+
+        clients = [Mock(relation=uuid4()) for _ in range(4)]
+        relation_data = {
+            # Juju does not keep the fields set to ''
+            clients[0].relation: {
+                'connection_string': rel_data['connection_string']},
+            clients[1].relation: {'connection_string': str(uuid4())},
+            clients[2].relation: {},
+            # Reset to the driver default since the last publication
+            clients[3].relation: {
+                'connection_string': rel_data['connection_string'],
+                'max_pool_size': '100'},
+        }
+        mock_framework.relation_data_get.side_effect = \
+            lambda relation: relation_data[relation]
+        mock_server = Mock()
+        mock_server.clients.return_value = clients
+
+        # Exercise
+        observer = RelationObserver(
+            mock_framework,
+            {},
+            mock_pod,
+            mock_builder,
+            mock_server
+        )
+        observer.handle(mock_event)
+        # Verify
+        assert mock_framework.relation_data_set.call_args_list == [
+            call(clients[1].relation, rel_data),
+            call(clients[2].relation, rel_data),
+            call(clients[3].relation, rel_data),
+        ]
+        mock_server.clients.assert_called_once_with(None)
+
+
+class ReplicaSetObserverTest(unittest.TestCase):
+
+    def create_observer(self, mock_framework_clazz, mock_builder_clazz,
+                        mock_pod_clazz, leader=True, enabled=True):
+        mock_framework = mock_framework_clazz.return_value
+        mock_framework.config = {'manage-replica-set': enabled}
+        mock_framework.unit_is_leader = leader
+        mock_builder = mock_builder_clazz.return_value
+        mock_builder.member_hosts = ['app-0.svc:27017']
+        mock_builder.build_replica_set_config.return_value = {'_id': 'rs0'}
+        return ReplicaSetObserver(
+            mock_framework,
+            {},
+            mock_pod_clazz.return_value,
+            mock_builder
+        )
+
+    @patch('replica_set.ReplicaSet', autospec=True, spec_set=True)
+    @patch('k8s.K8sPod', autospec=True, spec_set=True)
+    @patch('builders.MongoBuilder', autospec=True, spec_set=True)
+    @patch('wrapper.FrameworkWrapper', autospec=True, spec_set=True)
+    def test_handle_applies_config(self, mock_framework_clazz,
+                                   mock_builder_clazz, mock_pod_clazz,
+                                   mock_replica_set_clazz):
+        # Setup
+        mock_event = create_autospec(EventBase, spec_set=True)
+        observer = self.create_observer(
+            mock_framework_clazz, mock_builder_clazz, mock_pod_clazz)
+
+        # Exercise
+        observer.handle(mock_event)
+
+        # Assert
+        mock_replica_set_clazz.assert_called_once_with(['app-0.svc:27017'])
+        mock_replica_set_clazz.return_value.apply.assert_called_once_with(
+            {'_id': 'rs0'})
+        mock_event.defer.assert_not_called()
+
+    @patch('replica_set.ReplicaSet', autospec=True, spec_set=True)
+    @patch('k8s.K8sPod', autospec=True, spec_set=True)
+    @patch('builders.MongoBuilder', autospec=True, spec_set=True)
+    @patch('wrapper.FrameworkWrapper', autospec=True, spec_set=True)
+    def test_handle_defers_on_error(self, mock_framework_clazz,
+                                    mock_builder_clazz, mock_pod_clazz,
+                                    mock_replica_set_clazz):
+        # Setup
+        mock_event = create_autospec(EventBase, spec_set=True)
+        observer = self.create_observer(
+            mock_framework_clazz, mock_builder_clazz, mock_pod_clazz)
+
+        for error in (ConnectionRefusedError(),
+                      MongoCommandError({'ok': 0.0, 'code': 103})):
+            mock_event.reset_mock()
+            mock_replica_set_clazz.return_value.apply.side_effect = error
+
+            # Exercise
+            observer.handle(mock_event)
+
+            # Assert
+            mock_event.defer.assert_called_once_with()
+
+    @patch('replica_set.ReplicaSet', autospec=True, spec_set=True)
+    @patch('k8s.K8sPod', autospec=True, spec_set=True)
+    @patch('builders.MongoBuilder', autospec=True, spec_set=True)
+    @patch('wrapper.FrameworkWrapper', autospec=True, spec_set=True)
+    def test_handle_skipped(self, mock_framework_clazz, mock_builder_clazz,
+                            mock_pod_clazz, mock_replica_set_clazz):
+        # Setup
+        mock_event = create_autospec(EventBase, spec_set=True)
+
+        for leader, enabled in ((False, True), (True, False)):
+            observer = self.create_observer(
+                mock_framework_clazz, mock_builder_clazz, mock_pod_clazz,
+                leader, enabled)
+
+            # Exercise
+            observer.handle(mock_event)
+
+        # Assert
+        mock_replica_set_clazz.assert_not_called()
+
+
+class StateHolder(Object):
+    state = StoredState()
+
+    def __init__(self, parent, key):
+        super().__init__(parent, key)
+        self.state.set_default(image_cache={}, desired_hash=None,
+                               generation=0, reconciled_generation=None,
+                               reconcile_skipped=0)
 
 
 class ConfigChangeObserverTest(unittest.TestCase):
 
+    def create_state(self, **kwargs):
+        state = Mock()
+        state.image_cache = {}
+        state.spec_hash = None
+        state.spec_set_skipped = 0
+        state.desired_hash = None
+        state.generation = 0
+        state.reconciled_generation = None
+        state.reconcile_skipped = 0
+        for name, value in kwargs.items():
+            setattr(state, name, value)
+        return state
+
     def create_image_resource_obj(self, mock_image_resource, fetch):
         mock_image_resource_obj = mock_image_resource.return_value
         mock_image_resource_obj.fetch.return_value = fetch
@@ -202,6 +381,9 @@ class ConfigChangeObserverTest(unittest.TestCase):
             mock_framework.unit_status_set.call_args[0][0], ActiveStatus)
         assert mock_framework.pod_spec_set.call_count == 1
         assert mock_framework.pod_spec_set.call_args == call(spec)
+        assert mock_pod.invalidate.call_count == 1
+        assert mock_framework.state.spec_hash == \
+            ConfigChangeObserver.spec_hash(spec)
 
     @patch('k8s.K8sPod', autospec=True, spec_set=True)
     @patch('builders.MongoBuilder', autospec=True, spec_set=True)
@@ -240,6 +422,242 @@ class ConfigChangeObserverTest(unittest.TestCase):
             mock_framework.unit_status_set.call_args[0][0], MaintenanceStatus)
         assert mock_framework.pod_spec_set.call_count == 1
         assert mock_framework.pod_spec_set.call_args == call(spec)
+        assert mock_event.defer.call_count == 1
+
+    @patch('k8s.K8sPod', autospec=True, spec_set=True)
+    @patch('builders.MongoBuilder', autospec=True, spec_set=True)
+    @patch('wrapper.FrameworkWrapper', autospec=True, spec_set=True)
+    @patch('charm.OCIImageResource', autospec=True, spec_set=True)
+    def test_handle_spec_unchanged(self, mock_image_resource_clazz,
+                                   mock_framework_clazz,
+                                   mock_builder_clazz, mock_pod_clazz):
+        # Setup
+        mock_event = create_autospec(EventBase)
+        mock_framework = mock_framework_clazz.return_value
+        mock_builder = mock_builder_clazz.return_value
+        mock_pod = mock_pod_clazz.return_value
+        mock_pod.is_ready = True
+
+        mock_image_resource_obj =\
+            self.create_image_resource_obj(mock_image_resource_clazz, True)
+        images = {
+            'mongodb-image': mock_image_resource_obj
+        }
+
+        spec = {str(uuid4()): str(uuid4())}
+        mock_builder.build_spec.return_value = spec
+        mock_framework.state = self.create_state()
+        mock_framework.state.spec_hash = ConfigChangeObserver.spec_hash(
+            dict(spec))
+        mock_framework.state.spec_set_skipped = 0
+
+        # Exercise
+        observer = ConfigChangeObserver(
+            mock_framework,
+            images,
+            mock_pod,
+            mock_builder
+        )
+        observer.handle(mock_event)
+        # Verify
+        assert mock_framework.pod_spec_set.call_count == 0
+        assert mock_framework.state.spec_set_skipped == 1
+        assert mock_framework.unit_status_set.call_count == 1
+        assert isinstance(
+            mock_framework.unit_status_set.call_args[0][0], ActiveStatus)
+
+    @patch('k8s.K8sPod', autospec=True, spec_set=True)
+    @patch('builders.MongoBuilder', autospec=True, spec_set=True)
+    @patch('wrapper.FrameworkWrapper', autospec=True, spec_set=True)
+    @patch('charm.OCIImageResource', autospec=True, spec_set=True)
+    def test_handle_coalesces_reconciled(self, mock_image_resource_clazz,
+                                         mock_framework_clazz,
+                                         mock_builder_clazz, mock_pod_clazz):
+        # Setup
+        mock_event = create_autospec(EventBase)
+        mock_framework = mock_framework_clazz.return_value
+        mock_framework.config = {'replica-set': 'rs0'}
+        mock_framework.unit_is_leader = True
+        mock_builder = mock_builder_clazz.return_value
+        mock_builder.build_spec.return_value = {str(uuid4()): str(uuid4())}
+        mock_pod = mock_pod_clazz.return_value
+        mock_pod.is_ready = True
+        mock_image_resource_obj =\
+            self.create_image_resource_obj(mock_image_resource_clazz, True)
+        mock_framework.state = self.create_state()
+        observer = ConfigChangeObserver(
+            mock_framework,
+            {'mongodb-image': mock_image_resource_obj},
+            mock_pod,
+            mock_builder
+        )
+
+        # Exercise
+        observer.handle(mock_event)
+        observer.handle(mock_event)
+        mock_framework.config = {'replica-set': 'rs1'}
+        observer.handle(mock_event)
+
+        # Verify
+        assert mock_image_resource_obj.fetch.call_count == 2
+        assert mock_builder.build_spec.call_count == 2
+        assert mock_framework.state.generation == 2
+        assert mock_framework.state.reconciled_generation == 2
+        assert mock_framework.state.reconcile_skipped == 1
+
+    @patch('k8s.K8sPod', autospec=True, spec_set=True)
+    @patch('builders.MongoBuilder', autospec=True, spec_set=True)
+    @patch('wrapper.FrameworkWrapper', autospec=True, spec_set=True)
+    @patch('charm.OCIImageResource', autospec=True, spec_set=True)
+    def test_handle_upgrade_reconciles(self, mock_image_resource_clazz,
+                                       mock_framework_clazz,
+                                       mock_builder_clazz, mock_pod_clazz):
+        # Setup
+        mock_framework = mock_framework_clazz.return_value
+        mock_framework.config = {}
+        mock_framework.unit_is_leader = True
+        mock_builder = mock_builder_clazz.return_value
+        mock_builder.build_spec.return_value = {}
+        mock_pod = mock_pod_clazz.return_value
+        mock_pod.is_ready = False
+        mock_framework.state = self.create_state(
+            desired_hash=ConfigChangeObserver.desired_hash({}, True),
+            generation=3, reconciled_generation=3)
+        mock_event = create_autospec(UpgradeCharmEvent)
+
+        # Exercise
+        ConfigChangeObserver(
+            mock_framework,
+            {'mongodb-image':
+             self.create_image_resource_obj(mock_image_resource_clazz, True)},
+            mock_pod,
+            mock_builder
+        ).handle(mock_event)
+
+        # Verify
+        assert mock_builder.build_spec.call_count == 1
+        assert mock_framework.state.generation == 4
+        assert mock_framework.state.reconciled_generation == 3
+        assert mock_event.defer.call_count == 1
+
+    @patch('k8s.K8sPod', autospec=True, spec_set=True)
+    @patch('builders.MongoBuilder', autospec=True, spec_set=True)
+    @patch('wrapper.FrameworkWrapper', autospec=True, spec_set=True)
+    @patch('charm.OCIImageResource', autospec=True, spec_set=True)
+    def test_handle_leadership_regained(self, mock_image_resource_clazz,
+                                        mock_framework_clazz,
+                                        mock_builder_clazz, mock_pod_clazz):
+        # Setup
+        mock_framework = mock_framework_clazz.return_value
+        mock_framework.config = {}
+        mock_framework.unit_is_leader = True
+        mock_builder = mock_builder_clazz.return_value
+        spec = {str(uuid4()): str(uuid4())}
+        mock_builder.build_spec.return_value = spec
+        mock_pod = mock_pod_clazz.return_value
+        mock_pod.is_ready = True
+        # Set S1 as leader, then another leader may have set its spec
+        mock_framework.state = self.create_state(
+            desired_hash=ConfigChangeObserver.desired_hash({}, True),
+            generation=1, reconciled_generation=1,
+            spec_hash=ConfigChangeObserver.spec_hash(spec))
+
+        # Exercise
+        ConfigChangeObserver(
+            mock_framework,
+            {'mongodb-image':
+             self.create_image_resource_obj(mock_image_resource_clazz, True)},
+            mock_pod,
+            mock_builder
+        ).handle(create_autospec(LeaderElectedEvent))
+
+        # Verify
+        assert mock_framework.pod_spec_set.call_args == call(spec)
+        assert mock_framework.state.generation == 2
+        assert mock_framework.state.reconciled_generation == 2
+
+    @patch('k8s.K8sPod', autospec=True, spec_set=True)
+    @patch('builders.MongoBuilder', autospec=True, spec_set=True)
+    @patch('wrapper.FrameworkWrapper', autospec=True, spec_set=True)
+    @patch('charm.OCIImageResource', autospec=True, spec_set=True)
+    def test_handle_stores_image_cache(self, mock_image_resource_clazz,
+                                       mock_framework_clazz,
+                                       mock_builder_clazz, mock_pod_clazz):
+        # Setup
+        mock_framework = mock_framework_clazz.return_value
+        mock_framework.state = self.create_state()
+        mock_framework.unit_is_leader = False
+        mock_image_resource_obj = mock_image_resource_clazz.return_value
+        entry = {'hash': str(uuid4())}
+        mock_image_resource_obj.fetch.side_effect = \
+            lambda adapter, cache: cache.update({'mongodb-image': entry}) \
+            or True
+
+        # Exercise
+        ConfigChangeObserver(
+            mock_framework,
+            {'mongodb-image': mock_image_resource_obj},
+            mock_pod_clazz.return_value,
+            mock_builder_clazz.return_value
+        ).handle(create_autospec(EventBase))
+
+        # Verify
+        assert mock_image_resource_obj.fetch.call_args == call(
+            mock_framework.resources, {'mongodb-image': entry})
+        assert mock_framework.state.image_cache == {'mongodb-image': entry}
+
+    @patch('k8s.K8sPod', autospec=True, spec_set=True)
+    @patch('builders.MongoBuilder', autospec=True, spec_set=True)
+    @patch('wrapper.FrameworkWrapper', autospec=True, spec_set=True)
+    @patch('charm.OCIImageResource', autospec=True, spec_set=True)
+    def test_handle_commits_image_cache(self, mock_image_resource_clazz,
+                                        mock_framework_clazz,
+                                        mock_builder_clazz, mock_pod_clazz):
+        # Setup
+        tmpdir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, tmpdir)
+        framework = Framework(tmpdir / 'framework.data', tmpdir,
+                              CharmMeta(), create_autospec(Model))
+        self.addCleanup(framework.close)
+        holder = StateHolder(framework, 'holder')
+        mock_framework = mock_framework_clazz.return_value
+        mock_framework.state = holder.state
+        mock_framework.config = {}
+        mock_framework.unit_is_leader = False
+        hashes = {'mongodb-image': 'a', 'mongodb-sidecar-image': 'b'}
+
+        def fetch(name):
+            def fetch(adapter, cache):
+                if name in cache and cache[name]['hash'] == hashes[name]:
+                    return True
+                cache[name] = {'signature': [name, 1, 2],
+                               'hash': hashes[name],
+                               'image': {'registrypath': hashes[name]}}
+                return True
+            return fetch
+
+        images = {}
+        for name in hashes:
+            images[name] = Mock()
+            images[name].fetch.side_effect = fetch(name)
+        observer = ConfigChangeObserver(
+            mock_framework,
+            images,
+            mock_pod_clazz.return_value,
+            mock_builder_clazz.return_value
+        )
+        observer.handle(create_autospec(UpgradeCharmEvent))
+        framework.commit()
+
+        # Exercise
+        hashes['mongodb-image'] = 'c'
+        observer.handle(create_autospec(UpgradeCharmEvent))
+        framework.commit()
+
+        # Verify
+        assert holder.state.image_cache['mongodb-image']['hash'] == 'c'
+        assert holder.state.image_cache['mongodb-sidecar-image'][
+            'image'] == {'registrypath': 'b'}
 
     @patch('k8s.K8sPod', autospec=True, spec_set=True)
     @patch('builders.MongoBuilder', autospec=True, spec_set=True)
@@ -252,6 +670,7 @@ class ConfigChangeObserverTest(unittest.TestCase):
         mock_event = create_autospec(EventBase)
         mock_framework = mock_framework_clazz.return_value
         mock_framework.unit_is_leader = False
+        mock_framework.state = self.create_state(spec_hash=str(uuid4()))
         mock_builder = mock_builder_clazz.return_value
         mock_pod = mock_pod_clazz.return_value
         mock_pod.is_ready = False
@@ -278,6 +697,7 @@ class ConfigChangeObserverTest(unittest.TestCase):
         assert isinstance(mock_framework.unit_status_set.call_args[0][0],
                           WaitingStatus)
         assert mock_framework.pod_spec_set.call_count == 0
+        assert mock_framework.state.spec_hash is None
 
     @patch('k8s.K8sPod', autospec=True, spec_set=True)
     @patch('builders.MongoBuilder', autospec=True, spec_set=True)
@@ -315,3 +735,143 @@ class ConfigChangeObserverTest(unittest.TestCase):
         assert isinstance(
             mock_framework.unit_status_set.call_args[0][0], BlockedStatus)
         assert mock_framework.pod_spec_set.call_count == 0
+
+    @patch('k8s.K8sPod', autospec=True, spec_set=True)
+    @patch('builders.MongoBuilder', autospec=True, spec_set=True)
+    @patch('wrapper.FrameworkWrapper', autospec=True, spec_set=True)
+    @patch('charm.OCIImageResource', autospec=True, spec_set=True)
+    def test_handle_spec_invalid_config(self, mock_image_resource_clazz,
+                                        mock_framework_clazz,
+                                        mock_builder_clazz, mock_pod_clazz):
+        # Setup
+        mock_event = create_autospec(EventBase)
+        mock_framework = mock_framework_clazz.return_value
+        mock_framework.unit_is_leader = True
+        mock_builder = mock_builder_clazz.return_value
+        mock_builder.build_spec.side_effect = ValueError('invalid')
+        images = {
+            'mongodb-image':
+            self.create_image_resource_obj(mock_image_resource_clazz, True)
+        }
+
+        # Exercise
+        observer = ConfigChangeObserver(
+            mock_framework,
+            images,
+            mock_pod_clazz.return_value,
+            mock_builder
+        )
+        observer.handle(mock_event)
+        # Verify
+        assert mock_framework.unit_status_set.call_args == \
+            call(BlockedStatus('invalid'))
+        assert mock_framework.pod_spec_set.call_count == 0
+
+
+class ShardingObserverTest(unittest.TestCase):
+
+    @patch('sharding.Router', autospec=True, spec_set=True)
+    @patch('k8s.K8sPod', autospec=True, spec_set=True)
+    @patch('builders.MongoBuilder', autospec=True, spec_set=True)
+    @patch('wrapper.FrameworkWrapper', autospec=True, spec_set=True)
+    def test_handle_adds_shards(self, mock_framework_clazz,
+                                mock_builder_clazz, mock_pod_clazz,
+                                mock_router_clazz):
+        # Setup
+        mock_event = create_autospec(EventBase, spec_set=True)
+        mock_framework = mock_framework_clazz.return_value
+        mock_framework.config = {
+            'cluster-role': 'mongos',
+            'shards': 'a/a-0:27018,a-1:27018 b/b-0:27018',
+        }
+        mock_framework.unit_is_leader = True
+        mock_builder = mock_builder_clazz.return_value
+        mock_builder.member_hosts = ['router-0.svc:27017']
+        mock_router = mock_router_clazz.return_value
+        mock_router.add_shards.side_effect = [ConnectionRefusedError(), []]
+        observer = ShardingObserver(
+            mock_framework,
+            {},
+            mock_pod_clazz.return_value,
+            mock_builder
+        )
+
+        # Exercise
+        observer.handle(mock_event)
+        observer.handle(mock_event)
+
+        # Assert
+        mock_router_clazz.assert_called_with(['router-0.svc:27017'])
+        mock_router.add_shards.assert_called_with(
+            ['a/a-0:27018,a-1:27018', 'b/b-0:27018'])
+        mock_event.defer.assert_called_once_with()
+
+    @patch('sharding.Router', autospec=True, spec_set=True)
+    @patch('k8s.K8sPod', autospec=True, spec_set=True)
+    @patch('builders.MongoBuilder', autospec=True, spec_set=True)
+    @patch('wrapper.FrameworkWrapper', autospec=True, spec_set=True)
+    def test_handle_not_mongos(self, mock_framework_clazz,
+                               mock_builder_clazz, mock_pod_clazz,
+                               mock_router_clazz):
+        # Setup
+        mock_framework = mock_framework_clazz.return_value
+        mock_framework.config = {'cluster-role': 'shardsvr',
+                                 'shards': 'a/a-0:27018'}
+        observer = ShardingObserver(
+            mock_framework,
+            {},
+            mock_pod_clazz.return_value,
+            mock_builder_clazz.return_value
+        )
+
+        # Exercise
+        observer.handle(create_autospec(EventBase, spec_set=True))
+
+        # Assert
+        mock_router_clazz.assert_not_called()
+
+
+class PvcCleanupObserverTest(unittest.TestCase):
+
+    @patch('k8s.K8sPvc', autospec=True, spec_set=True)
+    @patch('k8s.K8sPod', autospec=True, spec_set=True)
+    @patch('builders.MongoBuilder', autospec=True, spec_set=True)
+    @patch('wrapper.FrameworkWrapper', autospec=True, spec_set=True)
+    def test_handle(self, mock_framework_clazz, mock_builder_clazz,
+                    mock_pod_clazz, mock_pvc_clazz):
+        # Setup
+        mock_event = create_autospec(ActionEvent, instance=True)
+        mock_event.params = {'dry-run': False, 'parallelism': 4}
+        mock_builder = mock_builder_clazz.return_value
+        mock_builder.units = ['app/0', 'app/1', 'app/2']
+        mock_pvc = mock_pvc_clazz.return_value
+        mock_pvc.delete_orphaned.side_effect = [
+            (['db-app-3', 'db-app-4'], {'db-app-5': 'forbidden'}),
+            ConnectionRefusedError('refused'),
+            http.client.IncompleteRead(b''),
+        ]
+        observer = PvcCleanupObserver(
+            mock_framework_clazz.return_value,
+            {},
+            mock_pod_clazz.return_value,
+            mock_pvc,
+            mock_builder
+        )
+
+        # Exercise
+        observer.handle(mock_event)
+        observer.handle(mock_event)
+        observer.handle(mock_event)
+
+        # Assert
+        mock_pvc.delete_orphaned.assert_called_with(3, 4, False)
+        mock_event.set_results.assert_called_once_with({
+            'dry-run': False,
+            'count': 2,
+            'deleted': 'db-app-3,db-app-4',
+            'failed': 'db-app-5',
+        })
+        assert mock_event.fail.call_args_list == [
+            call('PVC cleanup failed: refused'),
+            call('PVC cleanup failed: IncompleteRead(0 bytes read)'),
+        ]
@@ -1,8 +1,12 @@
 from pathlib import Path
+import os
+import shutil
 import sys
+import tempfile
 import unittest
 from unittest.mock import (
     call,
+    patch,
     MagicMock
 )
 from uuid import uuid4
@@ -118,3 +122,82 @@ class OCIImageResourceTest(unittest.TestCase):
         assert image_resource.image_path == mock_image_path
         assert image_resource.username == mock_image_username
         assert image_resource.password == mock_image_password
+
+
+class OCIImageResourceCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = Path(self.tmpdir) / 'mongodb-image.yaml'
+        self.write('registry/mongo:4.2')
+        self.adapter = MagicMock(Resources)
+        self.adapter.fetch.return_value = self.path
+
+    def write(self, image_path, mtime_ns=None):
+        self.path.write_text(f"registrypath: {image_path}\n"
+                             "username: user\n"
+                             "password: secret\n")
+        if mtime_ns is not None:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def fetch(self, cache):
+        image_resource = OCIImageResource('mongodb-image')
+        assert image_resource.fetch(self.adapter, cache)
+        return image_resource
+
+    def test_unchanged_file_not_read(self):
+        # Setup
+        cache = {}
+        self.fetch(cache)
+
+        # Exercise
+        with patch.object(Path, 'read_text') as mock_read_text:
+            image_resource = self.fetch(cache)
+
+        # Assert
+        assert mock_read_text.call_count == 0
+        assert self.adapter.fetch.call_count == 2
+        assert image_resource.image_path == 'registry/mongo:4.2'
+        assert image_resource.username == 'user'
+        assert image_resource.password == 'secret'
+        assert cache['mongodb-image']['signature'][0] == str(self.path)
+
+    def test_touched_file_not_parsed(self):
+        # Setup
+        cache = {}
+        self.fetch(cache)
+        self.write('registry/mongo:4.2', mtime_ns=10 ** 9)
+
+        # Exercise
+        with patch('resources.yaml.load') as mock_load:
+            image_resource = self.fetch(cache)
+
+        # Assert
+        assert mock_load.call_count == 0
+        assert image_resource.image_path == 'registry/mongo:4.2'
+        assert cache['mongodb-image']['signature'][2] == 10 ** 9
+
+    def test_new_image_parsed(self):
+        # Setup
+        cache = {}
+        self.fetch(cache)
+        digest = cache['mongodb-image']['hash']
+        self.write('registry/mongo:4.4', mtime_ns=10 ** 9)
+
+        # Exercise
+        image_resource = self.fetch(cache)
+
+        # Assert
+        assert image_resource.image_path == 'registry/mongo:4.4'
+        assert cache['mongodb-image']['hash'] != digest
+        assert cache['mongodb-image']['image']['registrypath'] == \
+            'registry/mongo:4.4'
+
+    def test_not_a_mapping(self):
+        # Setup
+        self.path.write_text('registry/mongo:4.2\n')
+
+        # Exercise / Assert
+        with pytest.raises(InvalidResourceError):
+            self.fetch({})
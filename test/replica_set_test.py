@@ -0,0 +1,274 @@
+import sys
+import unittest
+sys.path.append('lib')
+sys.path.append('src')
+
+from fake_mongod import (
+    FakeMongod,
+    replica_set_config_error,
+    serve,
+    vote_changes,
+)
+from replica_set import ReplicaSet
+
+
+class FakeReplicaSetMember(FakeMongod):
+    """In-process mongod answering the replica set commands."""
+
+    def __init__(self, max_wire_version=9):
+        super().__init__()
+        self.max_wire_version = max_wire_version
+        self.config = None
+        self.primary = False
+        self.commands = []
+
+    def run(self, command):
+        name = next(iter(command))
+        self.commands.append(name)
+        if name == 'isMaster':
+            return {'ismaster': self.primary,
+                    'secondary': self.config is not None and not self.primary,
+                    'maxWireVersion': self.max_wire_version,
+                    'ok': 1.0}
+        if name == 'replSetGetConfig':
+            if self.config is None:
+                return {'ok': 0.0, 'code': 94,
+                        'errmsg': 'no replset config has been received'}
+            return {'config': self.config, 'ok': 1.0}
+        if name == 'replSetInitiate':
+            if self.config is not None:
+                return {'ok': 0.0, 'code': 23, 'errmsg': 'already initialized'}
+            error = replica_set_config_error(
+                command[name], max_wire_version=self.max_wire_version)
+            if error:
+                return error
+            self.config = command[name]
+            self.primary = True
+            return {'ok': 1.0}
+        if name == 'replSetReconfig':
+            config = command[name]
+            error = replica_set_config_error(config, self.config,
+                                             self.max_wire_version)
+            if error:
+                return error
+            self.config = config
+            return {'ok': 1.0}
+        return {'ok': 0.0, 'code': 59, 'errmsg': 'no such command'}
+
+
+class ReplicaSetTest(unittest.TestCase):
+
+    def start_members(self, count, max_wire_version=9):
+        members = []
+        for _ in range(count):
+            members.append(serve(self, FakeReplicaSetMember(
+                max_wire_version)))
+        return members
+
+    def desired(self, hosts, voting=7):
+        return {
+            '_id': 'rs0',
+            'members': [
+                {'host': host,
+                 'priority': 1 if i < voting else 0,
+                 'votes': 1 if i < voting else 0}
+                for i, host in enumerate(hosts)
+            ],
+        }
+
+    def test_initiate(self):
+        # Setup
+        members = self.start_members(2)
+        seeds = [member.host for member in members]
+
+        # Exercise
+        result = ReplicaSet(seeds).apply(self.desired(seeds))
+
+        # Assert
+        assert result == 'replSetInitiate'
+        assert members[0].config['version'] == 1
+        assert [m['_id'] for m in members[0].config['members']] == [0, 1]
+        assert [m['host'] for m in members[0].config['members']] == seeds
+        assert 'replSetInitiate' not in members[1].commands
+
+    def test_unchanged(self):
+        # Setup
+        members = self.start_members(1)
+        seeds = [members[0].host]
+        ReplicaSet(seeds).apply(self.desired(seeds))
+        members[0].commands.clear()
+
+        # Exercise
+        result = ReplicaSet(seeds).apply(self.desired(seeds))
+
+        # Assert
+        assert result is None
+        assert members[0].commands == ['isMaster', 'replSetGetConfig']
+
+    def test_scale_out_one_voter_at_a_time(self):
+        # Setup
+        members = self.start_members(1)
+        primary = members[0]
+        ReplicaSet([primary.host]).apply(self.desired([primary.host]))
+        primary.config['members'][0]['tags'] = {'dc': 'a'}
+        hosts = [primary.host] + ['pod-{}:27017'.format(i)
+                                  for i in range(1, 9)]
+        primary.commands.clear()
+
+        # Exercise
+        result = ReplicaSet(hosts[:1]).apply(self.desired(hosts))
+
+        # Assert
+        assert result == 'replSetReconfig'
+        # New members join without votes, then six of them are promoted
+        assert primary.commands.count('replSetReconfig') == 7
+        config = primary.config
+        assert config['version'] == 8
+        assert [m['_id'] for m in config['members']] == list(range(9))
+        assert config['members'][0]['tags'] == {'dc': 'a'}
+        assert [m['votes'] for m in config['members']] == [1] * 7 + [0] * 2
+        assert [m['priority'] for m in config['members']] == \
+            [1] * 7 + [0] * 2
+
+    def test_scale_down_keeps_ids(self):
+        # Setup
+        members = self.start_members(1)
+        primary = members[0]
+        hosts = [primary.host, 'pod-1:27017', 'pod-2:27017']
+        ReplicaSet(hosts[:1]).apply(self.desired(hosts))
+
+        # Exercise
+        result = ReplicaSet(hosts[:1]).apply(self.desired(hosts[:2]))
+
+        # Assert
+        assert result == 'replSetReconfig'
+        assert [(m['_id'], m['host']) for m in primary.config['members']] == \
+            [(0, hosts[0]), (1, hosts[1])]
+
+    def test_reconfig_through_reported_primary(self):
+        # Setup
+        members = self.start_members(2)
+        secondary, primary = members
+        hosts = [primary.host, secondary.host]
+        ReplicaSet(hosts).apply(self.desired(hosts))
+        secondary.config = primary.config
+
+        # Exercise
+        result = ReplicaSet([secondary.host, primary.host]).apply(
+            self.desired(hosts + ['pod-2:27017']))
+
+        # Assert
+        assert result == 'replSetReconfig'
+        assert 'replSetReconfig' in primary.commands
+        assert 'replSetReconfig' not in secondary.commands
+
+    def test_no_primary_after_initiate(self):
+        # Setup
+        members = self.start_members(1)
+        seeds = [members[0].host]
+        ReplicaSet(seeds).apply(self.desired(seeds))
+        members[0].primary = False
+
+        # Exercise / Assert
+        with self.assertRaises(ConnectionError):
+            ReplicaSet(seeds).apply(self.desired(seeds))
+
+    def test_unreachable(self):
+        # Setup
+        members = self.start_members(1)
+        seeds = [members[0].host]
+        members[0].shutdown()
+        members[0].server_close()
+
+        # Exercise / Assert
+        with self.assertRaises(OSError):
+            ReplicaSet(seeds, timeout=1).apply(self.desired(seeds))
+
+    def test_merge_unchanged(self):
+        # Setup
+        current = {
+            '_id': 'rs0',
+            'version': 3,
+            'members': [{'_id': 4, 'host': 'a:1', 'priority': 1,
+                         'votes': 1, 'hidden': False}],
+        }
+
+        # Exercise / Assert
+        assert ReplicaSet.merge(current, self.desired(['a:1'])) is None
+
+    def test_merge_resets_delay(self):
+        # Setup
+        current = {
+            '_id': 'rs0',
+            'version': 3,
+            'members': [{'_id': 0, 'host': 'a:1', 'priority': 1, 'votes': 1,
+                         'slaveDelay': 0},
+                        {'_id': 1, 'host': 'b:1', 'priority': 0, 'votes': 0,
+                         'slaveDelay': 3600}],
+        }
+        desired = self.desired(['a:1', 'b:1'], voting=1)
+
+        # Exercise
+        config = ReplicaSet.merge(current, desired)
+
+        # Assert
+        assert config['version'] == 4
+        assert [m['slaveDelay'] for m in config['members']] == [0, 0]
+        current['members'][1]['slaveDelay'] = 0
+        assert ReplicaSet.merge(current, desired) is None
+
+    def test_voting_steps(self):
+        # Setup
+        current = {
+            '_id': 'rs0',
+            'version': 3,
+            'members': [{'_id': i, 'host': host, 'priority': 1, 'votes': 1}
+                        for i, host in enumerate(['a:1', 'b:1', 'c:1'])],
+        }
+        config = ReplicaSet.merge(current, {
+            '_id': 'rs0',
+            'members': [
+                {'host': 'a:1', 'priority': 1, 'votes': 1},
+                {'host': 'b:1', 'priority': 0, 'votes': 0},
+                {'host': 'd:1', 'priority': 1, 'votes': 1},
+            ],
+        })
+
+        # Exercise
+        steps = ReplicaSet.voting_steps(current, config)
+
+        # Assert
+        assert [step['version'] for step in steps] == [4, 5, 6, 7]
+        assert [(m['host'], m['votes'], m['priority'])
+                for m in steps[0]['members']] == [
+            ('a:1', 1, 1), ('b:1', 1, 1), ('d:1', 0, 0), ('c:1', 1, 1)]
+        for before, after in zip([current] + steps, steps):
+            assert vote_changes(before, after) <= 1
+        assert steps[-1]['members'] == config['members']
+        tagged = dict(current, version=4, members=[
+            dict(member, tags={'dc': 'a'}) for member in current['members']])
+        assert ReplicaSet.voting_steps(current, tagged) == [tagged]
+
+    def test_demote_to_hidden_analytics(self):
+        for max_wire_version, field in ((9, 'slaveDelay'),
+                                        (13, 'secondaryDelaySecs')):
+            # Setup
+            primary = self.start_members(1, max_wire_version)[0]
+            hosts = [primary.host] + ['pod-{}:27017'.format(i)
+                                      for i in range(1, 5)]
+            ReplicaSet(hosts[:1]).apply(self.desired(hosts))
+            desired = self.desired(hosts, voting=3)
+            for member in desired['members'][3:]:
+                member.update(hidden=True, secondaryDelaySecs=3600)
+
+            # Exercise
+            result = ReplicaSet(hosts[:1]).apply(desired)
+            delayed = primary.config['members']
+            ReplicaSet(hosts[:1]).apply(self.desired(hosts[:4], voting=3))
+
+            # Assert
+            assert result == 'replSetReconfig'
+            assert [(m['votes'], m['priority'], m['hidden'], m[field])
+                    for m in delayed[3:]] == [(0, 0, True, 3600)] * 2
+            # Reset under the server's name once no delay is wanted
+            assert primary.config['members'][3][field] == 0
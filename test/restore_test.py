@@ -0,0 +1,203 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import (
+    create_autospec,
+    patch,
+)
+sys.path.append('lib')
+sys.path.append('src')
+from ops.charm import ActionEvent
+
+import wire
+from backup import DirectoryTarget
+from fake_mongod import FakeMongod, serve
+from observers import RestoreObserver
+from restore import Restore, read_documents
+
+
+class FakePrimary(FakeMongod):
+    """In-process primary recording the writes of a restore."""
+
+    def __init__(self):
+        super().__init__()
+        self.collections = {}
+        self.indexes = {}
+        self.commands = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def run(self, command):
+        name = next(iter(command))
+        ns = '{}.{}'.format(command['$db'], command[name])
+        self.commands.append((name, ns))
+        if name == 'isMaster':
+            return {'ismaster': True, 'ok': 1.0}
+        if name == 'drop':
+            if self.collections.pop(ns, None) is None:
+                return {'ok': 0.0, 'code': 26, 'errmsg': 'ns not found'}
+            return {'ok': 1.0}
+        if name == 'create':
+            if ns in self.collections:
+                return {'ok': 0.0, 'code': 48, 'errmsg': 'ns exists'}
+            self.collections[ns] = []
+            return {'ok': 1.0}
+        if name == 'insert':
+            with self._lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            time.sleep(0.01)
+            with self._lock:
+                self.running -= 1
+                documents = self.collections.setdefault(ns, [])
+                ids = {document['_id'] for document in documents}
+                errors = []
+                for i, document in enumerate(command['documents']):
+                    if document['_id'] in ids:
+                        errors.append({'index': i, 'code': 11000,
+                                       'errmsg': 'duplicate key'})
+                    else:
+                        documents.append(document)
+            reply = {'n': len(command['documents']) - len(errors),
+                     'ok': 1.0}
+            if errors:
+                reply['writeErrors'] = errors
+            return reply
+        if name == 'createIndexes':
+            self.indexes[ns] = command['indexes']
+            return {'ok': 1.0}
+        return {'ok': 0.0, 'code': 59, 'errmsg': 'no such command'}
+
+
+def write_dump(path, db, collection, documents, indexes, options=None):
+    directory = os.path.join(path, 'b1', db)
+    os.makedirs(directory, exist_ok=True)
+    with gzip.open(os.path.join(directory, collection + '.bson.gz'),
+                   'wb') as dump:
+        for document in documents:
+            dump.write(wire.encode_document(document))
+    with gzip.open(os.path.join(directory,
+                                collection + '.metadata.json.gz'),
+                   'wb') as metadata:
+        metadata.write(json.dumps({'options': options or {},
+                                   'indexes': indexes}).encode('UTF-8'))
+
+
+class RestoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.primary = serve(self, FakePrimary())
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        write_dump(self.path, 'shop', 'orders',
+                   [{'_id': i, 'total': i * 1.5} for i in range(50)],
+                   [{'v': 2, 'key': {'_id': 1}, 'name': '_id_',
+                     'ns': 'shop.orders'},
+                    {'v': 2, 'key': {'total': -1}, 'name': 'total_-1'}])
+        write_dump(self.path, 'shop', 'events', [{'_id': 'e'}],
+                   [{'v': 2, 'key': {'_id': 1}, 'name': '_id_'}],
+                   {'capped': True, 'size': 4096})
+
+    def test_restore(self):
+        # Setup
+        messages = []
+
+        # Exercise
+        results = Restore([self.primary.host], DirectoryTarget(self.path),
+                          workers=3, batch_size=4).run('b1', messages.append)
+
+        # Assert
+        assert results['documents'] == 51
+        assert results['collections'] == 2
+        assert results['indexes'] == 1
+        assert results['write-errors'] == 0
+        assert results['documents-per-second'] > 0
+        assert [document['_id'] for document in
+                self.primary.collections['shop.orders']] != []
+        assert sorted(document['_id'] for document in
+                      self.primary.collections['shop.orders']) == \
+            list(range(50))
+        assert self.primary.indexes == {
+            'shop.orders': [{'key': {'total': -1}, 'name': 'total_-1'}]}
+        names = [name for name, _ in self.primary.commands]
+        assert names.index('createIndexes') > \
+            max(i for i, name in enumerate(names) if name == 'insert')
+        assert ('create', 'shop.events') in self.primary.commands
+        assert self.primary.max_running > 1
+        assert messages[-1] == '1 indexes built'
+
+    def test_restore_again_reports_duplicates(self):
+        # Setup
+        target = DirectoryTarget(self.path)
+        Restore([self.primary.host], target).run('b1')
+
+        # Exercise
+        again = Restore([self.primary.host], target).run('b1')
+        dropped = Restore([self.primary.host], target, drop=True).run('b1')
+
+        # Assert
+        assert again['documents'] == 0
+        assert again['write-errors'] == 51
+        assert dropped['write-errors'] == 0
+        assert len(self.primary.collections['shop.orders']) == 50
+
+    def test_restore_missing_backup(self):
+        with self.assertRaises(ValueError):
+            Restore([self.primary.host],
+                    DirectoryTarget(self.path)).run('missing')
+
+    def test_read_documents(self):
+        # Setup
+        data = b''.join(wire.encode_document({'_id': i}) for i in range(3))
+        # Exercise
+        documents = list(read_documents(io.BytesIO(data)))
+        # Verify
+        assert [wire.decode_document(d)['_id'] for d in documents] == \
+            [0, 1, 2]
+        for truncated in (data[:-1], data[:2], b'\x00\x00\x00\x00'):
+            with self.assertRaises(ValueError):
+                list(read_documents(io.BytesIO(truncated)))
+
+
+class RestoreObserverTest(unittest.TestCase):
+
+    @patch('restore.Restore', autospec=True, spec_set=True)
+    @patch('k8s.K8sPod', autospec=True, spec_set=True)
+    @patch('builders.MongoBuilder', autospec=True, spec_set=True)
+    @patch('wrapper.FrameworkWrapper', autospec=True, spec_set=True)
+    def test_handle(self, mock_framework_clazz, mock_builder_clazz,
+                    mock_pod_clazz, mock_restore_clazz):
+        # Setup
+        mock_event = create_autospec(ActionEvent, instance=True)
+        mock_event.params = {'source': '/srv/backups', 'name': 'b1',
+                             'workers': 8, 'drop': True}
+        mock_framework = mock_framework_clazz.return_value
+        mock_framework.config = {}
+        mock_builder = mock_builder_clazz.return_value
+        mock_builder.member_hosts = ['app-0.svc:27017']
+        mock_restore = mock_restore_clazz.return_value
+        mock_restore.run.side_effect = [{'name': 'b1'},
+                                        ValueError('No backup found')]
+        observer = RestoreObserver(mock_framework, {},
+                                   mock_pod_clazz.return_value, mock_builder)
+
+        # Exercise
+        observer.handle(mock_event)
+        observer.handle(mock_event)
+
+        # Assert
+        assert mock_restore_clazz.call_args[0][0] == ['app-0.svc:27017']
+        assert mock_restore_clazz.call_args[0][2] == 8
+        assert mock_restore_clazz.call_args[1] == {'drop': True}
+        mock_restore.run.assert_called_with('b1', mock_event.log)
+        mock_event.set_results.assert_called_once_with({'name': 'b1'})
+        mock_event.fail.assert_called_once_with(
+            'Restore failed: No backup found')
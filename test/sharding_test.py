@@ -0,0 +1,60 @@
+import sys
+import unittest
+sys.path.append('lib')
+sys.path.append('src')
+
+from fake_mongod import FakeMongod, serve
+from sharding import Router, parse_shards
+
+
+class FakeMongos(FakeMongod):
+    """In-process mongos answering the shard commands."""
+
+    def __init__(self):
+        super().__init__()
+        self.shards = []
+        self.commands = []
+
+    def run(self, command):
+        name = next(iter(command))
+        self.commands.append(name)
+        if name == 'ping':
+            return {'ok': 1.0}
+        if name == 'listShards':
+            return {'shards': [{'_id': shard.split('/')[0], 'host': shard}
+                               for shard in self.shards], 'ok': 1.0}
+        if name == 'addShard':
+            self.shards.append(command[name])
+            return {'shardAdded': command['name'], 'ok': 1.0}
+        return {'ok': 0.0, 'code': 59, 'errmsg': 'no such command'}
+
+
+class RouterTest(unittest.TestCase):
+
+    def start_router(self):
+        return serve(self, FakeMongos())
+
+    def test_parse_shards(self):
+        # Exercise
+        shards = parse_shards('a/a-0:27018,a-1:27018 b/b-0:27018, c/c-0:1')
+        # Verify
+        assert shards == ['a/a-0:27018,a-1:27018', 'b/b-0:27018', 'c/c-0:1']
+        assert parse_shards('') == []
+
+    def test_add_missing_shards(self):
+        # Setup
+        router = self.start_router()
+        router.shards = ['a/a-0:27018']
+
+        # Exercise
+        added = Router(['127.0.0.1:1', router.host], timeout=1).add_shards(
+            ['a/a-0:27018', 'b/b-0:27018,b-1:27018'])
+
+        # Assert
+        assert added == ['b']
+        assert router.shards == ['a/a-0:27018', 'b/b-0:27018,b-1:27018']
+        assert router.commands.count('addShard') == 1
+
+    def test_no_router(self):
+        with self.assertRaises(OSError):
+            Router(['127.0.0.1:1'], timeout=1).add_shards(['a/a-0:27018'])
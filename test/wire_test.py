@@ -0,0 +1,110 @@
+import datetime
+import socket
+import sys
+import unittest
+sys.path.append('src')
+
+import wire
+
+
+class WireTest(unittest.TestCase):
+
+    def test_encode_document(self):
+        # Exercise
+        data = wire.encode_document({'ping': 1, '$db': 'admin'})
+        # Verify
+        assert data == (b'\x1e\x00\x00\x00'
+                        b'\x10ping\x00\x01\x00\x00\x00'
+                        b'\x02$db\x00\x06\x00\x00\x00admin\x00'
+                        b'\x00')
+
+    def test_encode_types(self):
+        # Exercise
+        data = wire.encode_document({
+            'b': True, 'l': 2 ** 40, 'd': 1.0, 'n': None,
+            'a': ['x'], 'o': {},
+        })
+        # Verify
+        assert data == (b'\x3b\x00\x00\x00'
+                        b'\x08b\x00\x01'
+                        b'\x12l\x00\x00\x00\x00\x00\x00\x01\x00\x00'
+                        b'\x01d\x00\x00\x00\x00\x00\x00\x00\xf0\x3f'
+                        b'\x0an\x00'
+                        b'\x04a\x00\x0e\x00\x00\x00'
+                        b'\x020\x00\x02\x00\x00\x00x\x00\x00'
+                        b'\x03o\x00\x05\x00\x00\x00\x00'
+                        b'\x00')
+
+    def test_encode_unsupported(self):
+        with self.assertRaises(TypeError):
+            wire.encode_document({'s': {1, 2}})
+
+    def test_op_msg(self):
+        # Exercise
+        message = wire.op_msg({'ping': 1}, request_id=7)
+        # Verify
+        assert message[:16] == (b'\x24\x00\x00\x00\x07\x00\x00\x00'
+                                b'\x00\x00\x00\x00\xdd\x07\x00\x00')
+        assert message[16:21] == b'\x00\x00\x00\x00\x00'
+        assert message[21:] == wire.encode_document({'ping': 1})
+
+    def test_decode_roundtrip(self):
+        # Setup
+        document = {
+            'b': False, 'i': -3, 'l': 2 ** 40, 'd': 0.5, 's': 'h\u00e9',
+            'n': None, 'a': [1, {'x': 'y'}], 'o': {'p': []},
+            'id': wire.ObjectId(bytes(range(12))),
+            'ts': wire.Timestamp(1600000000, 3),
+            'bin': wire.Binary(4, b'\x01\x02'),
+            'at': datetime.datetime(2020, 3, 5, 10, 53, 51,
+                                    tzinfo=datetime.timezone.utc),
+            'min': wire.Raw(0xff, b''),
+        }
+        # Exercise
+        decoded = wire.decode_document(wire.encode_document(document))
+        # Verify
+        assert decoded == document
+
+    def test_decode_unsupported(self):
+        with self.assertRaises(ValueError):
+            wire.decode_document(b'\x08\x00\x00\x00\x06x\x00\x00')
+
+    def test_connection_command(self):
+        # Setup
+        client, server = socket.socketpair()
+        self.addCleanup(server.close)
+        server.sendall(wire.op_msg({'ok': 1.0, 'n': 2}, request_id=9) +
+                       wire.op_msg({'ok': 0.0, 'code': 94,
+                                    'errmsg': 'not initialized'}))
+        connection = wire.MongoConnection('127.0.0.1', 0)
+        connection._sock = client
+        # Exercise
+        with connection:
+            reply = connection.command({'count': 'c'}, db='test')
+            with self.assertRaises(wire.MongoCommandError) as context:
+                connection.command({'replSetGetConfig': 1})
+        # Verify
+        assert reply == {'ok': 1.0, 'n': 2}
+        assert context.exception.code == 94
+        (_, request_id, _, _), body = wire.read_message(server)
+        assert request_id == 1
+        assert wire.op_msg_document(body) == {'count': 'c', '$db': 'test'}
+        assert connection._sock is None
+
+    def test_raw_documents(self):
+        # Setup
+        batch = [wire.encode_document({'_id': i}) for i in range(3)]
+        reply = {'cursor': {'id': wire.Int64(5), 'ns': 'db.c',
+                            'firstBatch': [wire.RawDocument(document)
+                                           for document in batch]},
+                 'ok': 1.0}
+        # Exercise
+        data = wire.encode_document(reply)
+        decoded = wire.decode_document(data, ('firstBatch',))
+        # Verify
+        assert data == wire.encode_document(
+            dict(reply, cursor=dict(reply['cursor'], firstBatch=[
+                {'_id': i} for i in range(3)])))
+        assert decoded['cursor']['firstBatch'] == batch
+        assert isinstance(decoded['cursor']['id'], wire.Int64)
+        assert wire.encode_element('id', wire.Int64(5))[0] == 0x12
@@ -24,8 +24,10 @@ from ops.model import (
     Application,
 )
 from ops.charm import (
+    CharmBase,
     CharmMeta,
 )
+from ops.testing import Harness
 
 from wrapper import FrameworkWrapper
 
@@ -112,6 +114,34 @@ class FrameworkWrapperTest(unittest.TestCase):
         # Assert
         assert self.mock_framework.model.unit.status == mock_data
 
+    def test_relation_data_set(self):
+        # Setup
+        # Not "mongo": other tests define its events on the shared
+        # CharmEvents, which Harness refuses to redefine
+        harness = Harness(CharmBase, meta='''
+            name: mongodb-k8s
+            provides:
+              clients:
+                interface: mongodb
+        ''')
+        relation_id = harness.add_relation('clients', 'client')
+        harness.add_relation_unit(relation_id, 'client/0')
+        harness.begin()
+        harness.update_relation_data(relation_id, 'mongodb-k8s/0',
+                                     {'max_pool_size': '100'})
+        relation = harness.model.get_relation('clients', relation_id)
+        wrapper = FrameworkWrapper(harness.framework, None)
+        # Exercise
+        wrapper.relation_data_get(relation).get('connection_string')
+        wrapper.relation_data_set(relation, {
+            'connection_string': 'mongodb://a:1',
+            'standard_connection_string': '',
+            'max_pool_size': '',
+        })
+        # Assert
+        assert harness.get_relation_data(relation_id, 'mongodb-k8s/0') == \
+            {'connection_string': 'mongodb://a:1'}
+
     @patch('subprocess.check_output')
     def test_goal_state_units(self, mock_subproc):
         # Setup
@@ -132,6 +162,35 @@ class FrameworkWrapperTest(unittest.TestCase):
         # Assert
         assert config == mock_data['units']
 
+    @patch('subprocess.check_output')
+    def test_goal_state_units_memoized(self, mock_subproc):
+        # Setup
+        mock_data = {"units": {
+            "mongodb-k8s/0": {"status": "active",
+                              "since": "2020-03-05 10:53:51Z"}},
+                     "relations": {}}
+        mock_output = MagicMock()
+        mock_output.decode.return_value = json.dumps(mock_data)
+        mock_subproc.return_value = mock_output
+        # Exercise
+        wrapper = FrameworkWrapper(self.mock_framework, None)
+        wrapper.goal_state_units
+        config = wrapper.goal_state_units
+        # Assert
+        assert config == mock_data['units']
+        assert mock_subproc.call_count == 1
+
+    def test_relation_data_get(self):
+        # Setup
+        mock_data = {'key': f'{uuid4()}'}
+        mock_relation = MagicMock()
+        mock_relation.data = {self.mock_framework.model.unit: mock_data}
+        # Exercise
+        wrapper = FrameworkWrapper(self.mock_framework, None)
+        data = wrapper.relation_data_get(mock_relation)
+        # Assert
+        assert data == mock_data
+
     def test_unit_is_leader(self):
         # Exercise
         wrapper = FrameworkWrapper(self.mock_framework, None)